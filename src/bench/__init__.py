@@ -0,0 +1,13 @@
+"""
+Benchmark module - Seeded performance cases and a runner with baselines.
+"""
+
+from bench.cases import CASES, BenchCase
+from bench.runner import run_cases, compare_results
+
+__all__ = [
+    'CASES',
+    'BenchCase',
+    'run_cases',
+    'compare_results',
+]
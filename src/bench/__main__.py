@@ -0,0 +1,70 @@
+# python -m bench
+import argparse
+import json
+import sys
+from bench.cases import CASES, replay_case
+from bench.runner import compare_results, format_time, run_cases
+
+def print_result(name, result):
+    print(f"{name:24} {result['ops_per_sec']:>14,.0f} ops/s  p50 {format_time(result['p50']):>9}  "
+          f"p90 {format_time(result['p90']):>9}  p99 {format_time(result['p99']):>9}")
+
+def run(args):
+    cases = [case for name, case in CASES.items() if not args.filter or any(f in name for f in args.filter)]
+    cases += [replay_case(filename) for filename in args.trace]
+    if not cases:
+        print("No benchmark matches", args.filter)
+        return 1
+    results = run_cases(cases, args.repeat, args.min_time, on_result=print_result)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        baseline["results"] = {name: result for name, result in baseline["results"].items() if name in results["results"]}
+        return report(baseline, results, args.threshold)
+    return 0
+
+def report(baseline, current, threshold):
+    rows = compare_results(baseline, current, threshold)
+    for row in rows:
+        change = "" if row["change"] is None else f"{row['change']:+7.1%}"
+        print(f"{row['name']:24} {format_time(row['old']):>9} -> {format_time(row['new']):>9}  {change:>7}  {row['status']}")
+    regressions = [row["name"] for row in rows if row["status"] == "regression"]
+    if regressions:
+        print(f"{len(regressions)} regression(s) over {threshold:.0%}:", ", ".join(regressions))
+        return 1
+    return 0
+
+def compare(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    return report(baseline, current, args.threshold)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bench", description="Seeded performance benchmarks.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="run benchmarks")
+    run_parser.add_argument("filter", nargs="*", help="only run cases whose name contains one of these")
+    run_parser.add_argument("--repeat", type=int, default=20, help="timed samples per case")
+    run_parser.add_argument("--min-time", type=float, default=0.05, help="minimum seconds per sample")
+    run_parser.add_argument("--trace", action="append", default=[], help="also time replaying this .rpl file")
+    run_parser.add_argument("--output", help="write results as JSON (use as a baseline later)")
+    run_parser.add_argument("--baseline", help="compare against this JSON file after running")
+    run_parser.add_argument("--threshold", type=float, default=0.10, help="slowdown flagged as a regression")
+    run_parser.set_defaults(handler=run)
+    compare_parser = commands.add_parser("compare", help="compare two result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.10, help="slowdown flagged as a regression")
+    compare_parser.set_defaults(handler=compare)
+    commands.add_parser("list", help="list benchmark cases").set_defaults(handler=lambda args: print("\n".join(CASES)) or 0)
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,195 @@
+import random
+from contextlib import asynccontextmanager, contextmanager
+from typing import Callable, Dict, NamedTuple
+from data.floorcache import FloorCache
+from data.gameplay import GameState
+from data.rng import GameRNG
+from data.simulation import NullLog
+from entity.enemies import create_enemy
+from map.chunked import ChunkedDungeon
+from map.dungeon import Dungeon
+from map.generators import GENERATORS
+
+GENERATION_SEEDS = 16
+QUERY_POINTS = 10000
+DENSE_ENEMIES = 200
+DENSE_TURNS = 50
+SWARM_ENEMIES = 600
+
+class BenchCase(NamedTuple):
+    """`setup` is a (sync or async) context manager factory yielding the
+    operation to time; one call of it performs `ops` operations. `fresh`
+    cases get a new setup for every sample of at most `max_number` calls,
+    for operations that wear down the state they run on."""
+    name: str
+    setup: Callable
+    ops: int = 1
+    fresh: bool = False
+    max_number: int = 0
+
+CASES: Dict[str, BenchCase] = {}
+
+def case(name: str, ops: int = 1, fresh: bool = False, max_number: int = 0):
+    def register(setup):
+        CASES[name] = BenchCase(name, setup, ops, fresh, max_number)
+        return setup
+    return register
+
+def register_generation(floor_level: int):
+    @case(f"generate.floor{floor_level}")
+    @contextmanager
+    def generate():
+        seeds = iter(range(10 ** 9))
+        def op():
+            Dungeon(floor_level, 1000 + next(seeds) % GENERATION_SEEDS)
+        yield op
+
+for _floor in range(1, 6):
+    register_generation(_floor)
+
+def register_generator(name: str, width: int = 80, height: int = 40):
+    """Floor 5 with one generator, at the standard or a larger size, to
+    compare backends and see how each scales with the map."""
+    suffix = "" if (width, height) == (80, 40) else f".{width}x{height}"
+    @case(f"generate.{name}{suffix}")
+    @contextmanager
+    def generate():
+        seeds = iter(range(10 ** 9))
+        def op():
+            Dungeon(5, 1000 + next(seeds) % GENERATION_SEEDS, generator=name, width=width, height=height)
+        yield op
+
+for _name in GENERATORS:
+    register_generator(_name)
+    register_generator(_name, 320, 160)
+
+@case("generate.cached")
+@contextmanager
+def generate_cached():
+    cache = FloorCache(GENERATION_SEEDS)
+    rngs = [GameRNG(1000 + seed) for seed in range(GENERATION_SEEDS)]
+    for seed, rng in enumerate(rngs):
+        cache.build(5, 1000 + seed, rng)
+    seeds = iter(range(10 ** 9))
+    def op():
+        seed = next(seeds) % GENERATION_SEEDS
+        cache.build(5, 1000 + seed, rngs[seed])
+    yield op
+
+@case("generate.large")
+@contextmanager
+def generate_large():
+    seeds = iter(range(10 ** 9))
+    def op():
+        ChunkedDungeon(1, 1000 + next(seeds) % GENERATION_SEEDS, width=10000, height=10000)
+    yield op
+
+def query_dungeon():
+    dungeon = Dungeon(3, 1)
+    rng = random.Random(0)
+    points = [(rng.randrange(-2, dungeon.width + 2), rng.randrange(-2, dungeon.height + 2))
+              for _ in range(QUERY_POINTS)]
+    return dungeon, points
+
+@case("query.get_tile", ops=QUERY_POINTS)
+@contextmanager
+def query_get_tile():
+    dungeon, points = query_dungeon()
+    get_tile = dungeon.get_tile
+    def op():
+        for x, y in points:
+            get_tile(x, y)
+    yield op
+
+@case("query.is_walkable", ops=QUERY_POINTS)
+@contextmanager
+def query_is_walkable():
+    dungeon, points = query_dungeon()
+    is_walkable = dungeon.is_walkable
+    def op():
+        for x, y in points:
+            is_walkable(x, y)
+    yield op
+
+@case("query.get_enemy_at", ops=QUERY_POINTS)
+@contextmanager
+def query_get_enemy_at():
+    dungeon, points = query_dungeon()
+    get_enemy_at = dungeon.get_enemy_at
+    def op():
+        for x, y in points:
+            get_enemy_at(x, y)
+    yield op
+
+@case("query.get_room_at", ops=QUERY_POINTS)
+@contextmanager
+def query_get_room_at():
+    dungeon, points = query_dungeon()
+    get_room_at = dungeon.get_room_at
+    def op():
+        for x, y in points:
+            get_room_at(x, y)
+    yield op
+
+def dense_game(seed: int = 7, count: int = DENSE_ENEMIES) -> GameState:
+    """A floor-1 game with `count` extra enemies spread over room floors."""
+    game_state = GameState(seed=seed, prefetch=False)
+    dungeon = game_state.dungeon
+    player = game_state.player
+    cells = [(x, y, room) for room in dungeon.rooms
+             for y in range(room.y + 1, room.y + room.height - 1)
+             for x in range(room.x + 1, room.x + room.width - 1)
+             if dungeon.is_walkable(x, y) and (x, y) != (player.x, player.y)]
+    rng = random.Random(seed)
+    kinds = ("shade", "warden", "whisper", "mimic")
+    for index, (x, y, room) in enumerate(rng.sample(cells, min(count, len(cells)))):
+        dungeon.add_enemy(create_enemy(kinds[index % len(kinds)], x, y, 1, dungeon.ai_rng), room)
+    return game_state
+
+@case("turn.dense", fresh=True, max_number=DENSE_TURNS)
+@contextmanager
+def turn_dense():
+    game_state = dense_game()
+    log = NullLog()
+    def op():
+        game_state.process_turn(log)
+    yield op
+
+@case("turn.swarm", fresh=True, max_number=DENSE_TURNS)
+@contextmanager
+def turn_swarm():
+    game_state = dense_game(count=SWARM_ENEMIES)
+    log = NullLog()
+    def op():
+        game_state.process_turn(log)
+    yield op
+
+@case("render.frame")
+@asynccontextmanager
+async def render_frame():
+    from textual.app import App
+    from ui.display import GameDisplay
+    class RenderHarness(App):
+        def compose(self):
+            yield GameDisplay(id="game_display")
+    app = RenderHarness()
+    async with app.run_test(size=(120, 40)):
+        display = app.query_one(GameDisplay)
+        game_state = dense_game(count=40)
+        console = app.console
+        options = console.options.update_width(display.size.width)
+        def op():
+            display.render_game(game_state)
+            console.render_lines(display.render(), options)
+        yield op
+
+def replay_case(filename: str) -> BenchCase:
+    """Turn processing on a recorded trace: one op replays the whole file."""
+    from data.replay import Replay, ReplayEngine
+    replay = Replay.load(filename)
+    @contextmanager
+    def setup():
+        def op():
+            ReplayEngine(replay, checkpoint_every=len(replay) + 1).run()
+        yield op
+    return BenchCase(f"replay.{filename}", setup, ops=max(1, len(replay)))
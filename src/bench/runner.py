@@ -0,0 +1,117 @@
+import asyncio
+import datetime
+import platform
+import statistics
+import time
+from typing import Dict, List, Optional
+from bench.cases import BenchCase
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    index = fraction * (len(sorted_values) - 1)
+    low = int(index)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (index - low)
+
+def time_calls(op, number: int) -> float:
+    started = time.perf_counter()
+    for _ in range(number):
+        op()
+    return time.perf_counter() - started
+
+def calibrate(op, min_time: float, max_number: int) -> int:
+    """Calls per sample so one sample runs for at least `min_time`."""
+    number = 1
+    while True:
+        if max_number and number >= max_number:
+            return max_number
+        if time_calls(op, number) >= min_time:
+            return number
+        number *= 2
+
+def summarize(case: BenchCase, samples: List[float], number: int) -> Dict[str, float]:
+    """`samples` are seconds per operation, one per timed batch."""
+    ordered = sorted(samples)
+    median = statistics.median(ordered)
+    return {
+        "ops_per_sec": 1 / median if median else float("inf"),
+        "mean": statistics.fmean(ordered),
+        "min": ordered[0],
+        "p50": median,
+        "p90": percentile(ordered, 0.90),
+        "p99": percentile(ordered, 0.99),
+        "max": ordered[-1],
+        "stdev": statistics.stdev(ordered) if len(ordered) > 1 else 0.0,
+        "samples": len(ordered),
+        "number": number,
+        "ops": case.ops,
+    }
+
+def measure(case: BenchCase, op, repeat: int, min_time: float) -> Dict[str, float]:
+    number = calibrate(op, min_time, case.max_number)
+    samples = []
+    for _ in range(repeat):
+        if case.fresh:
+            with case.setup() as fresh_op:
+                samples.append(time_calls(fresh_op, number) / (number * case.ops))
+        else:
+            samples.append(time_calls(op, number) / (number * case.ops))
+    return summarize(case, samples, number)
+
+async def measure_async(case: BenchCase, repeat: int, min_time: float) -> Dict[str, float]:
+    async with case.setup() as op:
+        return measure(case, op, repeat, min_time)
+
+def run_case(case: BenchCase, repeat: int = 20, min_time: float = 0.05) -> Dict[str, float]:
+    manager = case.setup()
+    if hasattr(manager, "__aenter__"):
+        return asyncio.run(measure_async(case, repeat, min_time))
+    with manager as op:
+        return measure(case, op, repeat, min_time)
+
+def run_cases(cases: List[BenchCase], repeat: int = 20, min_time: float = 0.05, on_result=None):
+    results = {}
+    for case in cases:
+        results[case.name] = run_case(case, repeat, min_time)
+        if on_result:
+            on_result(case.name, results[case.name])
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "machine": platform.machine(),
+            "platform": platform.platform(),
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "repeat": repeat,
+            "min_time": min_time,
+        },
+        "results": results,
+    }
+
+def compare_results(baseline, current, threshold: float = 0.10, metric: str = "p50") -> List[Dict[str, object]]:
+    """Per-case change of `metric` (seconds per op, lower is better); a case
+    regresses when it got slower by more than `threshold`."""
+    rows = []
+    for name in sorted(set(baseline["results"]) | set(current["results"])):
+        old = baseline["results"].get(name)
+        new = current["results"].get(name)
+        row = {"name": name, "old": old and old[metric], "new": new and new[metric], "change": None, "status": "missing"}
+        if old and new:
+            row["change"] = new[metric] / old[metric] - 1
+            if row["change"] > threshold:
+                row["status"] = "regression"
+            elif row["change"] < -threshold:
+                row["status"] = "improvement"
+            else:
+                row["status"] = "same"
+        elif new:
+            row["status"] = "new"
+        rows.append(row)
+    return rows
+
+def format_time(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return "-"
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f}{unit}"
+    return f"{seconds / 1e-9:.0f}ns"
@@ -3,7 +3,9 @@ Data module - Game state and save system.
 """
 
 from data.gameplay import GameState
+from data.rng import GameRNG
 
 __all__ = [
     'GameState',
+    'GameRNG',
 ]
\ No newline at end of file
@@ -0,0 +1,120 @@
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+from data import savefile
+from data.simulation import ACTIONS, NullLog, advance
+
+SNAPSHOT_PATTERN = re.compile(r"snapshot-(\d+)\.dat$")
+
+def atomic_write(path: str, data: bytes):
+    """Write to a temp file in the same directory, fsync it and rename it
+    over the target, so a crash leaves either the old or the new file."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+class Autosave:
+    """Rotating snapshots plus a per-action journal.
+
+    A snapshot is the full binary save; journal-N lists every action taken
+    after snapshot N, one per line. Resuming loads the newest readable
+    snapshot and replays its journal, which lands on the exact turn the
+    session stopped at without serializing the world on every keypress.
+    All file work runs in order on one background thread."""
+    def __init__(self, directory: str, keep: int = 3, snapshot_every: int = 100, background: bool = True):
+        self.directory = directory
+        self.keep = keep
+        self.snapshot_every = snapshot_every
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="autosave") if background else None
+        self.sequence = max(self.snapshot_numbers(), default=0)
+        self.journal_length = 0
+    def snapshot_path(self, sequence: int) -> str:
+        return os.path.join(self.directory, f"snapshot-{sequence:06d}.dat")
+    def journal_path(self, sequence: int) -> str:
+        return os.path.join(self.directory, f"journal-{sequence:06d}.log")
+    def snapshot_numbers(self) -> List[int]:
+        if not os.path.isdir(self.directory):
+            return []
+        numbers = []
+        for name in os.listdir(self.directory):
+            match = SNAPSHOT_PATTERN.match(name)
+            if match:
+                numbers.append(int(match.group(1)))
+        return sorted(numbers)
+    def _submit(self, task, *args):
+        if self.executor:
+            return self.executor.submit(task, *args)
+        task(*args)
+        return None
+    def start(self, game_state):
+        """Begin a new game: drop the previous run's files and snapshot."""
+        self._submit(self._clear)
+        self.sequence = 0
+        self.snapshot(game_state)
+    def snapshot(self, game_state, wait: bool = False):
+        state = game_state.save_data()
+        self.sequence += 1
+        self.journal_length = 0
+        future = self._submit(self._write_snapshot, self.sequence, state)
+        if wait and future:
+            future.result()
+    def record(self, game_state, action: str):
+        if action not in ACTIONS:
+            return
+        if self.journal_length >= self.snapshot_every:
+            self.snapshot(game_state)
+            return
+        self.journal_length += 1
+        self._submit(self._append_journal, self.sequence, action)
+    def flush(self):
+        if self.executor:
+            self.executor.submit(lambda: None).result()
+    def close(self):
+        if self.executor:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+    def _clear(self):
+        if not os.path.isdir(self.directory):
+            return
+        for name in os.listdir(self.directory):
+            if name.startswith(("snapshot-", "journal-")):
+                os.remove(os.path.join(self.directory, name))
+    def _write_snapshot(self, sequence: int, state):
+        os.makedirs(self.directory, exist_ok=True)
+        atomic_write(self.snapshot_path(sequence), savefile.pack(state))
+        open(self.journal_path(sequence), "w").close()
+        for old in self.snapshot_numbers()[:-self.keep]:
+            for path in (self.snapshot_path(old), self.journal_path(old)):
+                if os.path.exists(path):
+                    os.remove(path)
+    def _append_journal(self, sequence: int, action: str):
+        with open(self.journal_path(sequence), "a") as f:
+            f.write(action + "\n")
+    def read_journal(self, sequence: int) -> List[str]:
+        try:
+            with open(self.journal_path(sequence)) as f:
+                lines = f.read().split("\n")
+        except FileNotFoundError:
+            return []
+        return [line for line in lines if line in ACTIONS]
+    def resume(self, game_state_class, log=None) -> Optional[object]:
+        """Newest snapshot that loads, fast-forwarded through its journal;
+        None when there is nothing to resume."""
+        self.flush()
+        for sequence in reversed(self.snapshot_numbers()):
+            try:
+                game_state = game_state_class.load_from_file(self.snapshot_path(sequence))
+            except (OSError, savefile.SaveFormatError):
+                continue
+            replay_log = log if log is not None else NullLog()
+            for action in self.read_journal(sequence):
+                advance(game_state, action, replay_log)
+            self.sequence = sequence
+            self.journal_length = 0
+            self.snapshot(game_state)
+            return game_state
+        return None
@@ -0,0 +1,134 @@
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Tuple
+from data.bots import create_policy
+from data.events import Event, EventLog
+from data.floorcache import FLOOR_CACHE
+from data.simulation import GameResult, run_game
+
+FINAL_FLOOR = 5
+
+class ShardResult:
+    """Outcome records of one seed range plus the per-turn sanity sums and
+    event tallies of its games, small enough to pickle back from a worker
+    process."""
+    def __init__(self):
+        self.results: List[GameResult] = []
+        self.sanity_sums: List[int] = []
+        self.sanity_counts: List[int] = []
+        self.event_counts = Counter()
+        self.event_amounts = Counter()
+    def record_event(self, event: Event):
+        self.event_counts[event.kind] += 1
+        self.event_amounts[event.kind] += event.amount
+    def record_sanity(self, turn: int, sanity: int):
+        while len(self.sanity_sums) < turn:
+            self.sanity_sums.append(0)
+            self.sanity_counts.append(0)
+        self.sanity_sums[turn - 1] += sanity
+        self.sanity_counts[turn - 1] += 1
+
+def run_shard(seed_start: int, count: int, policy_name: str, max_actions: int, world_size=None,
+              generators=None, floor_cache=None) -> ShardResult:
+    if floor_cache:
+        FLOOR_CACHE.use_store(floor_cache)
+    shard = ShardResult()
+    policy = create_policy(policy_name)
+    log = EventLog(capacity=0)
+    log.subscribe(shard.record_event)
+    for seed in range(seed_start, seed_start + count):
+        last_turn = [0]
+        def observe(game_state):
+            if game_state.turn_count != last_turn[0]:
+                last_turn[0] = game_state.turn_count
+                shard.record_sanity(game_state.turn_count, game_state.player.sanity)
+        shard.results.append(run_game(seed, policy, max_actions, log=log,
+                                      observer=observe, world_size=world_size,
+                                      generators=generators))
+    return shard
+
+def shard_seeds(seed_start: int, games: int, shard_size: int) -> List[Tuple[int, int]]:
+    shards = []
+    for start in range(seed_start, seed_start + games, shard_size):
+        shards.append((start, min(shard_size, seed_start + games - start)))
+    return shards
+
+class BatchStats:
+    def __init__(self):
+        self.games = 0
+        self.outcomes = Counter()
+        self.death_causes = Counter()
+        self.floors = Counter()
+        self.sanity_sums: List[int] = []
+        self.sanity_counts: List[int] = []
+        self.event_counts = Counter()
+        self.event_amounts = Counter()
+    def add_result(self, result: GameResult):
+        self.games += 1
+        self.outcomes[result.outcome] += 1
+        self.floors[result.floor] += 1
+        if result.death_cause:
+            self.death_causes[result.death_cause] += 1
+    def merge(self, shard: ShardResult):
+        for result in shard.results:
+            self.add_result(result)
+        self.event_counts.update(shard.event_counts)
+        self.event_amounts.update(shard.event_amounts)
+        if len(self.sanity_sums) < len(shard.sanity_sums):
+            missing = len(shard.sanity_sums) - len(self.sanity_sums)
+            self.sanity_sums.extend([0] * missing)
+            self.sanity_counts.extend([0] * missing)
+        for turn, total in enumerate(shard.sanity_sums):
+            self.sanity_sums[turn] += total
+            self.sanity_counts[turn] += shard.sanity_counts[turn]
+    def survival_curve(self) -> Dict[int, float]:
+        """Share of games that reached at least each floor."""
+        curve = {}
+        if not self.games:
+            return curve
+        reached = 0
+        top = max([FINAL_FLOOR] + list(self.floors))
+        for floor in range(top, 0, -1):
+            reached += self.floors.get(floor, 0)
+            curve[floor] = reached / self.games
+        return dict(sorted(curve.items()))
+    def sanity_trajectory(self) -> List[float]:
+        """Mean sanity per turn over the games still running at that turn."""
+        return [total / count for total, count in zip(self.sanity_sums, self.sanity_counts) if count]
+    def as_dict(self):
+        return {
+            "games": self.games,
+            "outcomes": dict(self.outcomes),
+            "death_causes": dict(self.death_causes.most_common()),
+            "survival": self.survival_curve(),
+            "sanity": [round(value, 2) for value in self.sanity_trajectory()],
+            "events": {kind: {"count": count, "amount": self.event_amounts[kind]}
+                       for kind, count in self.event_counts.most_common()},
+        }
+
+def run_batch(seed_start: int, games: int, policy_name: str, max_actions: int = 5000,
+              workers: int = 0, shard_size: int = 250, on_shard=None, world_size=None,
+              generators=None, floor_cache=None) -> BatchStats:
+    """Play a seed range across a process pool, one worker per core by
+    default, merging shard results as they complete. `floor_cache` is a
+    directory where workers share generated floors (see FloorCache)."""
+    stats = BatchStats()
+    shards = shard_seeds(seed_start, games, shard_size)
+    if workers == 1:
+        for start, count in shards:
+            shard = run_shard(start, count, policy_name, max_actions, world_size, generators, floor_cache)
+            stats.merge(shard)
+            if on_shard:
+                on_shard(shard)
+        return stats
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        futures = [pool.submit(run_shard, start, count, policy_name, max_actions, world_size, generators,
+                               floor_cache)
+                   for start, count in shards]
+        for future in as_completed(futures):
+            shard = future.result()
+            stats.merge(shard)
+            if on_shard:
+                on_shard(shard)
+    return stats
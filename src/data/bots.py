@@ -0,0 +1,75 @@
+import random
+
+DIRECTIONS = {
+    "up": (0, -1),
+    "down": (0, 1),
+    "left": (-1, 0),
+    "right": (1, 0),
+}
+
+def direction_to(from_x, from_y, to_x, to_y):
+    for name, (dx, dy) in DIRECTIONS.items():
+        if from_x + dx == to_x and from_y + dy == to_y:
+            return name
+    return None
+
+class BotPolicy:
+    name = "wait"
+    def __init__(self, seed=None):
+        self.rng = random.Random(seed)
+    def reset(self, game_state):
+        self.rng.seed(game_state.seed)
+    def choose(self, game_state) -> str:
+        return "wait"
+
+class RandomPolicy(BotPolicy):
+    name = "random"
+    def choose(self, game_state) -> str:
+        return self.rng.choice(list(DIRECTIONS))
+
+class GreedyExitPolicy(BotPolicy):
+    name = "greedy"
+    def choose(self, game_state) -> str:
+        if game_state.in_combat:
+            return "wait"
+        player = game_state.player
+        dungeon = game_state.dungeon
+        if not dungeon.exit_pos:
+            return "wait"
+        dx = dungeon.exit_pos[0] - player.x
+        dy = dungeon.exit_pos[1] - player.y
+        horizontal = "right" if dx > 0 else "left"
+        vertical = "down" if dy > 0 else "up"
+        preferred = [horizontal, vertical] if abs(dx) > abs(dy) else [vertical, horizontal]
+        others = [name for name in DIRECTIONS if name not in preferred]
+        self.rng.shuffle(others)
+        for name in preferred + others:
+            step_x = player.x + DIRECTIONS[name][0]
+            step_y = player.y + DIRECTIONS[name][1]
+            if dungeon.is_walkable(step_x, step_y) or dungeon.get_enemy_at(step_x, step_y):
+                return name
+        return "wait"
+
+class PathfindingPolicy(GreedyExitPolicy):
+    name = "path"
+    def choose(self, game_state) -> str:
+        if game_state.in_combat:
+            return "wait"
+        player = game_state.player
+        dungeon = game_state.dungeon
+        if dungeon.exit_pos:
+            step = dungeon.pathfinder.next_step((player.x, player.y), dungeon.exit_pos)
+            if step:
+                return direction_to(player.x, player.y, step[0], step[1])
+        return super().choose(game_state)
+
+POLICIES = {
+    "wait": BotPolicy,
+    "random": RandomPolicy,
+    "greedy": GreedyExitPolicy,
+    "path": PathfindingPolicy,
+}
+
+def create_policy(name: str, seed=None) -> BotPolicy:
+    policy_class = POLICIES.get(name, RandomPolicy)
+    return policy_class(seed)
@@ -0,0 +1,54 @@
+import json
+from collections import deque
+from typing import Callable, List, NamedTuple, Optional
+
+HISTORY = 500
+
+class Event(NamedTuple):
+    """One thing that happened. `turn` is the turn count when the action
+    that caused it began; `actor` is the enemy involved (0 = none) and
+    `amount` the damage, sanity or other quantity it carries."""
+    turn: int
+    kind: str
+    text: str = ""
+    style: str = "info"
+    actor: int = 0
+    amount: int = 0
+    detail: str = ""
+    def as_dict(self):
+        return self._asdict()
+
+class EventLog:
+    """The last `capacity` events in a ring buffer (None keeps everything),
+    handed to every subscriber as they happen and, when `stream_path` is
+    set, appended to that file as JSON lines. `add_message` records plain
+    text as a "message" event."""
+    def __init__(self, capacity: Optional[int] = HISTORY, stream_path: Optional[str] = None):
+        self.events = deque(maxlen=capacity)
+        self.turn = 0
+        self.subscribers: List[Callable[[Event], None]] = []
+        self.stream = open(stream_path, "a", encoding="utf-8") if stream_path else None
+    def emit(self, kind: str, text: str = "", style: str = "info", actor: int = 0,
+             amount: int = 0, detail: str = "") -> Event:
+        event = Event(self.turn, kind, text, style, actor, amount, detail)
+        self.events.append(event)
+        if self.stream:
+            self.stream.write(json.dumps(event.as_dict()) + "\n")
+        for subscriber in self.subscribers:
+            subscriber(event)
+        return event
+    def add_message(self, message: str, msg_type: str = "info"):
+        self.emit("message", message, msg_type)
+    def subscribe(self, subscriber: Callable[[Event], None]):
+        self.subscribers.append(subscriber)
+    def unsubscribe(self, subscriber: Callable[[Event], None]):
+        if subscriber in self.subscribers:
+            self.subscribers.remove(subscriber)
+    def clear(self):
+        self.events.clear()
+    def close(self):
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+    def __len__(self):
+        return len(self.events)
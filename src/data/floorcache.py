@@ -0,0 +1,118 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+from data import savefile
+from map.dungeon import Dungeon
+from map.generators import create_generator
+
+FLOOR_CACHE_SIZE = 32
+# Every key restore_dungeon() reads from a standard floor's record.
+TEMPLATE_KEYS = frozenset(("floor_level", "seed", "width", "height", "start", "exit", "next_enemy_id",
+                           "generator", "rng", "grid", "seen", "corridors", "rooms", "enemies"))
+
+def floor_key(seed, floor_level: int, generator) -> str:
+    """Content address of a standard floor: everything its layout depends
+    on, so a new generator version or save format never reads an old one."""
+    text = f"{savefile.SAVE_VERSION}:{seed}:{floor_level}:{generator.name}:{generator.version}"
+    return hashlib.sha1(text.encode("ascii")).hexdigest()
+
+class FloorCache:
+    """Generated floors by content address, so the same seed and floor is
+    laid out once per process (and once per `store_dir`).
+
+    A template is the capture_dungeon() record of a floor taken straight
+    after generation and never modified. build() stamps a new Dungeon from
+    it through restore_dungeon(): the grid and bitmaps are copied and rooms,
+    traps, features and enemies are created fresh from their records, so
+    every game owns its floor and nothing a game does reaches the template.
+    The `capacity` most recently used templates stay in memory; with
+    `store_dir` set they are also written there in the save format, where
+    other processes (batch workers, later runs) pick them up."""
+    def __init__(self, capacity: int = FLOOR_CACHE_SIZE, store_dir: Optional[str] = None):
+        self.capacity = capacity
+        self.store_dir = store_dir
+        self.templates: "OrderedDict[str, dict]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+    def use_store(self, store_dir: Optional[str]):
+        self.store_dir = store_dir
+    def build(self, floor_level: int, seed, rng, generator=None) -> Dungeon:
+        if seed is None or not self.capacity:
+            return Dungeon(floor_level, seed, rng, generator=generator)
+        key = floor_key(seed, floor_level, create_generator(generator))
+        template = self.get(key)
+        if template is not None:
+            try:
+                return savefile.restore_dungeon(template, rng)
+            except savefile.CORRUPTION_ERRORS:
+                self.forget(key)
+        dungeon = Dungeon(floor_level, seed, rng, generator=generator)
+        self.put(key, savefile.capture_dungeon(dungeon))
+        return dungeon
+    def get(self, key: str) -> Optional[dict]:
+        with self.lock:
+            template = self.templates.get(key)
+            if template is not None:
+                self.templates.move_to_end(key)
+                self.hits += 1
+                return template
+        template = self.load(key)
+        with self.lock:
+            if template is None:
+                self.misses += 1
+            else:
+                self.loads += 1
+                self.remember(key, template)
+        return template
+    def put(self, key: str, template: dict):
+        with self.lock:
+            self.remember(key, template)
+        if self.store_dir:
+            self.save(key, template)
+    def remember(self, key: str, template: dict):
+        self.templates[key] = template
+        self.templates.move_to_end(key)
+        while len(self.templates) > self.capacity:
+            self.templates.popitem(last=False)
+    def forget(self, key: str):
+        """Drop a template that failed to stamp; the floor is generated again."""
+        with self.lock:
+            self.templates.pop(key, None)
+    def path(self, key: str) -> str:
+        return os.path.join(self.store_dir, f"{key}.floor")
+    def load(self, key: str) -> Optional[dict]:
+        """The stored template, or None when there is none or it is unreadable."""
+        if not self.store_dir:
+            return None
+        try:
+            with open(self.path(key), "rb") as f:
+                template = savefile.unpack(f.read())
+        except (OSError, savefile.SaveFormatError):
+            return None
+        if not isinstance(template, dict) or not TEMPLATE_KEYS <= template.keys():
+            return None
+        return template
+    def save(self, key: str, template: dict):
+        # Best effort: a floor that cannot be stored is simply generated
+        # again. Workers may write the same floor at once; each renames its
+        # own temp file over the target, and both write identical bytes.
+        path = self.path(key)
+        tmp_path = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.store_dir, exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                f.write(savefile.pack(template))
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    def clear(self):
+        with self.lock:
+            self.templates.clear()
+            self.hits = self.misses = self.loads = 0
+
+FLOOR_CACHE = FloorCache()
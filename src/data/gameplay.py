@@ -1,21 +1,56 @@
-import json
 import random
+from concurrent.futures import ThreadPoolExecutor
 from rich.text import Text
 from entity.player import Player, Item
-from map.dungeon import Dungeon
+from map.chunked import ChunkedDungeon
+from map.generators import generator_for
+from data.rng import GameRNG
+from data import savefile
+from data.floorcache import FLOOR_CACHE
+from debug.profiler import PROFILER
+
+_prefetch_pool = None
+BAR_WIDTH = 20
+# Filled and empty halves of a stat bar for every fill level.
+BARS = [("█" * filled, "░" * (BAR_WIDTH - filled)) for filled in range(BAR_WIDTH + 1)]
+
+def _prefetch_executor():
+    global _prefetch_pool
+    if _prefetch_pool is None:
+        _prefetch_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="floor-prefetch")
+    return _prefetch_pool
+
+def write_save(save_data, filename: str):
+    """Write captured state: a JSON export for .json files, the compact
+    binary format otherwise."""
+    try:
+        if filename.endswith(".json"):
+            with open(filename, 'w') as f:
+                f.write(savefile.to_json(save_data))
+        else:
+            with open(filename, 'wb') as f:
+                f.write(savefile.pack(save_data))
+    except Exception as e:
+        print(f"Save failed: {e}")
 
 class GameState:
-    def __init__(self, seed=None):
+    def __init__(self, seed=None, prefetch=True, rng=None, dungeon=None, world_size=None, generators=None):
         if seed is None:
             seed = random.randint(0, 999999)
         self.seed = seed
+        self.rng = rng or GameRNG(seed)
+        self.world_size = world_size
+        self.generators = tuple(generators) if generators else None
         self.current_floor = 1
         self.turn_count = 0
         self.enemies_killed = 0
         self.player = Player()
-        self.dungeon = Dungeon(self.current_floor, self.seed)
+        if dungeon is None:
+            dungeon = self.build_floor(self.current_floor)
+        self.dungeon = dungeon
         if self.dungeon.start_pos:
             self.player.x, self.player.y = self.dungeon.start_pos
+        self.update_fov()
         self.in_combat = False
         self.combat_enemy = None
         self.death_cause = ""
@@ -23,6 +58,9 @@ class GameState:
         self.final_puzzle_active = False
         self.puzzle_attempts = 0
         self.narrative_clues = []
+        self.prefetch = prefetch
+        self._next_dungeon = None
+        self.prefetch_next_floor()
     def process_action(self, action: str, log):
         if not self.player.alive:
             return "game_over"
@@ -31,12 +69,14 @@ class GameState:
         if self.final_puzzle_active:
             return self.process_final_puzzle(action, log)
         if action in ["up", "down", "left", "right"]:
-            result = self.process_movement(action, log)
+            with PROFILER.span("movement"):
+                result = self.process_movement(action, log)
             if result:
                 return result
         elif action == "wait":
-            log.add_message("You wait and listen...", "dim")
-        self.process_turn(log)
+            log.emit("wait", "You wait and listen...", "dim")
+        with PROFILER.span("process_turn"):
+            self.process_turn(log)
         if (self.player.x, self.player.y) == self.dungeon.exit_pos:
             if self.dungeon.is_final_floor:
                 return self.trigger_final_puzzle(log)
@@ -48,46 +88,48 @@ class GameState:
         if not self.dungeon.is_walkable(new_x, new_y):
             enemy = self.dungeon.get_enemy_at(new_x, new_y)
             if enemy:
-                log.add_message(f"You attack the {enemy.name}!", "warning")
+                log.emit("attack", f"You attack the {enemy.name}!", "warning", actor=enemy.id)
                 self.initiate_combat(enemy, log)
                 return None
-            log.add_message("You can't move there.", "warning")
+            log.emit("blocked", "You can't move there.", "warning")
             return None
         self.player.update_position(new_x, new_y, direction)
-        trap = self.dungeon.get_trap_at(new_x, new_y)
-        if trap and not trap.triggered:
-            trap.trigger(self.player, log)
-            if not self.player.alive:
-                self.death_cause = "You were killed by a trap."
-                return "game_over"
-        feature = self.dungeon.get_feature_at(new_x, new_y)
-        if feature and not feature.used:
-            feature.interact(self.player, log)
+        self.update_fov()
+        with PROFILER.span("traps_features"):
+            trap = self.dungeon.get_trap_at(new_x, new_y)
+            if trap and not trap.triggered:
+                trap.trigger(self.player, log, self.rng.combat)
+                self.dungeon.mark_dirty(new_x, new_y)
+                if not self.player.alive:
+                    self.death_cause = "You were killed by a trap."
+                    return "game_over"
+            feature = self.dungeon.get_feature_at(new_x, new_y)
+            if feature and not feature.used:
+                feature.interact(self.player, log, self.rng.loot)
+                self.dungeon.mark_dirty(new_x, new_y)
         room = self.dungeon.get_room_at(new_x, new_y)
         if room:
             if not room.visited:
                 room.visited = True
                 if room.is_echo_zone:
-                    log.add_message("This room feels... familiar. Wrong.", "error")
+                    log.emit("echo_zone", "This room feels... familiar. Wrong.", "error", amount=5)
                     self.player.lose_sanity(5)
                     self.narrative_clues.append("echo_zone")
         return None
+    def update_fov(self):
+        self.dungeon.fov.update(self.player.x, self.player.y, self.player.vision_range)
     def process_turn(self, log):
         self.turn_count += 1
         sanity_loss = 1 + (self.current_floor // 2)
         self.player.lose_sanity(sanity_loss)
         self.player.restore_stamina(5)
-        for enemy in self.dungeon.enemies:
-            if enemy.alive:
-                result = enemy.act(self.player, self.dungeon, log)
-                if result == "combat":
-                    self.initiate_combat(enemy, log)
+        self.dungeon.scheduler.run_turn(self.player, log, self.initiate_combat)
         if self.player.sanity <= 0:
             self.death_cause = "The Labyrinth absorbed your mind."
             self.player.alive = False
             return "game_over"
         if self.player.sanity < 20:
-            if random.random() < 0.3:
+            if self.rng.ai.random() < 0.3:
                 hallucinations = [
                     "The walls breathe in and out.",
                     "You see yourself in the corner, watching.",
@@ -95,11 +137,11 @@ class GameState:
                     "The floor ripples like water.",
                     "Your shadow moves independently.",
                 ]
-                log.add_message(random.choice(hallucinations), "error")
+                log.emit("hallucination", self.rng.ai.choice(hallucinations), "error")
     def initiate_combat(self, enemy, log):
         self.in_combat = True
         self.combat_enemy = enemy
-        log.add_message(f"Combat begins with {enemy.name}!", "warning")
+        log.emit("combat", f"Combat begins with {enemy.name}!", "warning", actor=enemy.id)
         self.narrative_clues.append(f"fought_{enemy.name.lower()}")
     def process_combat(self, action: str, log):
         if not self.combat_enemy or not self.combat_enemy.alive:
@@ -108,86 +150,109 @@ class GameState:
             return "continue"
         enemy = self.combat_enemy
         if action in ["up", "down", "left", "right", "wait"]:
-            player_damage = self.player.attack + random.randint(-2, 3)
+            player_damage = self.player.attack + self.rng.combat.randint(-2, 3)
             actual_damage = enemy.take_damage(player_damage)
-            log.add_message(f"You hit {enemy.name} for {actual_damage} damage!", "success")
+            log.emit("hit", f"You hit {enemy.name} for {actual_damage} damage!", "success",
+                     actor=enemy.id, amount=actual_damage)
             if not enemy.alive:
-                log.add_message(f"{enemy.name} defeated!", "success")
+                log.emit("kill", f"{enemy.name} defeated!", "success", actor=enemy.id, detail=enemy.name)
                 self.enemies_killed += 1
                 self.in_combat = False
                 self.combat_enemy = None
-                self.dungeon.remove_dead_enemies()
+                self.dungeon.remove_enemy(enemy)
                 if enemy.name == "Shade":
-                    log.add_message("You feel a part of yourself fade...", "error")
+                    log.emit("fade", "You feel a part of yourself fade...", "error", amount=10)
                     self.player.lose_sanity(10)
                 return "continue"
-        enemy_damage = enemy.calculate_damage()
+        enemy_damage = enemy.calculate_damage(self.rng.combat)
         actual_damage = self.player.take_damage(enemy_damage)
-        log.add_message(f"{enemy.name} hits you for {actual_damage} damage!", "error")
+        log.emit("hurt", f"{enemy.name} hits you for {actual_damage} damage!", "error",
+                 actor=enemy.id, amount=actual_damage, detail=enemy.name)
         if not self.player.alive:
             self.death_cause = f"You were slain by a {enemy.name}."
             return "game_over"
         return "continue"
     def trigger_final_puzzle(self, log):
         self.final_puzzle_active = True
-        log.add_message("You enter the Chamber of Mirrors.", "warning")
-        log.add_message("Multiple reflections surround you.", "warning")
-        log.add_message("Which one is real?", "error")
+        log.emit("puzzle", "You enter the Chamber of Mirrors.", "warning")
+        log.emit("puzzle", "Multiple reflections surround you.", "warning")
+        log.emit("puzzle", "Which one is real?", "error")
         if self.player.sanity < 30:
-            log.add_message("Your mind is too fractured to see clearly...", "error")
+            log.emit("puzzle", "Your mind is too fractured to see clearly...", "error")
             return self.show_fake_ending(log)
         return self.show_riddle(log)
     def show_riddle(self, log):
-        log.add_message("", "info")
-        log.add_message("A voice echoes:", "warning")
-        log.add_message("'The first shadow was your own,", "dim")
-        log.add_message("The second was fear,", "dim")
-        log.add_message("The third remains unseen.'", "dim")
-        log.add_message("", "info")
-        log.add_message("Do you step through the exit? [Y/N]", "warning")
+        log.emit("puzzle", "", "info")
+        log.emit("puzzle", "A voice echoes:", "warning")
+        log.emit("puzzle", "'The first shadow was your own,", "dim")
+        log.emit("puzzle", "The second was fear,", "dim")
+        log.emit("puzzle", "The third remains unseen.'", "dim")
+        log.emit("puzzle", "", "info")
+        log.emit("puzzle", "Do you step through the exit? [Y/N]", "warning")
         if "echo_zone" in self.narrative_clues and len(self.narrative_clues) >= 3:
-            log.add_message("Something tells you this isn't right...", "warning")
-            log.add_message("The real exit is behind you.", "success")
+            log.emit("ending", "Something tells you this isn't right...", "warning")
+            log.emit("ending", "The real exit is behind you.", "success")
             self.true_ending = True
             return "victory"
         else:
-            log.add_message("You step through...", "dim")
+            log.emit("ending", "You step through...", "dim")
             return "victory"
     def show_fake_ending(self, log):
-        log.add_message("The exit shimmers before you.", "warning")
-        log.add_message("Freedom... finally...", "dim")
-        log.add_message("You step through...", "dim")
-        log.add_message("", "info")
-        log.add_message("But you're still here.", "error")
-        log.add_message("You've always been here.", "error")
-        log.add_message("You always will be.", "error")
+        log.emit("ending", "The exit shimmers before you.", "warning")
+        log.emit("ending", "Freedom... finally...", "dim")
+        log.emit("ending", "You step through...", "dim")
+        log.emit("ending", "", "info")
+        log.emit("ending", "But you're still here.", "error")
+        log.emit("ending", "You've always been here.", "error")
+        log.emit("ending", "You always will be.", "error")
         self.death_cause = "You became an Echo, forever trapped."
         self.player.alive = False
         return "game_over"
     def process_final_puzzle(self, action: str, log):
         return "victory"
+    def build_floor(self, floor_level):
+        """The classic 80x40 floor laid out by the generator picked for this
+        floor (stamped from FLOOR_CACHE when it was built before), or a
+        chunked one in large-map mode."""
+        if self.world_size:
+            width, height = self.world_size
+            return ChunkedDungeon(floor_level, self.seed, self.rng, width=width, height=height)
+        return FLOOR_CACHE.build(floor_level, self.seed, self.rng, generator_for(self.generators, floor_level))
+    def prefetch_next_floor(self):
+        """Generate the next floor on a background thread. Floors only draw
+        from their own generation stream, so the result is identical to
+        building it on demand."""
+        self._next_dungeon = None
+        if self.prefetch and not self.dungeon.is_final_floor:
+            floor = self.current_floor + 1
+            future = _prefetch_executor().submit(self.build_floor, floor)
+            self._next_dungeon = (floor, future)
     def next_floor(self):
         self.current_floor += 1
-        self.dungeon = Dungeon(self.current_floor, self.seed)
+        pending = self._next_dungeon
+        if pending and pending[0] == self.current_floor:
+            self.dungeon = pending[1].result()
+        else:
+            self.dungeon = self.build_floor(self.current_floor)
         if self.dungeon.start_pos:
             self.player.x, self.player.y = self.dungeon.start_pos
+        self.update_fov()
         self.player.heal(20)
         self.player.restore_stamina(50)
+        self.prefetch_next_floor()
     def get_stats_text(self):
         text = Text()
         text.append("═══ STATS ═══\n\n", style="bold cyan")
         hp_percent = self.player.hp / self.player.max_hp
         hp_color = "green" if hp_percent > 0.5 else "yellow" if hp_percent > 0.25 else "red"
-        hp_bar = "█" * int(hp_percent * 20)
-        hp_empty = "░" * (20 - len(hp_bar))
+        hp_bar, hp_empty = BARS[max(0, min(BAR_WIDTH, int(hp_percent * BAR_WIDTH)))]
         text.append(f"HP:  ", style="bold")
         text.append(f"{hp_bar}", style=hp_color)
         text.append(f"{hp_empty}", style="dim")
         text.append(f" {self.player.hp}/{self.player.max_hp}\n", style="dim")
         sanity_percent = self.player.sanity / self.player.max_sanity
         sanity_color = "cyan" if sanity_percent > 0.5 else "yellow" if sanity_percent > 0.25 else "red"
-        sanity_bar = "█" * int(sanity_percent * 20)
-        sanity_empty = "░" * (20 - len(sanity_bar))
+        sanity_bar, sanity_empty = BARS[max(0, min(BAR_WIDTH, int(sanity_percent * BAR_WIDTH)))]
         text.append(f"SAN: ", style="bold")
         text.append(f"{sanity_bar}", style=sanity_color)
         text.append(f"{sanity_empty}", style="dim")
@@ -218,34 +283,29 @@ class GameState:
         text.append(f"\n({len(self.player.inventory.items)}/{self.player.inventory.max_size})\n", 
                    style="dim")
         return text
+    def save_data(self):
+        return savefile.capture(self)
     def save_to_file(self, filename: str):
-        save_data = {
-            "seed": self.seed,
-            "current_floor": self.current_floor,
-            "turn_count": self.turn_count,
-            "enemies_killed": self.enemies_killed,
-            "player": {
-                "x": self.player.x,
-                "y": self.player.y,
-                "hp": self.player.hp,
-                "stamina": self.player.stamina,
-                "sanity": self.player.sanity,
-                "base_attack": self.player.base_attack,
-                "base_defense": self.player.base_defense,
-            },
-            "narrative_clues": self.narrative_clues,
-        }
+        write_save(self.save_data(), filename)
+    @classmethod
+    def load_from_file(cls, filename: str, prefetch=True):
+        """Load a binary save or JSON export; saves written before the
+        full-world format are rebuilt by regenerating the floor. Unreadable
+        files raise OSError or savefile.SaveFormatError."""
+        with open(filename, 'rb') as f:
+            data = f.read()
+        if savefile.is_binary_save(data):
+            return savefile.restore(cls, savefile.unpack(data), prefetch)
+        save_data = savefile.from_json(data)
+        if isinstance(save_data, dict) and "version" in save_data:
+            return savefile.restore(cls, save_data, prefetch)
         try:
-            with open(filename, 'w') as f:
-                json.dump(save_data, f, indent=2)
-        except Exception as e:
-            print(f"Save failed: {e}")
+            return cls.load_legacy(save_data, prefetch)
+        except savefile.CORRUPTION_ERRORS as e:
+            raise savefile.SaveFormatError(f"Save data is malformed: {e!r}") from e
     @classmethod
-    def load_from_file(cls, filename: str):
-        """Load game state from JSON file."""
-        with open(filename, 'r') as f:
-            save_data = json.load(f)
-        game_state = cls(seed=save_data["seed"])
+    def load_legacy(cls, save_data, prefetch=True):
+        game_state = cls(seed=save_data["seed"], prefetch=False)
         game_state.current_floor = save_data["current_floor"]
         game_state.turn_count = save_data["turn_count"]
         game_state.enemies_killed = save_data["enemies_killed"]
@@ -258,5 +318,8 @@ class GameState:
         game_state.player.sanity = player_data["sanity"]
         game_state.player.base_attack = player_data["base_attack"]
         game_state.player.base_defense = player_data["base_defense"]
-        game_state.dungeon = Dungeon(game_state.current_floor, game_state.seed)
+        game_state.dungeon = game_state.build_floor(game_state.current_floor)
+        game_state.update_fov()
+        game_state.prefetch = prefetch
+        game_state.prefetch_next_floor()
         return game_state
\ No newline at end of file
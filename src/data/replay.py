@@ -0,0 +1,144 @@
+import bisect
+import struct
+from typing import Dict, List, Optional, Tuple
+from data import savefile
+from data.gameplay import GameState
+from data.simulation import ACTIONS, NullLog, advance
+
+MAGIC = b"ECHR"
+REPLAY_VERSION = 3
+HEADER = struct.Struct("<4sHqII")
+WORLD = struct.Struct("<II")
+NAMES = struct.Struct("<H")
+ACTION_CODES = {action: code for code, action in enumerate(ACTIONS)}
+
+class ReplayFormatError(ValueError):
+    pass
+
+class Replay:
+    """A seed, an optional starting snapshot (for runs resumed from a save)
+    and the actions taken, one byte each. `world_size` is set for large-map
+    runs and `generators` when floors were not laid out by the default
+    generator; version 1 files predate both, version 2 the generators."""
+    def __init__(self, seed: int, actions: bytes = b"", start: bytes = b"", world_size: Optional[Tuple[int, int]] = None,
+                 generators: Optional[Tuple[str, ...]] = None):
+        self.seed = seed
+        self.actions = bytearray(actions)
+        self.start = start
+        self.world_size = world_size
+        self.generators = tuple(generators) if generators else None
+    def __len__(self):
+        return len(self.actions)
+    def action(self, index: int) -> str:
+        return ACTIONS[self.actions[index]]
+    def new_game(self, prefetch: bool = False) -> GameState:
+        if self.start:
+            return savefile.restore(GameState, savefile.unpack(self.start), prefetch)
+        return GameState(seed=self.seed, prefetch=prefetch, world_size=self.world_size, generators=self.generators)
+    def pack(self) -> bytes:
+        header = HEADER.pack(MAGIC, REPLAY_VERSION, self.seed, len(self.start), len(self.actions))
+        names = ",".join(self.generators or ()).encode("ascii")
+        return (header + WORLD.pack(*(self.world_size or (0, 0))) + NAMES.pack(len(names)) + names +
+                self.start + bytes(self.actions))
+    @classmethod
+    def unpack(cls, data: bytes) -> "Replay":
+        if len(data) < HEADER.size:
+            raise ReplayFormatError("Replay file is truncated")
+        magic, version, seed, start_length, count = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ReplayFormatError("Not an Echoes replay file")
+        if version > REPLAY_VERSION:
+            raise ReplayFormatError(f"Replay version {version} is newer than this game")
+        offset = HEADER.size
+        world_size = None
+        if version >= 2:
+            if len(data) < offset + WORLD.size:
+                raise ReplayFormatError("Replay file is truncated")
+            width, height = WORLD.unpack_from(data, offset)
+            world_size = (width, height) if width and height else None
+            offset += WORLD.size
+        generators = None
+        if version >= 3:
+            if len(data) < offset + NAMES.size:
+                raise ReplayFormatError("Replay file is truncated")
+            length = NAMES.unpack_from(data, offset)[0]
+            offset += NAMES.size
+            names = bytes(data[offset:offset + length]).decode("ascii", "replace")
+            generators = tuple(names.split(",")) if names else None
+            offset += length
+        if len(data) != offset + start_length + count:
+            raise ReplayFormatError("Replay file is truncated")
+        start = data[offset:offset + start_length]
+        actions = data[offset + start_length:]
+        if any(code >= len(ACTIONS) for code in actions):
+            raise ReplayFormatError("Replay contains an unknown action")
+        return cls(seed, actions, start, world_size, generators)
+    def save(self, filename: str):
+        with open(filename, "wb") as f:
+            f.write(self.pack())
+    @classmethod
+    def load(cls, filename: str) -> "Replay":
+        with open(filename, "rb") as f:
+            return cls.unpack(f.read())
+
+class ReplayRecorder:
+    def __init__(self, game_state: GameState, from_save: bool = False):
+        start = savefile.pack(game_state.save_data()) if from_save else b""
+        self.replay = Replay(game_state.seed, start=start, world_size=game_state.world_size,
+                             generators=game_state.generators)
+    def record(self, action: str):
+        code = ACTION_CODES.get(action)
+        if code is not None:
+            self.replay.actions.append(code)
+    def save(self, filename: str):
+        self.replay.save(filename)
+
+class ReplayEngine:
+    """Re-executes a replay. `position` is the number of actions applied.
+    Every `checkpoint_every` actions the state is packed, so seeking starts
+    from the nearest checkpoint at or before the target instead of turn 0."""
+    def __init__(self, replay: Replay, checkpoint_every: int = 500, log=None):
+        self.replay = replay
+        self.checkpoint_every = checkpoint_every
+        self.log = log if log is not None else NullLog()
+        self.game_state = replay.new_game()
+        self.position = 0
+        self.result = "continue"
+        self.checkpoints: Dict[int, bytes] = {0: savefile.pack(self.game_state.save_data())}
+        self.checkpoint_positions: List[int] = [0]
+    @property
+    def finished(self) -> bool:
+        return self.position >= len(self.replay) or self.result in ("game_over", "victory")
+    def step(self) -> Optional[str]:
+        if self.finished:
+            return None
+        self.result = advance(self.game_state, self.replay.action(self.position), self.log)
+        self.position += 1
+        if self.position % self.checkpoint_every == 0 and self.position not in self.checkpoints:
+            self.checkpoints[self.position] = savefile.pack(self.game_state.save_data())
+            bisect.insort(self.checkpoint_positions, self.position)
+        return self.result
+    def run(self, until: Optional[int] = None) -> str:
+        """Play at full speed to `until` (or the end); returns the last result."""
+        target = len(self.replay) if until is None else min(until, len(self.replay))
+        while self.position < target and not self.finished:
+            self.step()
+        return self.result
+    def seek(self, position: int):
+        position = max(0, min(position, len(self.replay)))
+        if position < self.position or position - self.position > self.checkpoint_every:
+            checkpoint = self.checkpoint_positions[bisect.bisect_right(self.checkpoint_positions, position) - 1]
+            if checkpoint > self.position or position < self.position:
+                self.game_state = savefile.restore(GameState, savefile.unpack(self.checkpoints[checkpoint]), False)
+                self.position = checkpoint
+                self.result = "continue"
+        log, self.log = self.log, NullLog()
+        try:
+            self.run(position)
+        finally:
+            self.log = log
+
+def play_headless(replay: Replay) -> GameState:
+    engine = ReplayEngine(replay)
+    engine.run()
+    return engine.game_state
@@ -0,0 +1,19 @@
+import random
+
+class GameRNG:
+    """Independent random streams for one game.
+
+    Floor layouts come from `generation(floor)`, seeded with the classic
+    seed + floor_level so a floor can be rebuilt on its own; enemy AI,
+    combat rolls and loot each draw from their own named stream, so no
+    subsystem (or another game in the same process) shifts another's
+    sequence."""
+    def __init__(self, seed):
+        self.seed = seed
+        self.ai = self.substream("ai")
+        self.combat = self.substream("combat")
+        self.loot = self.substream("loot")
+    def substream(self, name: str) -> random.Random:
+        return random.Random(f"{self.seed}:{name}")
+    def generation(self, floor_level: int) -> random.Random:
+        return random.Random(self.seed + floor_level)
@@ -0,0 +1,514 @@
+import base64
+import json
+import struct
+from entity.enemies import create_enemy
+from entity.player import Item
+from map.chunked import ChunkedDungeon
+from map.dungeon import Dungeon
+from map.generators import DEFAULT_GENERATOR
+from map.room import Door, Room, RoomFeature, Trap
+from data.rng import GameRNG
+
+MAGIC = b"ECHO"
+# 1: first binary format. 2: adds world_size and chunked floors.
+# 3: adds the game's generators and each floor's generator.
+# 4: adds the state of each floor's generation stream, which rooms share.
+# 5: chunk records give each enemy's home room as chunk and room index.
+SAVE_VERSION = 5
+HEADER = struct.Struct("<4sHI")
+MT_STATE = struct.Struct("<625I")
+ENEMY_FIELDS = {
+    "shade": ("turns_behind",),
+    "warden": ("patrol_route", "patrol_index"),
+    "whisper": ("visible", "reveal_distance"),
+    "mimic": ("revealed",),
+}
+NO_ROOM = -1
+
+# Tagged binary encoding, msgpack style: one tag byte, then a fixed-size
+# value or a length-prefixed payload. Tiles, bitmaps and RNG states travel
+# as raw bytes so the bulk of a save is copied rather than parsed.
+T_NONE, T_FALSE, T_TRUE, T_INT8, T_INT32, T_INT64, T_FLOAT, T_STR, T_BYTES, T_LIST, T_DICT = range(11)
+INT8 = struct.Struct("<b")
+INT32 = struct.Struct("<i")
+INT64 = struct.Struct("<q")
+FLOAT = struct.Struct("<d")
+LENGTH = struct.Struct("<I")
+
+class SaveFormatError(ValueError):
+    """Raised for any save that cannot be read, whatever failed inside."""
+    pass
+
+# What a corrupt body raises while being decoded or rebuilt.
+CORRUPTION_ERRORS = (struct.error, IndexError, KeyError, TypeError, ValueError)
+
+def _encode(value, out: bytearray):
+    if value is None:
+        out.append(T_NONE)
+    elif value is True:
+        out.append(T_TRUE)
+    elif value is False:
+        out.append(T_FALSE)
+    elif isinstance(value, int):
+        if -128 <= value < 128:
+            out.append(T_INT8)
+            out += INT8.pack(value)
+        elif -2**31 <= value < 2**31:
+            out.append(T_INT32)
+            out += INT32.pack(value)
+        else:
+            out.append(T_INT64)
+            out += INT64.pack(value)
+    elif isinstance(value, float):
+        out.append(T_FLOAT)
+        out += FLOAT.pack(value)
+    elif isinstance(value, str):
+        data = value.encode("utf-8")
+        out.append(T_STR)
+        out += LENGTH.pack(len(data))
+        out += data
+    elif isinstance(value, (bytes, bytearray)):
+        out.append(T_BYTES)
+        out += LENGTH.pack(len(value))
+        out += value
+    elif isinstance(value, (list, tuple)):
+        out.append(T_LIST)
+        out += LENGTH.pack(len(value))
+        for item in value:
+            _encode(item, out)
+    elif isinstance(value, dict):
+        out.append(T_DICT)
+        out += LENGTH.pack(len(value))
+        for key, item in value.items():
+            _encode(key, out)
+            _encode(item, out)
+    else:
+        raise TypeError(f"Cannot save value of type {type(value).__name__}")
+
+def _decode(data: bytes, pos: int):
+    tag = data[pos]
+    pos += 1
+    if tag == T_NONE:
+        return None, pos
+    if tag == T_TRUE:
+        return True, pos
+    if tag == T_FALSE:
+        return False, pos
+    if tag == T_INT8:
+        return INT8.unpack_from(data, pos)[0], pos + 1
+    if tag == T_INT32:
+        return INT32.unpack_from(data, pos)[0], pos + 4
+    if tag == T_INT64:
+        return INT64.unpack_from(data, pos)[0], pos + 8
+    if tag == T_FLOAT:
+        return FLOAT.unpack_from(data, pos)[0], pos + 8
+    length = LENGTH.unpack_from(data, pos)[0]
+    pos += 4
+    if tag == T_STR:
+        return str(data[pos:pos + length], "utf-8"), pos + length
+    if tag == T_BYTES:
+        return bytes(data[pos:pos + length]), pos + length
+    if tag == T_LIST:
+        items = []
+        for _ in range(length):
+            item, pos = _decode(data, pos)
+            items.append(item)
+        return items, pos
+    if tag == T_DICT:
+        mapping = {}
+        for _ in range(length):
+            key, pos = _decode(data, pos)
+            mapping[key], pos = _decode(data, pos)
+        return mapping, pos
+    raise SaveFormatError(f"Unknown tag {tag} at offset {pos - 1}")
+
+def pack(state) -> bytes:
+    body = bytearray()
+    _encode(state, body)
+    return HEADER.pack(MAGIC, SAVE_VERSION, len(body)) + bytes(body)
+
+def unpack(data: bytes):
+    if len(data) < HEADER.size:
+        raise SaveFormatError("Save file is truncated")
+    magic, version, length = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise SaveFormatError("Not an Echoes save file")
+    if version > SAVE_VERSION:
+        raise SaveFormatError(f"Save version {version} is newer than this game")
+    if len(data) - HEADER.size != length:
+        raise SaveFormatError("Save file is truncated")
+    try:
+        state, end = _decode(memoryview(data), HEADER.size)
+    except SaveFormatError:
+        raise
+    except CORRUPTION_ERRORS as e:
+        raise SaveFormatError(f"Save file is corrupt: {e!r}") from e
+    if end != len(data):
+        raise SaveFormatError("Save file has trailing data")
+    return state
+
+def is_binary_save(data: bytes) -> bool:
+    return data[:len(MAGIC)] == MAGIC
+
+def _pack_rng(stream):
+    version, internal, gauss_next = stream.getstate()
+    return [MT_STATE.pack(*internal), gauss_next]
+
+def _unpack_rng(stream, packed):
+    internal, gauss_next = packed
+    stream.setstate((3, MT_STATE.unpack(internal), gauss_next))
+
+def _item_record(item):
+    return [item.name, item.item_type, item.modifier, item.equipped]
+
+def _item_from_record(record):
+    item = Item(record[0], record[1], record[2])
+    item.equipped = record[3]
+    return item
+
+def room_record(room):
+    return [
+        room.x, room.y, room.width, room.height, room.room_type,
+        room.visited, room.fully_explored, room.is_echo_zone,
+        [[t.x, t.y, t.trap_type, t.triggered, t.visible, t.symbol] for t in room.traps],
+        [[d.x, d.y, d.key_required, d.locked, d.symbol] for d in room.doors],
+        [[f.x, f.y, f.feature_type, f.used] for f in room.features],
+    ]
+
+def restore_room(record, dungeon) -> Room:
+    """Rebuild a room from its record; its tiles are read back from the
+    dungeon grid, which must already hold them."""
+    x, y, width, height, room_type, visited, explored, echo, traps, doors, features = record
+    room = Room(x, y, width, height, room_type, rng=dungeon.rng)
+    room.visited = visited
+    room.fully_explored = explored
+    room.is_echo_zone = echo
+    room.dungeon = dungeon
+    for dy in range(height):
+        start = (y + dy) * dungeon.width + x
+        room.tiles[dy] = list(dungeon.grid[start:start + width].decode())
+    for tx, ty, trap_type, triggered, visible, symbol in traps:
+        trap = Trap(tx, ty, trap_type)
+        trap.triggered = triggered
+        trap.visible = visible
+        trap.symbol = symbol
+        room.traps.append(trap)
+        dungeon.register_trap(trap)
+    for dx, dy, key_required, locked, symbol in doors:
+        door = Door(dx, dy, key_required)
+        door.locked = locked
+        door.symbol = symbol
+        room.doors.append(door)
+    for fx, fy, feature_type, used in features:
+        feature = RoomFeature(fx, fy, feature_type)
+        feature.used = used
+        room.features.append(feature)
+        dungeon.register_feature(feature)
+    return room
+
+def enemy_record(enemy, room_index: int = NO_ROOM):
+    kind = type(enemy).__name__.lower()
+    extra = {}
+    for field in ENEMY_FIELDS.get(kind, ()):
+        value = getattr(enemy, field)
+        if field == "patrol_route":
+            value = [list(point) for point in value]
+        extra[field] = value
+    return [
+        enemy.id, kind, enemy.x, enemy.y, enemy.hp, enemy.max_hp,
+        enemy.attack, enemy.defense, enemy.alive, enemy.symbol, enemy.color,
+        room_index, extra,
+    ]
+
+def restore_enemy(record, dungeon, rooms):
+    """Recreate an enemy and add it to the dungeon, in `rooms[room_index]`."""
+    enemy_id, kind, x, y, hp, max_hp, attack, defense, alive, symbol, color, room_index, extra = record
+    enemy = create_enemy(kind, x, y, dungeon.floor_level, dungeon.ai_rng)
+    enemy.id = enemy_id
+    enemy.hp = hp
+    enemy.max_hp = max_hp
+    enemy.attack = attack
+    enemy.defense = defense
+    enemy.alive = alive
+    enemy.symbol = symbol
+    enemy.color = color
+    # Fields dropped since the save was written (Warden.sleep_distance) are skipped.
+    fields = ENEMY_FIELDS.get(kind, ())
+    for field, value in extra.items():
+        if field not in fields:
+            continue
+        if field == "patrol_route":
+            value = [tuple(point) for point in value]
+        setattr(enemy, field, value)
+    room = rooms[room_index] if room_index != NO_ROOM else None
+    dungeon.add_enemy(enemy, room)
+    return enemy
+
+def enemy_rooms(rooms):
+    """Enemy id -> index of the room it belongs to."""
+    indexes = {}
+    for index, room in enumerate(rooms):
+        for enemy in room.enemies:
+            indexes[enemy.id] = index
+    return indexes
+
+def capture_dungeon(dungeon):
+    if isinstance(dungeon, ChunkedDungeon):
+        return capture_chunked(dungeon)
+    rooms = [room_record(room) for room in dungeon.rooms]
+    room_indexes = enemy_rooms(dungeon.rooms)
+    enemies = [enemy_record(enemy, room_indexes.get(enemy.id, NO_ROOM)) for enemy in dungeon.enemies]
+    corridors = bytearray()
+    for x, y in sorted(dungeon.corridors):
+        corridors += struct.pack("<HH", x, y)
+    return {
+        "floor_level": dungeon.floor_level,
+        "seed": dungeon.seed,
+        "width": dungeon.width,
+        "height": dungeon.height,
+        "start": list(dungeon.start_pos) if dungeon.start_pos else None,
+        "exit": list(dungeon.exit_pos) if dungeon.exit_pos else None,
+        "next_enemy_id": dungeon.next_enemy_id,
+        "generator": dungeon.generator.name,
+        "rng": _pack_rng(dungeon.rng),
+        "grid": bytes(dungeon.grid),
+        "seen": bytes(dungeon.fov.seen),
+        "corridors": bytes(corridors),
+        "rooms": rooms,
+        "enemies": enemies,
+    }
+
+def restore_dungeon(data, rng):
+    if data.get("kind") == "chunked":
+        return restore_chunked(data, rng)
+    dungeon = Dungeon(data["floor_level"], data["seed"], rng, generate=False, generator=data["generator"])
+    if (data["width"], data["height"]) != (dungeon.width, dungeon.height):
+        raise SaveFormatError("Saved floor size does not match this game")
+    if data["rng"] is not None:
+        _unpack_rng(dungeon.rng, data["rng"])
+    dungeon.grid = bytearray(data["grid"])
+    dungeon.fov.seen[:] = data["seen"]
+    dungeon.corridors = set(struct.iter_unpack("<HH", data["corridors"]))
+    dungeon.start_pos = tuple(data["start"]) if data["start"] else None
+    dungeon.exit_pos = tuple(data["exit"]) if data["exit"] else None
+    for record in data["rooms"]:
+        dungeon.add_room(restore_room(record, dungeon))
+    for record in data["enemies"]:
+        restore_enemy(record, dungeon, dungeon.rooms)
+    dungeon.next_enemy_id = data["next_enemy_id"]
+    dungeon.terrain_version += 1
+    return dungeon
+
+def capture_chunk(dungeon, chunk, enemies) -> bytes:
+    """One chunk of a large map with the rooms and enemies inside it. An
+    enemy's home room may lie in another chunk, so it is kept as
+    [cx, cy, room index] in `homes` rather than in the enemy record."""
+    homes = [dungeon.home_of(enemy) for enemy in enemies]
+    return pack({
+        "cx": chunk.cx,
+        "cy": chunk.cy,
+        "tiles": bytes(chunk.tiles),
+        "seen": bytes(chunk.seen),
+        "rooms": [room_record(room) for room in chunk.rooms],
+        "enemies": [enemy_record(enemy) for enemy in enemies],
+        "homes": [list(home) if home else None for home in homes],
+    })
+
+def restore_chunk(dungeon, data: bytes):
+    """Inverse of capture_chunk: installs the chunk and its contents."""
+    record = unpack(data)
+    chunk = dungeon.install_chunk(record["cx"], record["cy"], record["tiles"], record["seen"])
+    for room_data in record["rooms"]:
+        chunk.room_index.add(restore_room(room_data, dungeon))
+    dungeon.rooms.extend(chunk.rooms)
+    for enemy_data, home in zip(record["enemies"], record["homes"]):
+        enemy = restore_enemy(enemy_data, dungeon, chunk.rooms)
+        if home is not None:
+            dungeon.link_home(enemy, home)
+    return chunk
+
+def _upgrade_chunk(cx, cy, data: bytes) -> bytes:
+    """Chunks saved before version 5 name home rooms in their own chunk."""
+    record = unpack(data)
+    record["homes"] = [None if enemy[11] == NO_ROOM else [cx, cy, enemy[11]] for enemy in record["enemies"]]
+    for enemy in record["enemies"]:
+        enemy[11] = NO_ROOM
+    return pack(record)
+
+def capture_chunked(dungeon):
+    return {
+        "kind": "chunked",
+        "floor_level": dungeon.floor_level,
+        "seed": dungeon.seed,
+        "width": dungeon.width,
+        "height": dungeon.height,
+        "chunk_budget": dungeon.chunk_budget,
+        "start": list(dungeon.start_pos) if dungeon.start_pos else None,
+        "exit": list(dungeon.exit_pos) if dungeon.exit_pos else None,
+        "next_enemy_id": dungeon.next_enemy_id,
+        "chunks": [[cx, cy, data] for cx, cy, data in dungeon.chunk_records()],
+    }
+
+def restore_chunked(data, rng):
+    dungeon = ChunkedDungeon(data["floor_level"], data["seed"], rng, width=data["width"], height=data["height"],
+                             chunk_budget=data["chunk_budget"], generate=False)
+    dungeon.start_pos = tuple(data["start"]) if data["start"] else None
+    dungeon.exit_pos = tuple(data["exit"]) if data["exit"] else None
+    for cx, cy, chunk_data in data["chunks"]:
+        dungeon.store_chunk(cx, cy, chunk_data)
+    dungeon.next_enemy_id = data["next_enemy_id"]
+    return dungeon
+
+def capture(game_state):
+    """Complete game state as plain lists, dicts, numbers, strings and
+    bytes: the input of pack() and of the JSON debug export."""
+    player = game_state.player
+    inventory = player.inventory
+    items = inventory.items
+    return {
+        "version": SAVE_VERSION,
+        "seed": game_state.seed,
+        "world_size": list(game_state.world_size) if game_state.world_size else None,
+        "generators": list(game_state.generators) if game_state.generators else None,
+        "current_floor": game_state.current_floor,
+        "turn_count": game_state.turn_count,
+        "enemies_killed": game_state.enemies_killed,
+        "in_combat": game_state.in_combat,
+        "combat_enemy": game_state.combat_enemy.id if game_state.combat_enemy else 0,
+        "death_cause": game_state.death_cause,
+        "true_ending": game_state.true_ending,
+        "final_puzzle_active": game_state.final_puzzle_active,
+        "puzzle_attempts": game_state.puzzle_attempts,
+        "narrative_clues": list(game_state.narrative_clues),
+        "rng": {
+            "ai": _pack_rng(game_state.rng.ai),
+            "combat": _pack_rng(game_state.rng.combat),
+            "loot": _pack_rng(game_state.rng.loot),
+        },
+        "player": {
+            "x": player.x,
+            "y": player.y,
+            "hp": player.hp,
+            "max_hp": player.max_hp,
+            "stamina": player.stamina,
+            "max_stamina": player.max_stamina,
+            "sanity": player.sanity,
+            "max_sanity": player.max_sanity,
+            "base_attack": player.base_attack,
+            "base_defense": player.base_defense,
+            "alive": player.alive,
+            "vision_range": player.vision_range,
+            "max_history": player.max_history,
+            "move_history": [list(entry) for entry in player.move_history],
+            "inventory": {
+                "max_size": inventory.max_size,
+                "items": [_item_record(item) for item in items],
+                "weapon": _equipped_record(inventory.weapon, items),
+                "armor": _equipped_record(inventory.armor, items),
+            },
+        },
+        "dungeon": capture_dungeon(game_state.dungeon),
+    }
+
+def _equipped_record(item, items):
+    if item is None:
+        return None
+    for index, owned in enumerate(items):
+        if owned is item:
+            return index
+    return _item_record(item)
+
+def _equipped_item(record, items):
+    if record is None:
+        return None
+    if isinstance(record, int):
+        return items[record]
+    return _item_from_record(record)
+
+def restore(game_state_class, state, prefetch=True):
+    try:
+        return _restore(game_state_class, state, prefetch)
+    except SaveFormatError:
+        raise
+    except CORRUPTION_ERRORS as e:
+        raise SaveFormatError(f"Save data is malformed: {e!r}") from e
+
+def upgrade(state):
+    """Fill in what saves of older versions lack, in place."""
+    version = state["version"]
+    if version > SAVE_VERSION:
+        raise SaveFormatError(f"Save version {version} is newer than this game")
+    if version < 2:
+        state["world_size"] = None
+    if version < 3:
+        state["generators"] = None
+        if state["dungeon"].get("kind") != "chunked":
+            state["dungeon"]["generator"] = DEFAULT_GENERATOR
+    if version < 4 and state["dungeon"].get("kind") != "chunked":
+        state["dungeon"]["rng"] = None
+    if version < 5 and state["dungeon"].get("kind") == "chunked":
+        state["dungeon"]["chunks"] = [[cx, cy, _upgrade_chunk(cx, cy, data)]
+                                      for cx, cy, data in state["dungeon"]["chunks"]]
+    state["version"] = SAVE_VERSION
+    return state
+
+def _restore(game_state_class, state, prefetch):
+    upgrade(state)
+    seed = state["seed"]
+    rng = GameRNG(seed)
+    for name in ("ai", "combat", "loot"):
+        _unpack_rng(getattr(rng, name), state["rng"][name])
+    dungeon = restore_dungeon(state["dungeon"], rng)
+    seen = None if isinstance(dungeon, ChunkedDungeon) else bytes(dungeon.fov.seen)
+    world_size = tuple(state["world_size"]) if state["world_size"] else None
+    game_state = game_state_class(seed=seed, prefetch=False, rng=rng, dungeon=dungeon, world_size=world_size,
+                                  generators=state["generators"])
+    game_state.current_floor = state["current_floor"]
+    game_state.turn_count = state["turn_count"]
+    game_state.enemies_killed = state["enemies_killed"]
+    game_state.death_cause = state["death_cause"]
+    game_state.true_ending = state["true_ending"]
+    game_state.final_puzzle_active = state["final_puzzle_active"]
+    game_state.puzzle_attempts = state["puzzle_attempts"]
+    game_state.narrative_clues = list(state["narrative_clues"])
+    player_data = state["player"]
+    player = game_state.player
+    for field in ("x", "y", "hp", "max_hp", "stamina", "max_stamina", "sanity", "max_sanity",
+                  "base_attack", "base_defense", "alive", "vision_range", "max_history"):
+        setattr(player, field, player_data[field])
+    player.move_history = [tuple(entry) for entry in player_data["move_history"]]
+    inventory_data = player_data["inventory"]
+    inventory = player.inventory
+    inventory.max_size = inventory_data["max_size"]
+    inventory.items = [_item_from_record(record) for record in inventory_data["items"]]
+    inventory.weapon = _equipped_item(inventory_data["weapon"], inventory.items)
+    inventory.armor = _equipped_item(inventory_data["armor"], inventory.items)
+    if seen is not None:
+        dungeon.fov.seen[:] = seen
+    dungeon.fov.compute(player.x, player.y, player.vision_range)
+    if state["in_combat"]:
+        game_state.in_combat = True
+        game_state.combat_enemy = dungeon.enemies.get(state["combat_enemy"])
+    game_state.prefetch = prefetch
+    game_state.prefetch_next_floor()
+    return game_state
+
+def _json_default(value):
+    if isinstance(value, (bytes, bytearray)):
+        return {"__bytes__": base64.b64encode(value).decode("ascii")}
+    raise TypeError(f"Cannot export value of type {type(value).__name__}")
+
+def _json_object(mapping):
+    if len(mapping) == 1 and "__bytes__" in mapping:
+        return base64.b64decode(mapping["__bytes__"])
+    return mapping
+
+def to_json(state) -> str:
+    return json.dumps(state, indent=2, default=_json_default)
+
+def from_json(text):
+    """Parse a JSON export (str or UTF-8 bytes)."""
+    try:
+        return json.loads(text, object_hook=_json_object)
+    except ValueError as e:
+        raise SaveFormatError(f"Save file is not valid JSON: {e}") from e
@@ -0,0 +1,76 @@
+from typing import List, NamedTuple, Optional, Tuple
+from data.events import EventLog
+from data.gameplay import GameState
+from debug.profiler import PROFILER
+
+ACTIONS = ("up", "down", "left", "right", "wait")
+
+class NullLog:
+    turn = 0
+    def emit(self, kind: str, text: str = "", style: str = "info", actor: int = 0,
+             amount: int = 0, detail: str = ""):
+        pass
+    def add_message(self, message: str, msg_type: str = "info"):
+        pass
+    def clear(self):
+        pass
+
+class RecordingLog(EventLog):
+    """Keeps every event of a run."""
+    def __init__(self):
+        super().__init__(capacity=None)
+    @property
+    def messages(self) -> List[Tuple[str, str]]:
+        return [(event.text, event.style) for event in self.events]
+
+class GameResult(NamedTuple):
+    seed: int
+    policy: str
+    outcome: str
+    floor: int
+    turns: int
+    kills: int
+    death_cause: str
+    def as_dict(self):
+        return self._asdict()
+
+def advance(game_state: GameState, action: str, log) -> str:
+    """One player action, including the floor change every front end
+    performs when process_action reports floor_complete."""
+    log.turn = game_state.turn_count
+    result = game_state.process_action(action, log)
+    if result == "floor_complete":
+        log.emit("floor", "You descend deeper into the labyrinth...", "warning",
+                 amount=game_state.current_floor + 1)
+        with PROFILER.span("next_floor"):
+            game_state.next_floor()
+    return result
+
+def run_game(seed: int, policy, max_actions: int = 5000, log=None,
+             game_state: Optional[GameState] = None, observer=None, world_size=None,
+             generators=None) -> GameResult:
+    if log is None:
+        log = NullLog()
+    if game_state is None:
+        game_state = GameState(seed=seed, prefetch=False, world_size=world_size, generators=generators)
+    policy.reset(game_state)
+    outcome = "timeout"
+    for _ in range(max_actions):
+        result = advance(game_state, policy.choose(game_state), log)
+        if observer:
+            observer(game_state)
+        if result == "game_over":
+            outcome = "death"
+            break
+        if result == "victory":
+            outcome = "victory"
+            break
+    return GameResult(
+        seed=seed,
+        policy=policy.name,
+        outcome=outcome,
+        floor=game_state.current_floor,
+        turns=game_state.turn_count,
+        kills=game_state.enemies_killed,
+        death_cause=game_state.death_cause,
+    )
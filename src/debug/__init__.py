@@ -0,0 +1,10 @@
+"""
+Debug module - Opt-in instrumentation for turn phases.
+"""
+
+from debug.profiler import PROFILER, Profiler
+
+__all__ = [
+    'PROFILER',
+    'Profiler',
+]
@@ -0,0 +1,127 @@
+import cProfile
+import json
+import os
+from collections import deque
+from time import perf_counter
+from typing import Dict, List, Optional
+
+MAX_TRACE_EVENTS = 200000
+RECENT_FRAMES = 120
+
+class PhaseStats:
+    __slots__ = ("count", "total", "self_total", "max", "frame")
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.self_total = 0.0
+        self.max = 0.0
+        self.frame = 0.0
+    def as_dict(self):
+        return {"count": self.count, "total": self.total, "self": self.self_total, "max": self.max}
+
+class _Span:
+    """Reusable timer for one phase. Nested spans subtract their time from
+    the enclosing span's self time, so `self` totals add up to the frame."""
+    __slots__ = ("profiler", "name", "stats")
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.stats = PhaseStats()
+    def __enter__(self):
+        self.profiler.stack.append([perf_counter(), 0.0])
+    def __exit__(self, *exc):
+        profiler = self.profiler
+        started, children = profiler.stack.pop()
+        elapsed = perf_counter() - started
+        stats = self.stats
+        stats.count += 1
+        stats.total += elapsed
+        own = elapsed - children
+        stats.self_total += own
+        stats.frame += own
+        if own > stats.max:
+            stats.max = own
+        if profiler.stack:
+            profiler.stack[-1][1] += elapsed
+        if profiler.trace is not None:
+            profiler.trace.append((self.name, started, elapsed))
+        return False
+
+class _NullSpan:
+    __slots__ = ()
+    def __enter__(self):
+        pass
+    def __exit__(self, *exc):
+        return False
+
+NULL_SPAN = _NullSpan()
+
+class Profiler:
+    """Per-phase counters for the turn loop, off unless enabled.
+
+    Call sites wrap a phase in `with PROFILER.span("name"):`; while disabled
+    that is a shared no-op context. `end_frame()` closes one player action:
+    the self time each phase spent in it is kept for the debug panel.
+    With a dump path, spans are also kept as trace events (written as Chrome
+    trace JSON), or cProfile runs alongside for a .pstats/.prof path."""
+    def __init__(self):
+        self.enabled = False
+        self.spans: Dict[str, _Span] = {}
+        self.stack: List[list] = []
+        self.trace: Optional[deque] = None
+        self.cprofile: Optional[cProfile.Profile] = None
+        self.frames = deque(maxlen=RECENT_FRAMES)
+        self.last_frame: Dict[str, float] = {}
+        self.origin = perf_counter()
+    def enable(self, dump_path: Optional[str] = None):
+        self.enabled = True
+        if dump_path and dump_path.endswith((".pstats", ".prof")):
+            if self.cprofile is None:
+                self.cprofile = cProfile.Profile()
+                self.cprofile.enable()
+        elif dump_path and self.trace is None:
+            self.trace = deque(maxlen=MAX_TRACE_EVENTS)
+    def disable(self):
+        self.enabled = False
+        if self.cprofile:
+            self.cprofile.disable()
+    def span(self, name: str):
+        if not self.enabled:
+            return NULL_SPAN
+        span = self.spans.get(name)
+        if span is None:
+            span = self.spans[name] = _Span(self, name)
+        return span
+    def end_frame(self):
+        if not self.enabled:
+            return
+        frame = {}
+        for name, span in self.spans.items():
+            if span.stats.frame:
+                frame[name] = span.stats.frame
+                span.stats.frame = 0.0
+        self.last_frame = frame
+        self.frames.append(sum(frame.values()))
+    def reset(self):
+        self.spans.clear()
+        self.frames.clear()
+        self.last_frame = {}
+        if self.trace is not None:
+            self.trace.clear()
+    def summary(self) -> Dict[str, dict]:
+        return {name: span.stats.as_dict() for name, span in sorted(self.spans.items())}
+    def dump(self, path: str):
+        """Write cProfile stats for .pstats/.prof paths, a Chrome trace
+        (chrome://tracing, Perfetto) with per-phase totals otherwise."""
+        if path.endswith((".pstats", ".prof")):
+            if self.cprofile is None:
+                raise ValueError("cProfile was not enabled for this session")
+            self.cprofile.dump_stats(path)
+            return
+        events = [{"name": name, "ph": "X", "ts": (started - self.origin) * 1e6, "dur": elapsed * 1e6,
+                   "pid": os.getpid(), "tid": 1}
+                  for name, started, elapsed in (self.trace or ())]
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms", "phases": self.summary()}, f)
+
+PROFILER = Profiler()
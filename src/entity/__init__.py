@@ -4,6 +4,8 @@ Entity module - Player and enemy classes.
 
 from entity.player import Player, Item, Inventory
 from entity.enemies import Enemy, Shade, Warden, Whisper, Mimic, create_enemy
+from entity.scheduler import EnemyScheduler
+from entity.store import EntityStore
 
 __all__ = [
     'Player',
@@ -15,4 +17,6 @@ __all__ = [
     'Whisper',
     'Mimic',
     'create_enemy',
+    'EnemyScheduler',
+    'EntityStore',
 ]
\ No newline at end of file
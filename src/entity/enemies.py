@@ -2,7 +2,11 @@ import random
 from typing import Tuple, List
 
 class Enemy:
+    __slots__ = ("id", "rng", "x", "y", "name", "max_hp", "hp", "attack", "defense",
+                 "symbol", "alive", "color", "description")
     def __init__(self, x, y, name, hp, attack, defense, symbol):
+        self.id = 0
+        self.rng = random
         self.x = x
         self.y = y
         self.name = name
@@ -20,10 +24,18 @@ class Enemy:
             self.hp = 0
             self.alive = False
         return actual_damage
-    def calculate_damage(self) -> int:
-        variance = random.randint(-2, 2)
+    def calculate_damage(self, rng=None) -> int:
+        variance = (rng or self.rng).randint(-2, 2)
         return max(1, self.attack + variance)
     def move_towards(self, target_x, target_y, dungeon):
+        step = dungeon.pathfinder.next_step((self.x, self.y), (target_x, target_y))
+        if step:
+            if dungeon.is_walkable(step[0], step[1]):
+                dungeon.move_enemy(self, step[0], step[1])
+                return True
+            return False
+        return self.step_greedy(target_x, target_y, dungeon)
+    def step_greedy(self, target_x, target_y, dungeon):
         dx = target_x - self.x
         dy = target_y - self.y
         if abs(dx) > abs(dy):
@@ -33,15 +45,17 @@ class Enemy:
             new_x = self.x
             new_y = self.y + (1 if dy > 0 else -1)
         if dungeon.is_walkable(new_x, new_y):
-            self.x = new_x
-            self.y = new_y
+            dungeon.move_enemy(self, new_x, new_y)
             return True
         return False
+    def wake_distance(self):
+        return None
     def act(self, player, dungeon, log):
         pass
     def __repr__(self):
         return f"{self.name}(HP:{self.hp}/{self.max_hp}, Pos:{self.x},{self.y})"
 class Shade(Enemy):
+    __slots__ = ("turns_behind",)
     def __init__(self, x, y, floor_level=1):
         hp = 30 + (floor_level * 10)
         attack = 15 + (floor_level * 3)
@@ -54,21 +68,20 @@ class Shade(Enemy):
         if echo_pos:
             target_x, target_y = echo_pos
             if dungeon.is_walkable(target_x, target_y):
-                self.x = target_x
-                self.y = target_y
+                dungeon.move_enemy(self, target_x, target_y)
                 if self.x == player.x and self.y == player.y:
-                    log.add_message(f"The {self.name} catches you!", "error")
+                    log.emit("caught", f"The {self.name} catches you!", "error", actor=self.id)
                     return "combat"
         else:
             directions = [(0, 1), (0, -1), (1, 0), (-1, 0)]
-            random.shuffle(directions)
+            self.rng.shuffle(directions)
             for dx, dy in directions:
                 new_x, new_y = self.x + dx, self.y + dy
                 if dungeon.is_walkable(new_x, new_y):
-                    self.x = new_x
-                    self.y = new_y
+                    dungeon.move_enemy(self, new_x, new_y)
                     break
 class Warden(Enemy):
+    __slots__ = ("patrol_route", "patrol_index")
     def __init__(self, x, y, floor_level=1):
         hp = 50 + (floor_level * 15)
         attack = 12 + (floor_level * 2)
@@ -92,13 +105,16 @@ class Warden(Enemy):
             target_x, target_y = self.patrol_route[self.patrol_index]
             if self.x == target_x and self.y == target_y:
                 self.patrol_index = (self.patrol_index + 1) % len(self.patrol_route)
+            elif dungeon.pathfinder.next_step((self.x, self.y), (target_x, target_y)) is None:
+                self.patrol_index = (self.patrol_index + 1) % len(self.patrol_route)
             else:
                 self.move_towards(target_x, target_y, dungeon)
         distance = abs(self.x - player.x) + abs(self.y - player.y)
         if distance == 1:
-            log.add_message(f"The {self.name} spots you!", "warning")
+            log.emit("spotted", f"The {self.name} spots you!", "warning", actor=self.id)
             return "combat"
 class Whisper(Enemy):
+    __slots__ = ("visible", "reveal_distance")
     def __init__(self, x, y, floor_level=1):
         hp = 25 + (floor_level * 8)
         attack = 20 + (floor_level * 4)
@@ -107,19 +123,30 @@ class Whisper(Enemy):
         self.visible = False
         self.reveal_distance = 3
         self.description = "A presence you cannot see"
-    
+    def wake_distance(self):
+        return None if self.visible else self.reveal_distance
+    def reveal(self, player, dungeon, log):
+        self.visible = True
+        self.symbol = "w"
+        dungeon.mark_dirty(self.x, self.y)
+        log.emit("reveal", "Something materializes from the shadows!", "error", actor=self.id, amount=10)
+        player.lose_sanity(10)
     def act(self, player, dungeon, log):
         distance = abs(self.x - player.x) + abs(self.y - player.y)
         if distance <= self.reveal_distance and not self.visible:
-            self.visible = True
-            self.symbol = "w"
-            log.add_message("Something materializes from the shadows!", "error")
-            player.lose_sanity(10)
+            self.reveal(player, dungeon, log)
         if self.visible and distance > 1:
-            self.move_towards(player.x, player.y, dungeon)
+            pathfinder = dungeon.pathfinder
+            if pathfinder.reaches(self.x, self.y, player.x, player.y):
+                step = pathfinder.downhill_step(self.x, self.y, player.x, player.y)
+                if step:
+                    dungeon.move_enemy(self, step[0], step[1])
+            else:
+                self.step_greedy(player.x, player.y, dungeon)
         if self.x == player.x and self.y == player.y:
             return "combat"
 class Mimic(Enemy):
+    __slots__ = ("revealed",)
     def __init__(self, x, y, floor_level=1):
         hp = 40 + (floor_level * 12)
         attack = 18 + (floor_level * 3)
@@ -127,18 +154,22 @@ class Mimic(Enemy):
         self.color = "yellow"
         self.revealed = False
         self.description = "Not what it seems"
+    def wake_distance(self):
+        return None if self.revealed else 1
     def act(self, player, dungeon, log):
         distance = abs(self.x - player.x) + abs(self.y - player.y)
         if distance <= 1 and not self.revealed:
             self.revealed = True
             self.symbol = "M"
             self.color = "red"
-            log.add_message("The treasure chest snaps open with teeth!", "error")
+            dungeon.mark_dirty(self.x, self.y)
+            log.emit("reveal", "The treasure chest snaps open with teeth!", "error", actor=self.id,
+                     amount=15)
             player.lose_sanity(15)
             return "combat"
         if self.revealed and distance == 1:
             return "combat"
-def create_enemy(enemy_type: str, x: int, y: int, floor_level: int) -> Enemy:
+def create_enemy(enemy_type: str, x: int, y: int, floor_level: int, rng=None) -> Enemy:
     enemy_types = {
         "shade": Shade,
         "warden": Warden,
@@ -146,4 +177,7 @@ def create_enemy(enemy_type: str, x: int, y: int, floor_level: int) -> Enemy:
         "mimic": Mimic,
     }
     enemy_class = enemy_types.get(enemy_type, Shade)
-    return enemy_class(x, y, floor_level)
\ No newline at end of file
+    enemy = enemy_class(x, y, floor_level)
+    if rng is not None:
+        enemy.rng = rng
+    return enemy
\ No newline at end of file
@@ -2,6 +2,7 @@ import random
 from typing import List, Tuple
 
 class Item:
+    __slots__ = ("name", "item_type", "modifier", "equipped")
     def __init__(self, name, item_type, modifier=0):
         self.name = name
         self.item_type = item_type  
@@ -16,26 +17,31 @@ class Inventory:
         self.max_size = 10
         self.weapon = None
         self.armor = None
+        self.version = 0
     def add_item(self, item: Item) -> bool:
         if len(self.items) < self.max_size:
             self.items.append(item)
+            self.version += 1
             return True
         return False
     def remove_item(self, item: Item):
         if item in self.items:
             self.items.remove(item)
+            self.version += 1
     def equip_weapon(self, weapon: Item):
         if weapon.item_type == "weapon":
             if self.weapon:
                 self.weapon.equipped = False
             self.weapon = weapon
             weapon.equipped = True
+            self.version += 1
     def equip_armor(self, armor: Item):
         if armor.item_type == "armor":
             if self.armor:
                 self.armor.equipped = False
             self.armor = armor
             armor.equipped = True
+            self.version += 1
     def use_potion(self, potion: Item, player):
         if potion.item_type == "potion":
             player.hp = min(player.max_hp, player.hp + potion.modifier)
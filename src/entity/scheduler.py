@@ -0,0 +1,91 @@
+from typing import Dict, List, Tuple
+from debug.profiler import PROFILER
+from entity import vectorized
+
+BUCKET_SIZE = 8
+TYPE_ORDER = ("Shade", "Warden", "Whisper", "Mimic")
+
+class EnemyScheduler:
+    """Runs enemy turns for one floor.
+
+    Enemies whose wake_distance() is not None are only worth running once
+    the player is that close; until then they sleep in a coarse bucket grid
+    and cost nothing per turn. Each turn only the buckets around the player
+    are checked for sleepers to wake. Awake enemies are grouped by type and
+    run group by group, in spawn order within a group. With NumPy installed,
+    large groups take the array step in entity.vectorized instead, which
+    gives the same result."""
+    vectorize = vectorized.available()
+    def __init__(self, dungeon):
+        self.dungeon = dungeon
+        self.active: Dict[str, List] = {name: [] for name in TYPE_ORDER}
+        self.unsorted = set()
+        self.dormant: Dict[Tuple[int, int], List] = {}
+        self.dormant_bucket = {}
+        self.max_wake = 0
+        self.vector = vectorized.GroupStep(self) if self.vectorize else None
+    def add(self, enemy):
+        wake = enemy.wake_distance()
+        if wake is None:
+            self._activate(enemy)
+        else:
+            self._sleep(enemy, wake)
+    def remove(self, enemy):
+        bucket = self.dormant_bucket.pop(enemy.id, None)
+        if bucket is not None:
+            self.dormant[bucket].remove(enemy)
+            if not self.dormant[bucket]:
+                del self.dormant[bucket]
+            return
+        group = self.active.get(enemy.name)
+        if group and enemy in group:
+            group.remove(enemy)
+    def _activate(self, enemy):
+        self.active.setdefault(enemy.name, []).append(enemy)
+        self.unsorted.add(enemy.name)
+    def _sleep(self, enemy, wake):
+        bucket = (enemy.x // BUCKET_SIZE, enemy.y // BUCKET_SIZE)
+        self.dormant.setdefault(bucket, []).append(enemy)
+        self.dormant_bucket[enemy.id] = bucket
+        self.max_wake = max(self.max_wake, wake)
+    def wake_nearby(self, player):
+        if not self.dormant:
+            return
+        reach = self.max_wake
+        min_bx = (player.x - reach) // BUCKET_SIZE
+        max_bx = (player.x + reach) // BUCKET_SIZE
+        min_by = (player.y - reach) // BUCKET_SIZE
+        max_by = (player.y + reach) // BUCKET_SIZE
+        for by in range(min_by, max_by + 1):
+            for bx in range(min_bx, max_bx + 1):
+                sleepers = self.dormant.get((bx, by))
+                if not sleepers:
+                    continue
+                for enemy in list(sleepers):
+                    wake = enemy.wake_distance()
+                    if wake is None or abs(enemy.x - player.x) + abs(enemy.y - player.y) <= wake:
+                        self.remove(enemy)
+                        self._activate(enemy)
+    def run_turn(self, player, log, on_combat):
+        with PROFILER.span("enemies.wake"):
+            self.wake_nearby(player)
+        for name in self.unsorted:
+            self.active[name].sort(key=lambda enemy: enemy.id)
+        self.unsorted.clear()
+        for name in list(self.active):
+            group = self.active[name]
+            if not group:
+                continue
+            with PROFILER.span(f"act.{name}"):
+                if self.vector and self.vector.run(name, group, player, log, on_combat):
+                    continue
+                for enemy in list(group):
+                    if not enemy.alive:
+                        continue
+                    result = enemy.act(player, self.dungeon, log)
+                    if result == "combat":
+                        on_combat(enemy, log)
+                    wake = enemy.wake_distance()
+                    if wake is not None and abs(enemy.x - player.x) + abs(enemy.y - player.y) > wake:
+                        group.remove(enemy)
+                        self._sleep(enemy, wake)
@@ -0,0 +1,26 @@
+from typing import Dict, Iterator, Optional
+
+class EntityStore:
+    """Entities keyed by their stable id, iterated in the order they were
+    added. Removing one is O(1) and keeps the others in order, so a kill no
+    longer rebuilds every list the entity sits in."""
+    __slots__ = ("entities",)
+    def __init__(self, entities=()):
+        self.entities: Dict[int, object] = {}
+        for entity in entities:
+            self.add(entity)
+    def add(self, entity):
+        self.entities[entity.id] = entity
+    def discard(self, entity):
+        if self.entities.get(entity.id) is entity:
+            del self.entities[entity.id]
+    def get(self, entity_id: int) -> Optional[object]:
+        return self.entities.get(entity_id)
+    def __contains__(self, entity) -> bool:
+        return self.entities.get(entity.id) is entity
+    def __iter__(self) -> Iterator:
+        return iter(self.entities.values())
+    def __len__(self) -> int:
+        return len(self.entities)
+    def __repr__(self):
+        return f"EntityStore({list(self.entities.values())!r})"
@@ -0,0 +1,135 @@
+from array import array
+from typing import Callable, Dict, List
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Smallest group worth the array setup per type, measured on standard
+# floors: the Shade step is O(1), the others only pay off in crowds.
+MIN_GROUP = {"Shade": 8, "Whisper": 256, "Mimic": 256}
+# map.pathfinding.NEIGHBOURS split into columns; the order breaks ties.
+NEIGHBOUR_DX = (0, 0, -1, 1)
+NEIGHBOUR_DY = (-1, 1, 0, 0)
+
+def available() -> bool:
+    return np is not None
+
+class GroupStep:
+    """NumPy version of one turn of an enemy group, for large groups.
+
+    Distances to the player, reveal and adjacency tests and the next
+    downhill cell of every chasing Whisper are computed for the whole
+    group in array operations; only enemies with something to do are then
+    touched one by one, in id order, so collisions resolve exactly as they
+    do when each act() runs in turn. The result is identical to the scalar
+    loop in EnemyScheduler.run_turn. Types without a handler (Warden, whose
+    patrols are per-enemy A* searches) fall back to that loop."""
+    def __init__(self, scheduler):
+        self.scheduler = scheduler
+        self.min_group = dict(MIN_GROUP)
+        self.dungeon = scheduler.dungeon
+        self.handlers: Dict[str, Callable] = {
+            "Shade": self.step_shades,
+            "Whisper": self.step_whispers,
+            "Mimic": self.step_mimics,
+        }
+        from map.dungeon import WALKABLE_TILES
+        self.walkable = np.zeros(256, dtype=bool)
+        self.walkable[list(WALKABLE_TILES)] = True
+    def run(self, name: str, group: List, player, log, on_combat) -> bool:
+        """Play the group's turn; False when the caller must run it."""
+        handler = self.handlers.get(name)
+        if handler is None or len(group) < self.min_group.get(name, 0):
+            return False
+        return handler([enemy for enemy in group if enemy.alive], group, player, log, on_combat) is not False
+    def distances(self, enemies, player):
+        xs = np.fromiter((enemy.x for enemy in enemies), dtype=np.int64, count=len(enemies))
+        ys = np.fromiter((enemy.y for enemy in enemies), dtype=np.int64, count=len(enemies))
+        return xs, ys, np.abs(xs - player.x) + np.abs(ys - player.y)
+    def resleep(self, group, enemies, indexes):
+        for index in indexes.tolist():
+            enemy = enemies[index]
+            group.remove(enemy)
+            self.scheduler._sleep(enemy, enemy.wake_distance())
+    def step_shades(self, enemies, group, player, log, on_combat):
+        # Every Shade heads for the same echo cell and only the first one
+        # in id order can step onto it; the others find it occupied.
+        turns_behind = {enemy.turns_behind for enemy in enemies}
+        if len(turns_behind) != 1:
+            return False
+        echo = player.get_echo_position(turns_behind.pop())
+        if echo is None:
+            return False
+        dungeon = self.dungeon
+        if enemies and dungeon.is_walkable(echo[0], echo[1]):
+            shade = enemies[0]
+            dungeon.move_enemy(shade, echo[0], echo[1])
+            if shade.x == player.x and shade.y == player.y:
+                log.emit("caught", f"The {shade.name} catches you!", "error", actor=shade.id)
+                on_combat(shade, log)
+    def step_mimics(self, enemies, group, player, log, on_combat):
+        if not enemies:
+            return
+        _, _, distance = self.distances(enemies, player)
+        for index in np.flatnonzero(distance <= 1).tolist():
+            enemy = enemies[index]
+            if enemy.act(player, self.dungeon, log) == "combat":
+                on_combat(enemy, log)
+        revealed = np.fromiter((enemy.revealed for enemy in enemies), dtype=bool, count=len(enemies))
+        self.resleep(group, enemies, np.flatnonzero(~revealed & (distance > 1)))
+    def step_whispers(self, enemies, group, player, log, on_combat):
+        from map.pathfinding import UNREACHABLE
+        if not enemies:
+            return
+        dungeon = self.dungeon
+        width, height = dungeon.width, dungeon.height
+        field = dungeon.pathfinder.distance_map(player.x, player.y)
+        if not isinstance(field, array):
+            return False
+        xs, ys, visible, reveal_distance = np.array(
+            [(enemy.x, enemy.y, enemy.visible, enemy.reveal_distance) for enemy in enemies], dtype=np.int64).T
+        if ((xs == 0) | (ys == 0) | (xs == width - 1) | (ys == height - 1)).any():
+            return False
+        distance = np.abs(xs - player.x) + np.abs(ys - player.y)
+        revealing = (visible == 0) & (distance <= reveal_distance)
+        visible = (visible != 0) | revealing
+        chasing = visible & (distance > 1)
+        # Cells each chaser would try, best first: the neighbours closer to
+        # the player on the distance field (ties in NEIGHBOURS order) or, off
+        # the field, the single Enemy.step_greedy cell; -1 pads the rest.
+        distances = np.frombuffer(field, dtype=np.uint16)
+        cells = ys * width + xs
+        current = distances[cells]
+        neighbours = cells[:, None] + np.array((-width, width, -1, 1))
+        around = distances[neighbours]
+        around = np.where(around < current[:, None], around, UNREACHABLE)
+        order = np.argsort(around, axis=1, kind="stable")
+        rows = np.arange(len(enemies))[:, None]
+        candidates = np.where(around[rows, order] != UNREACHABLE, neighbours[rows, order], -1)
+        dx, dy = player.x - xs, player.y - ys
+        greedy = np.where(np.abs(dx) > np.abs(dy), cells + np.sign(dx), cells + np.where(dy > 0, width, -width))
+        grid = np.frombuffer(dungeon.grid, dtype=np.uint8)
+        greedy = np.where(self.walkable[grid[greedy]], greedy, -1)
+        candidates[:, 0] = np.where(current == UNREACHABLE, greedy, candidates[:, 0])
+        # Chasers with nowhere to go stay put without a look at who stands
+        # where; only the rest need the in-order loop below.
+        moving = chasing & (candidates[:, 0] >= 0)
+        acting = np.flatnonzero(revealing | moving | (distance == 0)).tolist()
+        revealing, moving, candidates = revealing.tolist(), moving.tolist(), candidates.tolist()
+        for index in acting:
+            enemy = enemies[index]
+            if revealing[index]:
+                enemy.reveal(player, dungeon, log)
+            if moving[index]:
+                for cell in candidates[index]:
+                    if cell < 0:
+                        break
+                    step_y, step_x = divmod(cell, width)
+                    if dungeon.get_enemy_at(step_x, step_y) is None:
+                        dungeon.move_enemy(enemy, step_x, step_y)
+                        break
+            if enemy.x == player.x and enemy.y == player.y:
+                on_combat(enemy, log)
+        self.resleep(group, enemies, np.flatnonzero(~visible & (distance > reveal_distance)))
@@ -1,4 +1,5 @@
 # main.py
+import argparse
 import sys
 from entity.player import Player
 from entity.enemies import Shade, Warden, Whisper
@@ -6,8 +7,17 @@ from map.dungeon import Dungeon
 from map.room import Room
 from ui.display import GameDisplay
 from ui.log import GameLog
+from ui.minimap import Minimap
+from ui.sidebar import SidebarModel
 from data.gameplay import GameState
-from data.mode import choose_game_mode
+from data.autosave import Autosave
+from data.events import EventLog
+from data.savefile import SaveFormatError
+from data.replay import Replay, ReplayEngine, ReplayRecorder
+from debug.profiler import PROFILER
+from map.chunked import parse_world_size
+from map.generators import parse_generators
+from data.simulation import advance
 from textual.app import App, ComposeResult
 from textual.containers import Container, Horizontal, Vertical
 from textual.widgets import Static, Header, Footer
@@ -18,8 +28,22 @@ from rich.panel import Panel
 import random
 import json
 import os
+from collections import deque
 from datetime import datetime
 
+SAVE_FILE = "save.dat"
+# Written by versions before the binary format; loaded when there is no save.dat.
+LEGACY_SAVE_FILE = "save.json"
+SAVE_DIR = "saves"
+REPLAY_DIR = "replays"
+# Queued actions beyond this are dropped, so releasing a held key stops
+# the player within a frame or two instead of draining a long backlog.
+MAX_QUEUED_ACTIONS = 16
+# Events that end a run of queued moves: the player should see these
+# before the next keypress counts.
+INTERRUPT_EVENTS = frozenset({"combat", "caught", "spotted", "reveal", "trap", "echo_zone"})
+LOW_SANITY = 30
+
 class EchoesGame(App):
     CSS = """
     Screen{
@@ -54,6 +78,12 @@ class EchoesGame(App):
         border: solid $success;
         padding: 1;
     }
+    #debug_panel{
+        height: 45%;
+        border: solid $error;
+        padding: 0 1;
+        display: none;
+    }
     .game_display{
         width: 100%;
         height: 100%;
@@ -71,27 +101,88 @@ class EchoesGame(App):
         Binding("q", "quit_game", "Quit", show=True),
         Binding("n", "new_game", "New Game", show=True),
         Binding("l", "load_game", "Load", show=True),
+        Binding("p", "replay_pause", "Pause", show=False),
+        Binding("left_square_bracket", "replay_seek(-100)", "Back", show=False),
+        Binding("right_square_bracket", "replay_seek(100)", "Forward", show=False),
+        Binding("f12", "toggle_debug", "Debug", show=False),
+        Binding("pageup", "log_scroll(5)", "Log Back", show=False),
+        Binding("pagedown", "log_scroll(-5)", "Log Forward", show=False),
     ]
-    def __init__(self):
+    def __init__(self, replay=None, rate=10.0, profile_path=None, world_size=None, events_path=None,
+                 generators=None):
         super().__init__()
         self.game_state = None
         self.in_menu = True
         self.game_over = False
         self.victory = False
+        self.autosave = Autosave(SAVE_DIR)
+        self.recorder = None
+        self.replay = replay
+        self.replay_rate = rate
+        self.replay_engine = None
+        self.replay_paused = False
+        self.profile_path = profile_path
+        self.world_size = world_size
+        self.generators = generators
+        self.event_log = EventLog(stream_path=events_path)
+        self.sidebar = SidebarModel()
+        self.minimap = Minimap()
+        self.show_map = False
+        self.pending_actions = deque()
+        self.input_scheduled = False
+        self.interrupted = False
+        self.event_log.subscribe(self.note_event)
     def compose(self) -> ComposeResult:
         yield Header()
         with Container(id="game_container"):
             with Horizontal():
                 with Vertical(id="main_view"):
                     yield GameDisplay(id="game_display")
+                    yield Static("", id="debug_panel")
                 with Vertical(id="sidebar"):
                     yield Static("", id="stats_panel")
-                    yield GameLog(id="log_panel")
+                    yield GameLog(self.event_log, id="log_panel")
                     yield Static("", id="inventory_panel")
         yield Footer()
     def on_mount(self) -> None:
         self.title = "Echoes of the Labyrinth"
-        self.show_menu()
+        if self.replay:
+            self.start_replay()
+        else:
+            self.show_menu()
+    def start_replay(self):
+        log = self.query_one("#log_panel", GameLog)
+        log.clear()
+        self.replay_engine = ReplayEngine(self.replay, log=log)
+        self.game_state = self.replay_engine.game_state
+        self.in_menu = False
+        self.sub_title = f"Replay of seed {self.replay.seed} ({len(self.replay)} actions)"
+        self.update_display()
+        self.set_interval(1 / self.replay_rate, self.replay_tick)
+    def replay_tick(self):
+        if self.replay_paused or self.replay_engine.finished:
+            return
+        self.replay_engine.step()
+        self.show_replay_position()
+    def action_replay_pause(self):
+        if self.replay_engine:
+            self.replay_paused = not self.replay_paused
+            self.show_replay_position()
+    def action_replay_seek(self, delta: int):
+        if self.replay_engine:
+            self.replay_engine.seek(self.replay_engine.position + delta)
+            self.show_replay_position()
+    def show_replay_position(self):
+        engine = self.replay_engine
+        self.game_state = engine.game_state
+        state = "paused" if self.replay_paused else "finished" if engine.finished else f"{self.replay_rate:g}/s"
+        self.sub_title = f"Replay {engine.position}/{len(engine.replay)} ({state})"
+        if engine.result == "game_over":
+            self.show_game_over()
+        elif engine.result == "victory":
+            self.show_victory()
+        else:
+            self.update_display()
     def show_menu(self):
         self.in_menu = True
         menu_text = Text()
@@ -113,9 +204,13 @@ class EchoesGame(App):
         log.clear()
         log.add_message("Welcome to the Labyrinth...", "warning")
     def action_new_game(self):
+        if self.replay:
+            return
         if self.in_menu or self.game_over:
             self.start_new_game()
     def action_load_game(self):
+        if self.replay:
+            return
         if self.in_menu or self.game_over:
             if self.load_game():
                 log = self.query_one("#log_panel", GameLog)
@@ -127,16 +222,17 @@ class EchoesGame(App):
         self.in_menu = False
         self.game_over = False
         self.victory = False
-        # Choose game mode before creating the game state
-        game_mode = choose_game_mode()
-        start_floor = game_mode.get_start_floor()
+        self.show_map = False
+        self.pending_actions.clear()
         seed = random.randint(0, 999999) 
-        self.game_state = GameState(seed, start_floor=start_floor, mode=game_mode)
+        self.game_state = GameState(seed, world_size=self.world_size, generators=self.generators)
         log = self.query_one("#log_panel", GameLog)
         log.clear()
         log.add_message("You awaken in the depths...", "warning")
-        log.add_message(f"Seed: {seed}", "dim")
+        log.emit("new_game", f"Seed: {seed}", "dim", amount=seed)
         log.add_message(f"Start: {self.game_state.dungeon.start_pos} Exit: {self.game_state.dungeon.exit_pos}  Enemies: {len(self.game_state.dungeon.enemies)}", "dim")
+        self.autosave.start(self.game_state)
+        self.recorder = ReplayRecorder(self.game_state)
         self.update_display()
         
 
@@ -144,42 +240,108 @@ class EchoesGame(App):
         if not self.game_state or self.in_menu:
             return
         display = self.query_one("#game_display", GameDisplay)
-        display.render_game(self.game_state)
-        stats_panel = self.query_one("#stats_panel", Static)
-        stats_text = self.game_state.get_stats_text()
-        stats_panel.update(stats_text)
-        inv_panel = self.query_one("#inventory_panel", Static)
-        inv_text = self.game_state.get_inventory_text()
-        inv_panel.update(inv_text)
+        if self.show_map:
+            with PROFILER.span("render_map"):
+                display.update_display(self.minimap.render(self.game_state))
+        else:
+            with PROFILER.span("render_game"):
+                display.render_game(self.game_state)
+        stats_changed, inventory_changed = self.sidebar.update(self.game_state)
+        if stats_changed:
+            with PROFILER.span("stats_panel"):
+                stats_panel = self.query_one("#stats_panel", Static)
+                stats_text = self.game_state.get_stats_text()
+                stats_panel.update(stats_text)
+        if inventory_changed:
+            with PROFILER.span("inventory_panel"):
+                inv_panel = self.query_one("#inventory_panel", Static)
+                inv_text = self.game_state.get_inventory_text()
+                inv_panel.update(inv_text)
+        PROFILER.end_frame()
+        debug_panel = self.query_one("#debug_panel", Static)
+        if debug_panel.display:
+            debug_panel.update(self.get_debug_text())
+    def action_toggle_debug(self):
+        debug_panel = self.query_one("#debug_panel", Static)
+        debug_panel.display = not debug_panel.display
+        if debug_panel.display:
+            PROFILER.enable()
+            debug_panel.update(self.get_debug_text())
+        elif not self.profile_path:
+            PROFILER.disable()
+    def get_debug_text(self):
+        text = Text()
+        frames = PROFILER.frames
+        if frames:
+            ordered = sorted(frames)
+            text.append(f"Last {len(frames)} actions: ", style="bold")
+            text.append(f"mean {sum(frames) / len(frames) * 1e3:.2f}ms  "
+                        f"p90 {ordered[int(0.9 * (len(ordered) - 1))] * 1e3:.2f}ms  "
+                        f"max {ordered[-1] * 1e3:.2f}ms\n")
+        else:
+            text.append("Profiling... take an action.\n", style="dim")
+        text.append(f"{'phase (ms)':18}{'last':>8}{'mean':>8}{'max':>8}{'calls':>8}\n", style="bold")
+        for name, stats in sorted(PROFILER.summary().items(), key=lambda item: -item[1]["self"]):
+            last = PROFILER.last_frame.get(name, 0.0)
+            style = "red" if last > 0.008 else "yellow" if last > 0.002 else ""
+            text.append(f"{name:18}{last * 1e3:8.2f}{stats['self'] / stats['count'] * 1e3:8.2f}"
+                        f"{stats['max'] * 1e3:8.2f}{stats['count']:8d}\n", style=style)
+        return text
     def action_move_up(self):
-        if not self.in_menu and not self.game_over:
-            self.process_turn("up")
+        self.queue_action("up")
     def action_move_down(self):
-        if not self.in_menu and not self.game_over:
-            self.process_turn("down")
+        self.queue_action("down")
     def action_move_left(self):
-        if not self.in_menu and not self.game_over:
-            self.process_turn("left")
+        self.queue_action("left")
     def action_move_right(self):
-        if not self.in_menu and not self.game_over:
-            self.process_turn("right")
+        self.queue_action("right")
     def action_wait(self):
-        if not self.in_menu and not self.game_over:
-            self.process_turn("wait")
+        self.queue_action("wait")
+    def queue_action(self, action):
+        """Key repeats arrive faster than a frame can be drawn, so actions
+        are queued and played together by run_queued_actions, which runs
+        after the key events already waiting in the message queue."""
+        if self.in_menu or self.game_over or self.replay:
+            return
+        if len(self.pending_actions) < MAX_QUEUED_ACTIONS:
+            self.pending_actions.append(action)
+        if not self.input_scheduled:
+            self.input_scheduled = True
+            self.call_later(self.run_queued_actions)
+    def note_event(self, event):
+        if event.kind in INTERRUPT_EVENTS:
+            self.interrupted = True
+    def run_queued_actions(self):
+        """Play the queued actions, then draw once. Anything that ends the
+        turn loop or deserves a look (combat, a trap, a reveal, sanity
+        dropping low) discards the rest of the queue."""
+        self.input_scheduled = False
+        self.interrupted = False
+        while self.pending_actions and not self.in_menu and not self.game_over:
+            sanity = self.game_state.player.sanity
+            result = self.process_turn(self.pending_actions.popleft())
+            low_sanity = self.game_state.player.sanity < LOW_SANITY <= sanity
+            if result != "continue" or self.interrupted or low_sanity:
+                self.pending_actions.clear()
+        self.update_display()
     def process_turn(self, action):
         log = self.query_one("#log_panel", GameLog)
-        result = self.game_state.process_action(action, log)
+        result = advance(self.game_state, action, log)
+        self.minimap.update(self.game_state)
+        self.recorder.record(action)
+        if result == "floor_complete":
+            self.autosave.snapshot(self.game_state)
+        else:
+            self.autosave.record(self.game_state, action)
         if result == "game_over":
             self.game_over = True
+            self.save_replay()
             self.show_game_over()
         elif result == "victory":
             self.victory = True
+            self.save_replay()
             self.show_victory()
-        elif result == "floor_complete":
-            log.add_message("You descend deeper into the labyrinth...", "warning")
-            self.game_state.next_floor()
-            self.save_game()
-        self.update_display()
+        return result
     def show_game_over(self):
         display = self.query_one("#game_display", GameDisplay)
         death_text = Text()
@@ -225,26 +387,78 @@ class EchoesGame(App):
             log.add_message("Inventory management coming soon!", "info")
     def action_map(self):
         if not self.in_menu and not self.game_over:
-            log = self.query_one("#log_panel", GameLog)
-            log.add_message("Full map view coming soon!", "info")
+            self.show_map = not self.show_map
+            self.update_display()
+    def action_log_scroll(self, delta: int):
+        self.query_one("#log_panel", GameLog).scroll_history(delta)
     def action_quit_game(self):
-        if not self.in_menu and not self.game_over:
+        if not self.in_menu and not self.game_over and not self.replay:
             self.save_game()
+            self.save_replay()
+        self.autosave.close()
+        self.event_log.close()
+        if self.profile_path:
+            PROFILER.dump(self.profile_path)
         self.exit()
     def save_game(self):
         if self.game_state:
-            self.game_state.save_to_file("save.json")
+            self.autosave.snapshot(self.game_state, wait=True)
+    def save_replay(self):
+        if not self.recorder or not len(self.recorder.replay):
+            return
+        try:
+            os.makedirs(REPLAY_DIR, exist_ok=True)
+            self.recorder.save(os.path.join(REPLAY_DIR, f"{self.game_state.seed}-{datetime.now():%Y%m%d-%H%M%S}.rpl"))
+        except OSError as e:
+            log = self.query_one("#log_panel", GameLog)
+            log.add_message(f"Could not save replay: {e}", "error")
+    def read_save(self):
+        """The autosave if there is one, else save.dat or an old save.json;
+        None when there is nothing to load."""
+        game_state = self.autosave.resume(GameState)
+        if game_state is not None:
+            return game_state
+        for filename in (SAVE_FILE, LEGACY_SAVE_FILE):
+            if os.path.exists(filename):
+                game_state = GameState.load_from_file(filename)
+                self.autosave.start(game_state)
+                return game_state
+        return None
     def load_game(self):
         try:
-            self.game_state = GameState.load_from_file("save.json")
-            self.in_menu = False
-            self.game_over = False
-            self.update_display()
-            return True
-        except:
+            game_state = self.read_save()
+        except (OSError, SaveFormatError) as e:
+            log = self.query_one("#log_panel", GameLog)
+            log.add_message(f"Could not load save: {e}", "error")
             return False
-def main():
-    app = EchoesGame()
+        if game_state is None:
+            return False
+        self.game_state = game_state
+        self.show_map = False
+        self.pending_actions.clear()
+        self.recorder = ReplayRecorder(game_state, from_save=True)
+        self.in_menu = False
+        self.game_over = False
+        self.update_display()
+        return True
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Echoes of the Labyrinth")
+    parser.add_argument("--replay", help="play back a recorded .rpl file")
+    parser.add_argument("--rate", type=float, default=10.0, help="replay actions per second")
+    parser.add_argument("--world", type=parse_world_size, metavar="WxH",
+                        help="play on a chunked large map of this size, e.g. 1000x1000")
+    parser.add_argument("--generator", type=parse_generators, metavar="NAME[,NAME...]",
+                        help="floor layout per floor, the last repeating: legacy (default), bsp or caves")
+    parser.add_argument("--profile", metavar="FILE",
+                        help="time turn phases and write them on quit (.pstats/.prof for cProfile, else a trace JSON)")
+    parser.add_argument("--events", metavar="FILE",
+                        help="append every game event to this file as JSON lines")
+    args = parser.parse_args(argv)
+    replay = Replay.load(args.replay) if args.replay else None
+    if args.profile:
+        PROFILER.enable(args.profile)
+    app = EchoesGame(replay=replay, rate=args.rate, profile_path=args.profile, world_size=args.world,
+                     events_path=args.events, generators=args.generator)
     app.run()
 
 
@@ -4,6 +4,8 @@ Map generation module - Dungeon and room classes.
 
 from map.dungeon import Dungeon
 from map.room import Room, Trap, Door, RoomFeature
+from map.fov import FieldOfView
+from map.pathfinding import Pathfinder
 
 __all__ = [
     'Dungeon',
@@ -11,4 +13,6 @@ __all__ = [
     'Trap',
     'Door',
     'RoomFeature',
+    'FieldOfView',
+    'Pathfinder',
 ]
\ No newline at end of file
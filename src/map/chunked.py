@@ -0,0 +1,386 @@
+import os
+import random
+import tempfile
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+from map.dungeon import Dungeon, WALKABLE_TILES
+from map.fov import FieldOfView
+from map.pathfinding import Pathfinder, UNREACHABLE
+from map.room import Room
+from map.spatial import RoomIndex
+
+CHUNK_SIZE = 40
+CHUNK_AREA = CHUNK_SIZE * CHUNK_SIZE
+DEFAULT_CHUNK_BUDGET = 64
+LOAD_RADIUS = 1
+MAX_ROOMS_PER_CHUNK = 2
+ROOM_ATTEMPTS = 20
+ROCK = ord("#")
+
+def parse_world_size(text: str) -> Tuple[int, int]:
+    """'1000x1000' -> (1000, 1000); for argparse `type=`."""
+    try:
+        width, height = (int(part) for part in text.lower().split("x"))
+    except ValueError:
+        raise ValueError(f"world size must look like 1000x1000, not {text!r}")
+    if width < CHUNK_SIZE or height < CHUNK_SIZE:
+        raise ValueError(f"world size must be at least {CHUNK_SIZE}x{CHUNK_SIZE}")
+    return width, height
+
+class Chunk:
+    __slots__ = ("cx", "cy", "tiles", "seen", "room_index")
+    def __init__(self, cx, cy, tiles=None, seen=None):
+        self.cx = cx
+        self.cy = cy
+        self.tiles = bytearray(tiles) if tiles else bytearray(b"#" * CHUNK_AREA)
+        self.seen = bytearray(seen) if seen else bytearray(CHUNK_AREA)
+        self.room_index = RoomIndex(CHUNK_SIZE, CHUNK_SIZE, cx * CHUNK_SIZE, cy * CHUNK_SIZE)
+    @property
+    def rooms(self) -> List[Room]:
+        return self.room_index.rooms
+    def contains(self, x, y) -> bool:
+        return x // CHUNK_SIZE == self.cx and y // CHUNK_SIZE == self.cy
+
+class ChunkLayer:
+    """Flat row-major view (y * width + x) over one bytearray of every
+    resident chunk, so code written against Dungeon.grid or FieldOfView.seen
+    works unchanged. Cells of chunks not in memory read as `default` and
+    ignore writes."""
+    def __init__(self, dungeon, field, default):
+        self.dungeon = dungeon
+        self.field = field
+        self.default = default
+    def __len__(self):
+        return self.dungeon.width * self.dungeon.height
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return bytes(self[i] for i in range(*index.indices(len(self))))
+        y, x = divmod(index, self.dungeon.width)
+        chunk = self.dungeon.resident.get((x // CHUNK_SIZE, y // CHUNK_SIZE))
+        if chunk is None:
+            return self.default
+        return getattr(chunk, self.field)[(y % CHUNK_SIZE) * CHUNK_SIZE + x % CHUNK_SIZE]
+    def __setitem__(self, index, value):
+        y, x = divmod(index, self.dungeon.width)
+        chunk = self.dungeon.resident.get((x // CHUNK_SIZE, y // CHUNK_SIZE))
+        if chunk is not None:
+            getattr(chunk, self.field)[(y % CHUNK_SIZE) * CHUNK_SIZE + x % CHUNK_SIZE] = value
+
+class SparseFlags(dict):
+    """Index -> 1 for set cells only; unset cells read as 0."""
+    def __missing__(self, key):
+        return 0
+    def __setitem__(self, key, value):
+        if value:
+            dict.__setitem__(self, key, value)
+        else:
+            self.pop(key, None)
+
+class SparseDistances(dict):
+    def __missing__(self, key):
+        return UNREACHABLE
+
+class ChunkedFieldOfView(FieldOfView):
+    """FieldOfView whose `seen` bitmap lives in the chunks (and is evicted
+    with them). Computing from a new origin first makes sure the chunks
+    around it are resident."""
+    def __init__(self, dungeon):
+        self.dungeon = dungeon
+        self.width = dungeon.width
+        self.height = dungeon.height
+        self.visible = SparseFlags()
+        self.seen = ChunkLayer(dungeon, "seen", 0)
+        self.visible_cells: List[int] = []
+        self.origin = None
+        self.radius = 0
+        self.stale = True
+    def compute(self, x, y, radius):
+        self.dungeon.ensure_around(x, y)
+        super().compute(x, y, radius)
+
+class ChunkedPathfinder(Pathfinder):
+    max_expansions = 4 * CHUNK_AREA
+    max_distance = 2 * CHUNK_SIZE
+    def new_distance_map(self):
+        return SparseDistances()
+
+class ChunkedDungeon(Dungeon):
+    """A large floor split into CHUNK_SIZE square chunks.
+
+    A chunk is generated the first time the player comes near it, from its
+    own seeded stream, so chunks can be built in any order. Rooms never
+    cross a chunk border and neighbouring chunks meet at a corridor portal
+    both sides derive from the seed, so the floor stays connected. Overlap
+    tests and room lookups only look at one chunk's rooms.
+
+    At most `chunk_budget` chunks stay in memory. The least recently visited
+    ones are written to `store_dir` (a temporary directory by default), with
+    their rooms, traps, features and enemies, and read back on return. Cells
+    of chunks that are not in memory behave as solid rock."""
+    def __init__(self, floor_level, seed=None, rng=None, width=1000, height=1000,
+                 chunk_budget=DEFAULT_CHUNK_BUDGET, store_dir=None, generate=True):
+        self.chunk_cols = max(1, -(-width // CHUNK_SIZE))
+        self.chunk_rows = max(1, -(-height // CHUNK_SIZE))
+        self.chunk_budget = max(chunk_budget, (2 * LOAD_RADIUS + 1) ** 2)
+        self.resident: "OrderedDict[Tuple[int, int], Chunk]" = OrderedDict()
+        self.stored: Set[Tuple[int, int]] = set()
+        self.away_homes: Dict[int, Tuple[int, int, int]] = {}
+        self.store_dir = store_dir
+        self.temp_store = None
+        self.focus_chunk = None
+        super().__init__(floor_level, seed, rng, generate=False)
+        self.width = self.chunk_cols * CHUNK_SIZE
+        self.height = self.chunk_rows * CHUNK_SIZE
+        self.grid = ChunkLayer(self, "tiles", ROCK)
+        self.fov = ChunkedFieldOfView(self)
+        self.pathfinder = ChunkedPathfinder(self)
+        self.room_index = None
+        self.start_chunk = (self.chunk_cols // 2, self.chunk_rows // 2)
+        self.exit_chunk = self.pick_exit_chunk()
+        if generate:
+            self.generate()
+    def pick_exit_chunk(self) -> Tuple[int, int]:
+        sx, sy = self.start_chunk
+        wanted = max(self.chunk_cols, self.chunk_rows) // 3
+        best = self.start_chunk
+        for _ in range(100):
+            candidate = (self.rng.randrange(self.chunk_cols), self.rng.randrange(self.chunk_rows))
+            distance = max(abs(candidate[0] - sx), abs(candidate[1] - sy))
+            if distance >= wanted:
+                return candidate
+            if distance > max(abs(best[0] - sx), abs(best[1] - sy)):
+                best = candidate
+        return best
+    def generate(self):
+        start = self.load_chunk(*self.start_chunk)
+        self.start_pos = start.rooms[0].get_random_walkable_position()
+        exit_chunk = self.load_chunk(*self.exit_chunk)
+        self.exit_pos = exit_chunk.rooms[-1].get_random_walkable_position()
+        self.ensure_around(*self.start_pos)
+    def chunk_rng(self, *parts) -> random.Random:
+        return random.Random(":".join(str(part) for part in (self.seed, self.floor_level) + parts))
+    def portal(self, direction: str, cx: int, cy: int) -> int:
+        """Offset along the east ('e') or south ('s') border of a chunk where
+        the corridor to the neighbour crosses it."""
+        return self.chunk_rng(direction, cx, cy).randint(2, CHUNK_SIZE - 3)
+    def generate_chunk(self, cx, cy) -> Chunk:
+        rng = self.chunk_rng(cx, cy)
+        ox, oy = cx * CHUNK_SIZE, cy * CHUNK_SIZE
+        special = []
+        if (cx, cy) == self.start_chunk:
+            special.append("start")
+        if (cx, cy) == self.exit_chunk:
+            special.append("boss" if self.is_final_floor else "exit")
+        index = RoomIndex(CHUNK_SIZE, CHUNK_SIZE, ox, oy)
+        rooms = index.rooms
+        for _ in range(max(len(special), rng.randint(0, MAX_ROOMS_PER_CHUNK))):
+            width = rng.randint(8, 15)
+            height = rng.randint(6, 12)
+            for _ in range(ROOM_ATTEMPTS):
+                x = rng.randint(ox + 1, ox + CHUNK_SIZE - width - 1)
+                y = rng.randint(oy + 1, oy + CHUNK_SIZE - height - 1)
+                if not index.overlaps(x, y, width, height):
+                    room = Room(x, y, width, height, rng=rng)
+                    room.room_type = rng.choice(["normal", "normal", "normal", "treasure", "trap", "echo"])
+                    index.add(room)
+                    break
+        if special:
+            rooms[0].room_type = special[0]
+            rooms[-1].room_type = special[-1]
+        corridors: Set[Tuple[int, int]] = set()
+        for room1, room2 in zip(rooms, rooms[1:]):
+            x1, y1 = room1.x + room1.width // 2, room1.y + room1.height // 2
+            x2, y2 = room2.x + room2.width // 2, room2.y + room2.height // 2
+            self.carve(corridors, x1, y1, x2, y2, horizontal_first=rng.random() < 0.5)
+        if rooms:
+            hx, hy = rooms[0].x + rooms[0].width // 2, rooms[0].y + rooms[0].height // 2
+        else:
+            hx, hy = ox + CHUNK_SIZE // 2, oy + CHUNK_SIZE // 2
+        edge = CHUNK_SIZE - 1
+        if cx + 1 < self.chunk_cols:
+            self.carve(corridors, hx, hy, ox + edge, oy + self.portal("e", cx, cy), horizontal_first=False)
+        if cx > 0:
+            self.carve(corridors, hx, hy, ox, oy + self.portal("e", cx - 1, cy), horizontal_first=False)
+        if cy + 1 < self.chunk_rows:
+            self.carve(corridors, hx, hy, ox + self.portal("s", cx, cy), oy + edge, horizontal_first=True)
+        if cy > 0:
+            self.carve(corridors, hx, hy, ox + self.portal("s", cx, cy - 1), oy, horizontal_first=True)
+        for room in rooms:
+            for x, y in corridors:
+                local_x, local_y = x - room.x, y - room.y
+                on_wall = local_x in (0, room.width - 1) or local_y in (0, room.height - 1)
+                if on_wall and 0 <= local_x < room.width and 0 <= local_y < room.height:
+                    room.add_door(local_x, local_y)
+        chunk = self.install_chunk(cx, cy)
+        tiles = chunk.tiles
+        for x, y in corridors:
+            tiles[(y - oy) * CHUNK_SIZE + x - ox] = ord(".")
+        for room in rooms:
+            for dy, row in enumerate(room.tiles):
+                start = (room.y - oy + dy) * CHUNK_SIZE + room.x - ox
+                tiles[start:start + room.width] = "".join(row).encode()
+        for room in rooms:
+            room.dungeon = self
+            room.populate(self.floor_level)
+        chunk.room_index = index
+        self.rooms.extend(rooms)
+        for room in rooms:
+            self.spawn_room_enemies(room, rng)
+        return chunk
+    @staticmethod
+    def carve(corridors, x1, y1, x2, y2, horizontal_first):
+        corner = (x2, y1) if horizontal_first else (x1, y2)
+        for (ax, ay), (bx, by) in (((x1, y1), corner), (corner, (x2, y2))):
+            for x in range(min(ax, bx), max(ax, bx) + 1):
+                for y in range(min(ay, by), max(ay, by) + 1):
+                    corridors.add((x, y))
+    def room_overlaps(self, new_room: Room) -> bool:
+        chunk = self.resident.get((new_room.x // CHUNK_SIZE, new_room.y // CHUNK_SIZE))
+        return bool(chunk) and chunk.room_index.overlaps(new_room.x, new_room.y, new_room.width, new_room.height)
+    def install_chunk(self, cx, cy, tiles=None, seen=None) -> Chunk:
+        chunk = Chunk(cx, cy, tiles, seen)
+        self.resident[(cx, cy)] = chunk
+        return chunk
+    def load_chunk(self, cx, cy) -> Chunk:
+        key = (cx, cy)
+        chunk = self.resident.get(key)
+        if chunk is not None:
+            self.resident.move_to_end(key)
+            return chunk
+        if key in self.stored:
+            from data import savefile
+            path = self.chunk_path(cx, cy)
+            with open(path, "rb") as f:
+                chunk = savefile.restore_chunk(self, f.read())
+            self.stored.discard(key)
+            os.remove(path)
+            for enemy_id, home in list(self.away_homes.items()):
+                if home[:2] == key:
+                    del self.away_homes[enemy_id]
+                    self.link_home(self.enemies.get(enemy_id), home)
+        else:
+            chunk = self.generate_chunk(cx, cy)
+        self.terrain_version += 1
+        self.fov.stale = True
+        return chunk
+    def ensure_around(self, x, y):
+        """Make the chunks within LOAD_RADIUS of (x, y) resident, then evict
+        the least recently used others beyond the budget."""
+        focus = (x // CHUNK_SIZE, y // CHUNK_SIZE)
+        if focus == self.focus_chunk:
+            return
+        self.focus_chunk = focus
+        pinned = set()
+        for cy in range(focus[1] - LOAD_RADIUS, focus[1] + LOAD_RADIUS + 1):
+            for cx in range(focus[0] - LOAD_RADIUS, focus[0] + LOAD_RADIUS + 1):
+                if 0 <= cx < self.chunk_cols and 0 <= cy < self.chunk_rows:
+                    pinned.add((cx, cy))
+                    self.load_chunk(cx, cy)
+        if focus in self.resident:
+            self.resident.move_to_end(focus)
+        for key in list(self.resident):
+            if len(self.resident) <= self.chunk_budget:
+                break
+            if key not in pinned:
+                self.evict_chunk(key)
+    def chunk_enemies(self, chunk) -> List:
+        enemies = [enemy for enemy in self.enemies if chunk.contains(enemy.x, enemy.y)]
+        enemies.sort(key=lambda enemy: enemy.id)
+        return enemies
+    def home_of(self, enemy) -> Optional[Tuple[int, int, int]]:
+        """An enemy's home room as (cx, cy, index in that chunk's rooms),
+        which stays valid while either of them is evicted."""
+        room = self.home_rooms.get(enemy.id)
+        if room is None:
+            return self.away_homes.get(enemy.id)
+        cx, cy = room.x // CHUNK_SIZE, room.y // CHUNK_SIZE
+        return cx, cy, self.resident[(cx, cy)].rooms.index(room)
+    def link_home(self, enemy, home):
+        """Attach an enemy to its home room, or remember the room until its
+        chunk is loaded again."""
+        chunk = self.resident.get((home[0], home[1]))
+        if chunk is None:
+            self.away_homes[enemy.id] = tuple(home)
+            return
+        room = chunk.rooms[home[2]]
+        room.enemies.add(enemy)
+        self.home_rooms[enemy.id] = room
+    def remove_enemy(self, enemy):
+        super().remove_enemy(enemy)
+        self.away_homes.pop(enemy.id, None)
+    def evict_chunk(self, key):
+        from data import savefile
+        chunk = self.resident[key]
+        enemies = self.chunk_enemies(chunk)
+        data = savefile.capture_chunk(self, chunk, enemies)
+        with open(self.chunk_path(*key), "wb") as f:
+            f.write(data)
+        self.stored.add(key)
+        # Enemies that wandered off stay resident; their home becomes a reference.
+        leaving = {enemy.id for enemy in enemies}
+        for index, room in enumerate(chunk.rooms):
+            for enemy in list(room.enemies):
+                if enemy.id not in leaving:
+                    room.enemies.discard(enemy)
+                    del self.home_rooms[enemy.id]
+                    self.away_homes[enemy.id] = (key[0], key[1], index)
+        for room in chunk.rooms:
+            for trap in room.traps:
+                if self.trap_index.get((trap.x, trap.y)) is trap:
+                    del self.trap_index[(trap.x, trap.y)]
+            for feature in room.features:
+                if self.feature_index.get((feature.x, feature.y)) is feature:
+                    del self.feature_index[(feature.x, feature.y)]
+        evicted_rooms = set(map(id, chunk.rooms))
+        self.rooms = [room for room in self.rooms if id(room) not in evicted_rooms]
+        for enemy in enemies:
+            self.remove_enemy(enemy)
+        del self.resident[key]
+        self.terrain_version += 1
+        self.fov.stale = True
+    def chunk_path(self, cx, cy) -> str:
+        if self.store_dir is None:
+            self.temp_store = tempfile.TemporaryDirectory(prefix="echoes-chunks-")
+            self.store_dir = self.temp_store.name
+        os.makedirs(self.store_dir, exist_ok=True)
+        return os.path.join(self.store_dir, f"floor{self.floor_level}-{cx}-{cy}.chunk")
+    def chunk_records(self):
+        """(cx, cy, packed chunk) for every chunk generated so far."""
+        from data import savefile
+        for cx, cy in sorted(set(self.resident) | self.stored):
+            chunk = self.resident.get((cx, cy))
+            if chunk is not None:
+                yield cx, cy, savefile.capture_chunk(self, chunk, self.chunk_enemies(chunk))
+            else:
+                with open(self.chunk_path(cx, cy), "rb") as f:
+                    yield cx, cy, f.read()
+    def store_chunk(self, cx, cy, data: bytes):
+        with open(self.chunk_path(cx, cy), "wb") as f:
+            f.write(data)
+        self.stored.add((cx, cy))
+    def chunk_at(self, x, y) -> Optional[Chunk]:
+        return self.resident.get((x // CHUNK_SIZE, y // CHUNK_SIZE))
+    def get_tile(self, x, y):
+        if 0 <= x < self.width and 0 <= y < self.height:
+            chunk = self.resident.get((x // CHUNK_SIZE, y // CHUNK_SIZE))
+            if chunk is not None:
+                return chr(chunk.tiles[(y % CHUNK_SIZE) * CHUNK_SIZE + x % CHUNK_SIZE])
+        return "#"
+    def is_passable(self, x, y):
+        if 0 <= x < self.width and 0 <= y < self.height:
+            chunk = self.resident.get((x // CHUNK_SIZE, y // CHUNK_SIZE))
+            if chunk is not None:
+                return chunk.tiles[(y % CHUNK_SIZE) * CHUNK_SIZE + x % CHUNK_SIZE] in WALKABLE_TILES
+        return False
+    def is_walkable(self, x, y):
+        return self.is_passable(x, y) and not self.get_enemy_at(x, y)
+    def get_room_at(self, x, y):
+        chunk = self.chunk_at(x, y)
+        return chunk.room_index.room_at(x, y) if chunk is not None else None
+    def bake_grid(self):
+        self.terrain_version += 1
+    def spawn_enemies(self):
+        pass
+    def __repr__(self):
+        return (f"ChunkedDungeon(Floor:{self.floor_level}, {self.width}x{self.height}, "
+                f"Chunks:{len(self.resident)}+{len(self.stored)} stored, Enemies:{len(self.enemies)})")
@@ -1,63 +1,63 @@
 import random
-from typing import List, Tuple
+from typing import Dict, List, Set, Tuple
 from map.room import Room
+from map.fov import FieldOfView
+from map.generators import create_generator
+from map.pathfinding import Pathfinder
+from map.spatial import RoomIndex
 from entity.enemies import create_enemy
+from entity.scheduler import EnemyScheduler
+from entity.store import EntityStore
+
+WALKABLE_TILES = frozenset(b".' >")
 
 class Dungeon:
-    def __init__(self, floor_level, seed=None):
+    def __init__(self, floor_level, seed=None, rng=None, generate=True, generator=None, width=80, height=40):
         self.floor_level = floor_level
         self.seed = seed
-        if seed:
-            random.seed(seed + floor_level)
-        self.width = 80
-        self.height = 40
+        if rng is not None:
+            self.rng = rng.generation(floor_level)
+            self.ai_rng = rng.ai
+        elif seed is not None:
+            self.rng = random.Random(seed + floor_level)
+            self.ai_rng = random.Random(f"{seed}:ai")
+        else:
+            self.rng = random.Random()
+            self.ai_rng = random.Random()
+        self.width = width
+        self.height = height
+        self.generator = create_generator(generator)
         self.rooms: List[Room] = []
-        self.corridors: List[Tuple[int, int]] = []
-        self.enemies = []
+        self.room_index = RoomIndex(self.width, self.height)
+        self.corridors: Set[Tuple[int, int]] = set()
+        self.grid = bytearray(b"#" * (self.width * self.height))
+        self.terrain_version = 0
+        self.enemies = EntityStore()
+        self.home_rooms: Dict[int, Room] = {}
+        self.enemy_index: Dict[Tuple[int, int], List] = {}
+        self.next_enemy_id = 1
+        self.scheduler = EnemyScheduler(self)
+        self.trap_index = {}
+        self.feature_index = {}
+        # Cells changed since the last frame; only collected once a renderer
+        # that clears them has attached (see ViewportRenderer.reset).
+        self.dirty: Set[Tuple[int, int]] = set()
+        self.track_dirty = False
         self.start_pos = None
         self.exit_pos = None
         self.is_final_floor = (floor_level >= 5)
-        self.generate()
+        self.fov = FieldOfView(self)
+        self.pathfinder = Pathfinder(self)
+        if generate:
+            self.generate()
     def generate(self):
-        num_rooms = 6 + self.floor_level
-        for i in range(num_rooms):
-            width = random.randint(8, 15)
-            height = random.randint(6, 12)
-            placed = False
-            for _ in range(50):
-                x = random.randint(1, self.width - width - 2)
-                y = random.randint(1, self.height - height - 2)
-                new_room = Room(x, y, width, height)
-                if not self.room_overlaps(new_room):
-                    if i == 0:
-                        room_type = "start"
-                    elif i == num_rooms - 1:
-                        room_type = "exit" if not self.is_final_floor else "boss"
-                    else:
-                        room_type = random.choice([
-                            "normal", "normal", "normal",
-                            "treasure", "trap", "echo"
-                        ])
-                    new_room.room_type = room_type
-                    new_room.populate(self.floor_level)
-                    self.rooms.append(new_room)
-                    placed = True
-                    break
-            if not placed and len(self.rooms) > 3:
-                break
-        self.connect_rooms()
-        if self.rooms:
-            self.start_pos = self.rooms[0].get_random_walkable_position()
-            self.exit_pos = self.rooms[-1].get_random_walkable_position()
+        self.generator.generate(self)
         self.spawn_enemies()
+    def add_room(self, room: Room):
+        self.rooms.append(room)
+        self.room_index.add(room)
     def room_overlaps(self, new_room: Room) -> bool:
-        for room in self.rooms:
-            if (new_room.x < room.x + room.width + 1 and
-                new_room.x + new_room.width + 1 > room.x and
-                new_room.y < room.y + room.height + 1 and
-                new_room.y + new_room.height + 1 > room.y):
-                return True
-        return False
+        return self.room_index.overlaps(new_room.x, new_room.y, new_room.width, new_room.height)
     def connect_rooms(self):
         for i in range(len(self.rooms) - 1):
             room1 = self.rooms[i]
@@ -66,7 +66,7 @@ class Dungeon:
             y1 = room1.y + room1.height // 2
             x2 = room2.x + room2.width // 2
             y2 = room2.y + room2.height // 2
-            if random.random() < 0.5:
+            if self.rng.random() < 0.5:
                 self.create_h_corridor(x1, x2, y1)
                 self.create_v_corridor(y1, y2, x2)
             else:
@@ -74,73 +74,112 @@ class Dungeon:
                 self.create_h_corridor(x1, x2, y2)
     def create_h_corridor(self, x1, x2, y):
         for x in range(min(x1, x2), max(x1, x2) + 1):
-            self.corridors.append((x, y))
+            self.corridors.add((x, y))
     def create_v_corridor(self, y1, y2, x):
         for y in range(min(y1, y2), max(y1, y2) + 1):
-            self.corridors.append((x, y))
+            self.corridors.add((x, y))
+    def bake_grid(self):
+        grid = bytearray(b"#" * (self.width * self.height))
+        for x, y in self.corridors:
+            grid[y * self.width + x] = ord(".")
+        for room in self.rooms:
+            for dy, row in enumerate(room.tiles):
+                start = (room.y + dy) * self.width + room.x
+                grid[start:start + room.width] = "".join(row).encode()
+        self.grid = grid
+        self.terrain_version += 1
+    def set_tile(self, x, y, tile):
+        if 0 <= x < self.width and 0 <= y < self.height:
+            self.grid[y * self.width + x] = ord(tile)
+            self.mark_dirty(x, y)
+            self.fov.stale = True
+            self.terrain_version += 1
+    def mark_dirty(self, x, y):
+        if self.track_dirty:
+            self.dirty.add((x, y))
     def spawn_enemies(self):
+        for room in self.rooms:
+            self.spawn_room_enemies(room, self.rng)
+    def spawn_room_enemies(self, room, rng):
         enemy_types = ["shade", "warden", "whisper"]
         enemies_per_room = 1 + (self.floor_level // 2)
-        for room in self.rooms:
-            if room.room_type in ["normal", "trap", "echo"]:
-                num_enemies = random.randint(0, enemies_per_room)
-                for _ in range(num_enemies):
-                    enemy_type = random.choice(enemy_types)
-                    pos = room.get_random_walkable_position()
-                    enemy = create_enemy(enemy_type, pos[0], pos[1], self.floor_level)
-                    self.enemies.append(enemy)
-                    room.enemies.append(enemy)
-            elif room.room_type == "treasure" and random.random() < 0.5:
+        if room.room_type in ["normal", "trap", "echo"]:
+            num_enemies = rng.randint(0, enemies_per_room)
+            for _ in range(num_enemies):
+                enemy_type = rng.choice(enemy_types)
                 pos = room.get_random_walkable_position()
-                mimic = create_enemy("mimic", pos[0], pos[1], self.floor_level)
-                self.enemies.append(mimic)
-                room.enemies.append(mimic)
+                enemy = create_enemy(enemy_type, pos[0], pos[1], self.floor_level, self.ai_rng)
+                self.add_enemy(enemy, room)
+        elif room.room_type == "treasure" and rng.random() < 0.5:
+            pos = room.get_random_walkable_position()
+            mimic = create_enemy("mimic", pos[0], pos[1], self.floor_level, self.ai_rng)
+            self.add_enemy(mimic, room)
+    def add_enemy(self, enemy, room=None):
+        if not enemy.id:
+            enemy.id = self.next_enemy_id
+            self.next_enemy_id += 1
+        self.enemies.add(enemy)
+        if room:
+            room.enemies.add(enemy)
+            self.home_rooms[enemy.id] = room
+        self.enemy_index.setdefault((enemy.x, enemy.y), []).append(enemy)
+        self.scheduler.add(enemy)
+    def move_enemy(self, enemy, x, y):
+        if self.track_dirty:
+            self.dirty.add((enemy.x, enemy.y))
+            self.dirty.add((x, y))
+        self._unindex_enemy(enemy)
+        enemy.x = x
+        enemy.y = y
+        self.enemy_index.setdefault((x, y), []).append(enemy)
+    def _unindex_enemy(self, enemy):
+        pos = (enemy.x, enemy.y)
+        occupants = self.enemy_index.get(pos)
+        if occupants and enemy in occupants:
+            occupants.remove(enemy)
+            if not occupants:
+                del self.enemy_index[pos]
+    def register_trap(self, trap):
+        self.trap_index.setdefault((trap.x, trap.y), trap)
+    def register_feature(self, feature):
+        self.feature_index.setdefault((feature.x, feature.y), feature)
     def get_tile(self, x, y):
-        for room in self.rooms:
-            if (room.x <= x < room.x + room.width and
-                room.y <= y < room.y + room.height):
-                local_x = x - room.x
-                local_y = y - room.y
-                return room.get_tile(local_x, local_y)
-        if (x, y) in self.corridors:
-            return "."
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return chr(self.grid[y * self.width + x])
         return "#"
     def is_walkable(self, x, y):
         if x < 0 or x >= self.width or y < 0 or y >= self.height:
             return False
-        for enemy in self.enemies:
-            if enemy.alive and enemy.x == x and enemy.y == y:
-                return False
-        tile = self.get_tile(x, y)
-        return tile in [".", "'", " ", ">"]
+        if self.get_enemy_at(x, y):
+            return False
+        return self.grid[y * self.width + x] in WALKABLE_TILES
+    def is_passable(self, x, y):
+        if x < 0 or x >= self.width or y < 0 or y >= self.height:
+            return False
+        return self.grid[y * self.width + x] in WALKABLE_TILES
     def get_room_at(self, x, y):
-        for room in self.rooms:
-            if (room.x <= x < room.x + room.width and
-                room.y <= y < room.y + room.height):
-                return room
-        return None
+        return self.room_index.room_at(x, y)
     def get_trap_at(self, x, y):
-        room = self.get_room_at(x, y)
-        if room:
-            for trap in room.traps:
-                if trap.x == x and trap.y == y:
-                    return trap
-        return None
+        return self.trap_index.get((x, y))
     def get_feature_at(self, x, y):
-        room = self.get_room_at(x, y)
-        if room:
-            for feature in room.features:
-                if feature.x == x and feature.y == y:
-                    return feature
-        return None
+        return self.feature_index.get((x, y))
     def get_enemy_at(self, x, y):
-        for enemy in self.enemies:
-            if enemy.alive and enemy.x == x and enemy.y == y:
-                return enemy
+        occupants = self.enemy_index.get((x, y))
+        if occupants:
+            for enemy in occupants:
+                if enemy.alive:
+                    return enemy
         return None
+    def remove_enemy(self, enemy):
+        self._unindex_enemy(enemy)
+        self.scheduler.remove(enemy)
+        self.mark_dirty(enemy.x, enemy.y)
+        self.enemies.discard(enemy)
+        room = self.home_rooms.pop(enemy.id, None)
+        if room:
+            room.enemies.discard(enemy)
     def remove_dead_enemies(self):
-        self.enemies = [e for e in self.enemies if e.alive]
-        for room in self.rooms:
-            room.enemies = [e for e in room.enemies if e.alive]
+        for enemy in [enemy for enemy in self.enemies if not enemy.alive]:
+            self.remove_enemy(enemy)
     def __repr__(self):
         return f"Dungeon(Floor:{self.floor_level}, Rooms:{len(self.rooms)}, Enemies:{len(self.enemies)})"
\ No newline at end of file
@@ -0,0 +1,94 @@
+from typing import List
+
+OPAQUE_TILES = frozenset(b"#+")
+OCTANTS = [
+    (1, 0, 0, 1),
+    (0, 1, 1, 0),
+    (0, -1, 1, 0),
+    (-1, 0, 0, 1),
+    (-1, 0, 0, -1),
+    (0, -1, -1, 0),
+    (0, 1, -1, 0),
+    (1, 0, 0, -1),
+]
+
+class FieldOfView:
+    """Recursive shadowcasting over a dungeon's tile grid.
+
+    `visible` and `seen` are flat bitmaps (one byte per cell, row-major like
+    Dungeon.grid): `visible` holds the cells lit by the last computation and
+    `seen` every cell the player has ever had in view on this floor."""
+    def __init__(self, dungeon):
+        self.dungeon = dungeon
+        self.width = dungeon.width
+        self.height = dungeon.height
+        self.visible = bytearray(self.width * self.height)
+        self.seen = bytearray(self.width * self.height)
+        self.visible_cells: List[int] = []
+        self.origin = None
+        self.radius = 0
+        self.stale = True
+    def is_visible(self, x, y) -> bool:
+        return 0 <= x < self.width and 0 <= y < self.height and bool(self.visible[y * self.width + x])
+    def is_seen(self, x, y) -> bool:
+        return 0 <= x < self.width and 0 <= y < self.height and bool(self.seen[y * self.width + x])
+    def update(self, x, y, radius):
+        if self.stale or self.origin != (x, y) or self.radius != radius:
+            self.compute(x, y, radius)
+    def compute(self, x, y, radius):
+        for index in self.visible_cells:
+            self.visible[index] = 0
+        self.visible_cells = []
+        self.origin = (x, y)
+        self.radius = radius
+        self.stale = False
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return
+        self._light(x, y)
+        for xx, xy, yx, yy in OCTANTS:
+            self._cast(x, y, 1, 1.0, 0.0, radius, xx, xy, yx, yy)
+    def _light(self, x, y):
+        index = y * self.width + x
+        if not self.visible[index]:
+            self.visible[index] = 1
+            self.seen[index] = 1
+            self.visible_cells.append(index)
+    def _opaque(self, x, y):
+        if x < 0 or x >= self.width or y < 0 or y >= self.height:
+            return True
+        return self.dungeon.grid[y * self.width + x] in OPAQUE_TILES
+    def _cast(self, cx, cy, row, start, end, radius, xx, xy, yx, yy):
+        if start < end:
+            return
+        radius_sq = radius * radius
+        new_start = start
+        for distance in range(row, radius + 1):
+            dx = -distance - 1
+            dy = -distance
+            blocked = False
+            while dx <= 0:
+                dx += 1
+                map_x = cx + dx * xx + dy * xy
+                map_y = cy + dx * yx + dy * yy
+                left_slope = (dx - 0.5) / (dy + 0.5)
+                right_slope = (dx + 0.5) / (dy - 0.5)
+                if start < right_slope:
+                    continue
+                if end > left_slope:
+                    break
+                in_bounds = 0 <= map_x < self.width and 0 <= map_y < self.height
+                if in_bounds and dx * dx + dy * dy <= radius_sq:
+                    self._light(map_x, map_y)
+                opaque = self._opaque(map_x, map_y)
+                if blocked:
+                    if opaque:
+                        new_start = right_slope
+                    else:
+                        blocked = False
+                        start = new_start
+                elif opaque and distance < radius:
+                    blocked = True
+                    self._cast(cx, cy, distance + 1, start, left_slope, radius, xx, xy, yx, yy)
+                    new_start = right_slope
+            if blocked:
+                break
@@ -0,0 +1,292 @@
+import heapq
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Dict, List, Optional, Sequence, Tuple
+from map.room import Room
+
+DEFAULT_GENERATOR = "legacy"
+STANDARD_AREA = 80 * 40
+MAX_ROOMS = 255
+ROOM_TYPES = ["normal", "normal", "normal", "treasure", "trap", "echo"]
+MIN_LEAF_WIDTH = 10
+MIN_LEAF_HEIGHT = 8
+FLOOR = ord(".")
+ROCK = ord("#")
+# Cave fill: a random byte below this starts as rock (about 49%).
+CAVE_FILL = 125
+CAVE_STEPS = 4
+# Rock where at least five of the nine cells around a cell are rock.
+CAVE_RULE = bytes(1 if count >= 5 else 0 for count in range(256))
+CAVE_TILES = bytes.maketrans(b"\x00\x01", b".#")
+
+def room_count(dungeon) -> int:
+    """6 + floor rooms on a standard floor, in proportion on larger ones."""
+    per_floor = 6 + dungeon.floor_level
+    return min(MAX_ROOMS, max(2, per_floor * dungeon.width * dungeon.height // STANDARD_AREA))
+
+def room_type(dungeon, index: int, count: int) -> str:
+    if index == 0:
+        return "start"
+    if index == count - 1:
+        return "exit" if not dungeon.is_final_floor else "boss"
+    return dungeon.rng.choice(ROOM_TYPES)
+
+def place_room(dungeon, room: Room, room_type: str):
+    room.room_type = room_type
+    room.dungeon = dungeon
+    room.populate(dungeon.floor_level)
+    dungeon.add_room(room)
+
+def place_exits(dungeon):
+    if dungeon.rooms:
+        dungeon.start_pos = dungeon.rooms[0].get_random_walkable_position()
+        dungeon.exit_pos = dungeon.rooms[-1].get_random_walkable_position()
+
+def sync_room_tiles(dungeon):
+    """Read room tiles back from the grid once corridors cut through them."""
+    width = dungeon.width
+    for room in dungeon.rooms:
+        for dy in range(room.height):
+            start = (room.y + dy) * width + room.x
+            room.tiles[dy] = list(dungeon.grid[start:start + room.width].decode())
+
+class Generator(ABC):
+    """Lays out one standard floor. generate() fills dungeon.rooms (the start
+    room first, the exit or boss room last, every room populated) and
+    dungeon.grid, and sets start_pos and exit_pos inside those two rooms;
+    the Dungeon spawns enemies afterwards. `version` changes whenever the
+    same seed would produce a different floor."""
+    name = ""
+    version = 1
+    @abstractmethod
+    def generate(self, dungeon):
+        """Lay out `dungeon`, which starts as solid rock with no rooms."""
+
+class LegacyGenerator(Generator):
+    """The original layout: rooms placed by rejection sampling, chained in
+    list order by L-shaped corridors baked under the room walls. Kept so
+    existing seeds, saves and replays still produce the same floors."""
+    name = "legacy"
+    def generate(self, dungeon):
+        rng = dungeon.rng
+        num_rooms = 6 + dungeon.floor_level
+        for i in range(num_rooms):
+            width = rng.randint(8, 15)
+            height = rng.randint(6, 12)
+            placed = False
+            for _ in range(50):
+                x = rng.randint(1, dungeon.width - width - 2)
+                y = rng.randint(1, dungeon.height - height - 2)
+                if dungeon.room_index.overlaps(x, y, width, height):
+                    continue
+                new_room = Room(x, y, width, height, rng=rng)
+                place_room(dungeon, new_room, room_type(dungeon, i, num_rooms))
+                placed = True
+                break
+            if not placed and len(dungeon.rooms) > 3:
+                break
+        dungeon.connect_rooms()
+        dungeon.bake_grid()
+        place_exits(dungeon)
+
+class Partition:
+    __slots__ = ("x", "y", "width", "height", "children", "room")
+    def __init__(self, x, y, width, height):
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.children: Optional[Tuple["Partition", "Partition"]] = None
+        self.room: Optional[Room] = None
+    def centre(self) -> Tuple[int, int]:
+        return self.x + self.width // 2, self.y + self.height // 2
+    def leaves(self) -> List["Partition"]:
+        if self.children is None:
+            return [self]
+        return self.children[0].leaves() + self.children[1].leaves()
+
+def room_distance(room: Room, x: int, y: int) -> int:
+    return abs(room.x + room.width // 2 - x) + abs(room.y + room.height // 2 - y)
+
+class BSPGenerator(Generator):
+    """Binary space partitioning: the largest region is split until there
+    is one per room, and each leaf gets a room that fits inside it, so no
+    placement is ever rejected. Sibling subtrees are joined by a corridor
+    between their closest rooms, carved after the rooms so every room has
+    a way in. Rooms run left to right, top to bottom in tree order, which
+    puts the start and the exit on opposite sides of the floor."""
+    name = "bsp"
+    def partition(self, dungeon) -> Partition:
+        rng = dungeon.rng
+        root = Partition(1, 1, dungeon.width - 2, dungeon.height - 2)
+        heap = [(-root.width * root.height, 0, root)]
+        leaves, order = 1, 1
+        target = room_count(dungeon)
+        while heap and leaves < target:
+            _, _, node = heapq.heappop(heap)
+            can_split_x = node.width >= 2 * MIN_LEAF_WIDTH
+            can_split_y = node.height >= 2 * MIN_LEAF_HEIGHT
+            if not (can_split_x or can_split_y):
+                continue
+            if can_split_x and can_split_y:
+                vertical = node.width * MIN_LEAF_HEIGHT >= node.height * MIN_LEAF_WIDTH
+            else:
+                vertical = can_split_x
+            if vertical:
+                cut = rng.randint(MIN_LEAF_WIDTH, node.width - MIN_LEAF_WIDTH)
+                children = (Partition(node.x, node.y, cut, node.height),
+                            Partition(node.x + cut, node.y, node.width - cut, node.height))
+            else:
+                cut = rng.randint(MIN_LEAF_HEIGHT, node.height - MIN_LEAF_HEIGHT)
+                children = (Partition(node.x, node.y, node.width, cut),
+                            Partition(node.x, node.y + cut, node.width, node.height - cut))
+            node.children = children
+            leaves += 1
+            for child in children:
+                heapq.heappush(heap, (-child.width * child.height, order, child))
+                order += 1
+        return root
+    def build_rooms(self, dungeon, leaves: Sequence[Partition]):
+        rng = dungeon.rng
+        for index, leaf in enumerate(leaves):
+            width = rng.randint(8, min(15, leaf.width - 2))
+            height = rng.randint(6, min(12, leaf.height - 2))
+            x = rng.randint(leaf.x + 1, leaf.x + leaf.width - 1 - width)
+            y = rng.randint(leaf.y + 1, leaf.y + leaf.height - 1 - height)
+            leaf.room = Room(x, y, width, height, rng=rng)
+            place_room(dungeon, leaf.room, room_type(dungeon, index, len(leaves)))
+    def paint_rooms(self, dungeon, walls=True):
+        grid, width = dungeon.grid, dungeon.width
+        for room in dungeon.rooms:
+            if walls:
+                for dy, row in enumerate(room.tiles):
+                    start = (room.y + dy) * width + room.x
+                    grid[start:start + room.width] = "".join(row).encode()
+            else:
+                interior = b"." * (room.width - 2)
+                for y in range(room.y + 1, room.y + room.height - 1):
+                    start = y * width + room.x + 1
+                    grid[start:start + room.width - 2] = interior
+    def connect(self, dungeon, node: Partition) -> List[Partition]:
+        """Join the two halves of every split, bottom up: the room of the
+        first half nearest the second half's centre to the room of the
+        second half nearest that room. Returns the leaves under `node`."""
+        if node.children is None:
+            return [node]
+        first = self.connect(dungeon, node.children[0])
+        second = self.connect(dungeon, node.children[1])
+        target_x, target_y = node.children[1].centre()
+        room1 = min((leaf.room for leaf in first), key=lambda room: room_distance(room, target_x, target_y))
+        target_x, target_y = room1.x + room1.width // 2, room1.y + room1.height // 2
+        room2 = min((leaf.room for leaf in second), key=lambda room: room_distance(room, target_x, target_y))
+        self.carve_corridor(dungeon, room1, room2)
+        return first + second
+    def carve_corridor(self, dungeon, room1: Room, room2: Room):
+        x1, y1 = room1.x + room1.width // 2, room1.y + room1.height // 2
+        x2, y2 = room2.x + room2.width // 2, room2.y + room2.height // 2
+        grid, width = dungeon.grid, dungeon.width
+        corner_x, corner_y = (x2, y1) if dungeon.rng.random() < 0.5 else (x1, y2)
+        for (ax, ay), (bx, by) in (((x1, y1), (corner_x, corner_y)), ((corner_x, corner_y), (x2, y2))):
+            if ay == by:
+                start = ay * width + min(ax, bx)
+                grid[start:start + abs(ax - bx) + 1] = b"." * (abs(ax - bx) + 1)
+            else:
+                for y in range(min(ay, by), max(ay, by) + 1):
+                    grid[y * width + ax] = FLOOR
+    def generate(self, dungeon):
+        root = self.partition(dungeon)
+        self.build_rooms(dungeon, root.leaves())
+        dungeon.grid = bytearray(b"#" * (dungeon.width * dungeon.height))
+        self.paint_rooms(dungeon)
+        self.connect(dungeon, root)
+        sync_room_tiles(dungeon)
+        dungeon.terrain_version += 1
+        place_exits(dungeon)
+
+class CaveGenerator(BSPGenerator):
+    """Cellular-automaton caves: random rock smoothed by the 4-5 rule over a
+    bytearray. Rooms come from the BSP layout as open chambers without
+    walls, joined by the same tunnels, and every pocket the start cannot
+    reach is filled in."""
+    name = "caves"
+    def cave(self, dungeon) -> bytearray:
+        """The rock map, 1 = rock, framed by a border of rock."""
+        width, height = dungeon.width, dungeon.height
+        cells = bytearray(dungeon.rng.randbytes(width * height).translate(
+            bytes(1 if value < CAVE_FILL else 0 for value in range(256))))
+        for _ in range(CAVE_STEPS):
+            self.frame(cells, width, height)
+            cells = self.smooth(cells, width)
+        self.frame(cells, width, height)
+        return cells
+    @staticmethod
+    def frame(cells: bytearray, width: int, height: int):
+        cells[:width] = b"\x01" * width
+        cells[-width:] = b"\x01" * width
+        cells[::width] = b"\x01" * height
+        cells[width - 1::width] = b"\x01" * height
+    @staticmethod
+    def smooth(cells: bytearray, width: int) -> bytearray:
+        """One automaton step. The nine-cell rock counts are summed for the
+        whole map at once as one big integer holding a byte per cell; a
+        count never exceeds 9, so no byte carries into the next. The frame
+        absorbs the wrap-around between rows and is reset by the caller."""
+        size = len(cells)
+        grid = int.from_bytes(cells, "big")
+        rows = grid + (grid << 8) + (grid >> 8)
+        counts = rows + (rows << (8 * width)) + (rows >> (8 * width))
+        counts &= (1 << (8 * size)) - 1
+        return bytearray(counts.to_bytes(size, "big").translate(CAVE_RULE))
+    def fill_unreachable(self, dungeon):
+        grid, width = dungeon.grid, dungeon.width
+        start_x, start_y = dungeon.start_pos
+        reached = bytearray(len(grid))
+        start = start_y * width + start_x
+        reached[start] = 1
+        queue = deque([start])
+        while queue:
+            index = queue.popleft()
+            for neighbour in (index - width, index + width, index - 1, index + 1):
+                if not reached[neighbour] and grid[neighbour] == FLOOR:
+                    reached[neighbour] = 1
+                    queue.append(neighbour)
+        open_cells = grid.translate(bytes(1 if value == FLOOR else 0 for value in range(256)))
+        if open_cells != reached:
+            for index in range(len(grid)):
+                if grid[index] == FLOOR and not reached[index]:
+                    grid[index] = ROCK
+    def generate(self, dungeon):
+        root = self.partition(dungeon)
+        self.build_rooms(dungeon, root.leaves())
+        dungeon.grid = bytearray(self.cave(dungeon).translate(CAVE_TILES))
+        self.paint_rooms(dungeon, walls=False)
+        self.connect(dungeon, root)
+        place_exits(dungeon)
+        self.fill_unreachable(dungeon)
+        sync_room_tiles(dungeon)
+        dungeon.terrain_version += 1
+
+GENERATORS: Dict[str, type] = {
+    generator.name: generator for generator in (LegacyGenerator, BSPGenerator, CaveGenerator)
+}
+
+def create_generator(name: Optional[str] = None) -> Generator:
+    name = name or DEFAULT_GENERATOR
+    if name not in GENERATORS:
+        raise ValueError(f"unknown generator {name!r} (choose from {', '.join(GENERATORS)})")
+    return GENERATORS[name]()
+
+def parse_generators(text: str) -> Tuple[str, ...]:
+    """'bsp' or 'legacy,bsp,caves' (one per floor, the last one repeating);
+    for argparse `type=`."""
+    names = tuple(part.strip() for part in text.split(",") if part.strip())
+    if not names:
+        raise ValueError("expected at least one generator name")
+    for name in names:
+        create_generator(name)
+    return names
+
+def generator_for(generators: Optional[Sequence[str]], floor_level: int) -> str:
+    if not generators:
+        return DEFAULT_GENERATOR
+    return generators[min(floor_level, len(generators)) - 1]
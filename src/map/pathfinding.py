@@ -0,0 +1,152 @@
+import heapq
+from array import array
+from collections import deque
+from typing import List, Optional, Tuple
+
+NEIGHBOURS = ((0, -1), (0, 1), (-1, 0), (1, 0))
+UNREACHABLE = 0xFFFF
+MAX_CACHED_PATHS = 8192
+
+class Pathfinder:
+    """A* paths and a shared Dijkstra distance map over a dungeon's terrain.
+
+    Searches only look at terrain (Dungeon.grid), so results stay valid
+    while enemies shuffle around; callers still check is_walkable before
+    stepping. Every cache is dropped when Dungeon.terrain_version changes.
+    `max_expansions` (0 = unlimited) and `max_distance` bound the searches
+    on maps too large to flood."""
+    max_expansions = 0
+    max_distance = UNREACHABLE - 1
+    def __init__(self, dungeon):
+        self.dungeon = dungeon
+        self.paths = {}
+        self.version = dungeon.terrain_version
+        self.distances = None
+        self.distance_origin = None
+    def _sync(self):
+        if self.version != self.dungeon.terrain_version:
+            self.version = self.dungeon.terrain_version
+            self.paths = {}
+            self.distances = None
+            self.distance_origin = None
+    def _lookup(self, start, goal):
+        self._sync()
+        key = (start, goal)
+        if key not in self.paths:
+            if len(self.paths) > MAX_CACHED_PATHS:
+                self.paths = {}
+            path = self._search(start, goal)
+            if path is None:
+                self.paths[key] = None
+            else:
+                self.paths[key] = (path, 0)
+                for offset, cell in enumerate(path[:-1], 1):
+                    self.paths[(cell, goal)] = (path, offset)
+        return self.paths[key]
+    def find_path(self, start, goal) -> Optional[List[Tuple[int, int]]]:
+        entry = self._lookup(start, goal)
+        if entry is None:
+            return None
+        path, offset = entry
+        return list(path[offset:])
+    def next_step(self, start, goal) -> Optional[Tuple[int, int]]:
+        entry = self._lookup(start, goal)
+        if entry is None:
+            return None
+        path, offset = entry
+        if offset >= len(path):
+            return None
+        return path[offset]
+    def _search(self, start, goal):
+        if start == goal:
+            return []
+        gx, gy = goal
+        if not self.dungeon.is_passable(gx, gy):
+            return None
+        frontier = [(abs(start[0] - gx) + abs(start[1] - gy), 0, start)]
+        came_from = {start: None}
+        cost = {start: 0}
+        expansions = 0
+        while frontier:
+            _, steps, current = heapq.heappop(frontier)
+            if current == goal:
+                break
+            expansions += 1
+            if expansions == self.max_expansions:
+                return None
+            if steps > cost[current]:
+                continue
+            cx, cy = current
+            for dx, dy in NEIGHBOURS:
+                nx, ny = cx + dx, cy + dy
+                if not self.dungeon.is_passable(nx, ny):
+                    continue
+                next_cost = steps + 1
+                cell = (nx, ny)
+                if next_cost < cost.get(cell, UNREACHABLE):
+                    cost[cell] = next_cost
+                    came_from[cell] = current
+                    heapq.heappush(frontier, (next_cost + abs(nx - gx) + abs(ny - gy), next_cost, cell))
+        if goal not in came_from:
+            return None
+        path = []
+        cell = goal
+        while cell != start:
+            path.append(cell)
+            cell = came_from[cell]
+        path.reverse()
+        return path
+    def distance_map(self, target_x, target_y) -> array:
+        """Breadth-first distances from the target to every reachable cell,
+        shared by every enemy chasing the same target this turn."""
+        self._sync()
+        if self.distance_origin == (target_x, target_y) and self.distances is not None:
+            return self.distances
+        dungeon = self.dungeon
+        width = dungeon.width
+        distances = self.new_distance_map()
+        self.distances = distances
+        self.distance_origin = (target_x, target_y)
+        if not self.dungeon.is_passable(target_x, target_y):
+            return distances
+        distances[target_y * width + target_x] = 0
+        queue = deque([(target_x, target_y)])
+        while queue:
+            x, y = queue.popleft()
+            next_distance = distances[y * width + x] + 1
+            if next_distance > self.max_distance:
+                break
+            for dx, dy in NEIGHBOURS:
+                nx, ny = x + dx, y + dy
+                if not self.dungeon.is_passable(nx, ny):
+                    continue
+                index = ny * width + nx
+                if distances[index] == UNREACHABLE:
+                    distances[index] = next_distance
+                    queue.append((nx, ny))
+        return distances
+    def new_distance_map(self):
+        return array("H", [UNREACHABLE]) * (self.dungeon.width * self.dungeon.height)
+    def reaches(self, x, y, target_x, target_y) -> bool:
+        distances = self.distance_map(target_x, target_y)
+        return distances[y * self.dungeon.width + x] != UNREACHABLE
+    def downhill_step(self, x, y, target_x, target_y) -> Optional[Tuple[int, int]]:
+        """Best unoccupied neighbour that gets closer to the target, or None
+        when the target is unreachable or every closer cell is taken."""
+        distances = self.distance_map(target_x, target_y)
+        dungeon = self.dungeon
+        width = dungeon.width
+        current = distances[y * width + x]
+        if current == UNREACHABLE:
+            return None
+        best = None
+        best_distance = current
+        for dx, dy in NEIGHBOURS:
+            nx, ny = x + dx, y + dy
+            if not self.dungeon.is_passable(nx, ny):
+                continue
+            distance = distances[ny * width + nx]
+            if distance < best_distance and dungeon.is_walkable(nx, ny):
+                best = (nx, ny)
+                best_distance = distance
+        return best
@@ -1,8 +1,10 @@
 import random
 from typing import List, Tuple, Optional
 from entity.player import Item
+from entity.store import EntityStore
 
 class Trap:
+    __slots__ = ("x", "y", "trap_type", "triggered", "visible", "symbol")
     def __init__(self, x, y, trap_type):
         self.x = x
         self.y = y
@@ -10,33 +12,35 @@ class Trap:
         self.triggered = False
         self.visible = False
         self.symbol = "."
-    def trigger(self, player, log):
+    def trigger(self, player, log, rng=random):
         if self.triggered:
             return
         self.triggered = True
         self.visible = True
         if self.trap_type == "spike":
-            damage = random.randint(15, 25)
+            damage = rng.randint(15, 25)
             player.take_damage(damage)
-            log.add_message(f"Spikes shoot from the floor! -{damage} HP", "error")
+            log.emit("trap", f"Spikes shoot from the floor! -{damage} HP", "error", amount=damage, detail="spike")
             self.symbol = "^"
         elif self.trap_type == "poison":
-            damage = random.randint(5, 10)
+            damage = rng.randint(5, 10)
             player.take_damage(damage)
             player.lose_sanity(5)
-            log.add_message(f"Poison gas fills the air! -{damage} HP", "error")
+            log.emit("trap", f"Poison gas fills the air! -{damage} HP", "error", amount=damage, detail="poison")
             self.symbol = "~"
         elif self.trap_type == "collapse":
-            damage = random.randint(20, 30)
+            damage = rng.randint(20, 30)
             player.take_damage(damage)
             player.lose_sanity(10)
-            log.add_message(f"The floor collapses beneath you! -{damage} HP", "error")
+            log.emit("trap", f"The floor collapses beneath you! -{damage} HP", "error", amount=damage,
+                     detail="collapse")
             self.symbol = "X"
         elif self.trap_type == "echo":
             player.lose_sanity(20)
-            log.add_message("You see yourself standing there... watching you.", "error")
+            log.emit("trap", "You see yourself standing there... watching you.", "error", detail="echo")
             self.symbol = "*"
 class Door:
+    __slots__ = ("x", "y", "key_required", "locked", "symbol")
     def __init__(self, x, y, key_required=None):
         self.x = x
         self.y = y
@@ -49,63 +53,66 @@ class Door:
         if player.inventory.has_key(self.key_required):
             self.locked = False
             self.symbol = "'"
-            log.add_message(f"You unlock the door with the {self.key_required}.", "success")
+            log.emit("unlock", f"You unlock the door with the {self.key_required}.", "success",
+                     detail=self.key_required)
             return True
         else:
-            log.add_message(f"This door requires a {self.key_required}.", "warning")
+            log.emit("locked", f"This door requires a {self.key_required}.", "warning",
+                     detail=self.key_required)
             return False
 class RoomFeature:
+    __slots__ = ("x", "y", "feature_type", "data", "used")
     def __init__(self, x, y, feature_type, data=None):
         self.x = x
         self.y = y
         self.feature_type = feature_type  
         self.data = data or {}
         self.used = False
-    def interact(self, player, log):
+    def interact(self, player, log, rng=random):
         if self.used:
             return
         if self.feature_type == "chest":
             self.used = True
-            loot_type = random.choice(["weapon", "armor", "potion", "key"])
+            loot_type = rng.choice(["weapon", "armor", "potion", "key"])
             if loot_type == "weapon":
-                weapon = Item(f"Blade +{random.randint(5, 15)}", "weapon", random.randint(5, 15))
+                weapon = Item(f"Blade +{rng.randint(5, 15)}", "weapon", rng.randint(5, 15))
                 player.inventory.add_item(weapon)
-                log.add_message(f"Found {weapon.name}!", "success")
+                log.emit("loot", f"Found {weapon.name}!", "success", amount=weapon.modifier, detail=weapon.name)
             elif loot_type == "armor":
-                armor = Item(f"Armor +{random.randint(3, 10)}", "armor", random.randint(3, 10))
+                armor = Item(f"Armor +{rng.randint(3, 10)}", "armor", rng.randint(3, 10))
                 player.inventory.add_item(armor)
-                log.add_message(f"Found {armor.name}!", "success")
+                log.emit("loot", f"Found {armor.name}!", "success", amount=armor.modifier, detail=armor.name)
             elif loot_type == "potion":
-                potion = Item(f"Health Potion", "potion", random.randint(20, 40))
+                potion = Item(f"Health Potion", "potion", rng.randint(20, 40))
                 player.inventory.add_item(potion)
-                log.add_message(f"Found a Health Potion!", "success")
+                log.emit("loot", f"Found a Health Potion!", "success", amount=potion.modifier, detail=potion.name)
             elif loot_type == "key":
-                key_name = random.choice(["Iron Key", "Silver Key", "Gold Key"])
+                key_name = rng.choice(["Iron Key", "Silver Key", "Gold Key"])
                 key = Item(key_name, "key", 0)
                 player.inventory.add_item(key)
-                log.add_message(f"Found a {key_name}!", "success")
+                log.emit("loot", f"Found a {key_name}!", "success", detail=key_name)
         elif self.feature_type == "altar":
             self.used = True
-            choice = random.choice(["heal", "sanity", "curse"])
+            choice = rng.choice(["heal", "sanity", "curse"])
             if choice == "heal":
                 player.heal(30)
-                log.add_message("The altar glows warmly. You feel restored.", "success")
+                log.emit("altar", "The altar glows warmly. You feel restored.", "success", amount=30, detail=choice)
             elif choice == "sanity":
                 player.restore_sanity(20)
-                log.add_message("Your mind clears at the altar.", "success")
+                log.emit("altar", "Your mind clears at the altar.", "success", amount=20, detail=choice)
             else:
                 player.lose_sanity(15)
-                log.add_message("The altar whispers dark secrets...", "error")
+                log.emit("altar", "The altar whispers dark secrets...", "error", amount=15, detail=choice)
         elif self.feature_type == "fountain":
             self.used = True
-            if random.random() < 0.5:
+            if rng.random() < 0.5:
                 player.heal(20)
-                log.add_message("The water is refreshing.", "success")
+                log.emit("fountain", "The water is refreshing.", "success", amount=20, detail="heal")
             else:
                 player.take_damage(10)
-                log.add_message("The water burns like acid!", "error")
+                log.emit("fountain", "The water burns like acid!", "error", amount=10, detail="burn")
 class Room:
-    def __init__(self, x, y, width, height, room_type="normal"):
+    def __init__(self, x, y, width, height, room_type="normal", rng=None):
         self.x = x
         self.y = y
         self.width = width
@@ -115,26 +122,25 @@ class Room:
         self.traps: List[Trap] = []
         self.doors: List[Door] = []
         self.features: List[RoomFeature] = []
-        self.enemies: List = []
+        self.enemies = EntityStore()
         self.visited = False
         self.fully_explored = False
         self.is_echo_zone = False
+        self.dungeon = None
+        self.rng = rng or random
         self.generate_tiles()
     def generate_tiles(self):
-        self.tiles = []
-        for dy in range(self.height):
-            row = []
-            for dx in range(self.width):
-                if dx == 0 or dx == self.width - 1 or dy == 0 or dy == self.height - 1:
-                    row.append("#")
-                else:
-                    row.append(".")
-            self.tiles.append(row)
+        wall = "#" * self.width
+        inside = "#" + "." * (self.width - 2) + "#" if self.width > 1 else wall
+        last = self.height - 1
+        self.tiles = [list(wall if dy == 0 or dy == last else inside) for dy in range(self.height)]
     def add_trap(self, local_x, local_y, trap_type):
         world_x = self.x + local_x
         world_y = self.y + local_y
         trap = Trap(world_x, world_y, trap_type)
         self.traps.append(trap)
+        if self.dungeon:
+            self.dungeon.register_trap(trap)
     def add_door(self, local_x, local_y, key_required=None):
         world_x = self.x + local_x
         world_y = self.y + local_y
@@ -142,11 +148,15 @@ class Room:
         self.doors.append(door)
         if 0 <= local_y < len(self.tiles) and 0 <= local_x < len(self.tiles[0]):
             self.tiles[local_y][local_x] = door.symbol
+            if self.dungeon:
+                self.dungeon.set_tile(world_x, world_y, door.symbol)
     def add_feature(self, local_x, local_y, feature_type):
         world_x = self.x + local_x
         world_y = self.y + local_y
         feature = RoomFeature(world_x, world_y, feature_type)
         self.features.append(feature)
+        if self.dungeon:
+            self.dungeon.register_feature(feature)
     def get_tile(self, local_x, local_y):
         if 0 <= local_y < len(self.tiles) and 0 <= local_x < len(self.tiles[0]):
             return self.tiles[local_y][local_x]
@@ -161,16 +171,16 @@ class Room:
                 if self.is_walkable(x, y):
                     walkable.append((self.x + x, self.y + y))
         if walkable:
-            return random.choice(walkable)
+            return self.rng.choice(walkable)
         return (self.x + self.width // 2, self.y + self.height // 2)
     def populate(self, floor_level):
         if self.room_type == "trap":
-            num_traps = random.randint(2, 5)
+            num_traps = self.rng.randint(2, 5)
             trap_types = ["spike", "poison", "collapse"]
             for _ in range(num_traps):
-                x = random.randint(2, self.width - 3)
-                y = random.randint(2, self.height - 3)
-                trap_type = random.choice(trap_types)
+                x = self.rng.randint(2, self.width - 3)
+                y = self.rng.randint(2, self.height - 3)
+                trap_type = self.rng.choice(trap_types)
                 self.add_trap(x, y, trap_type)
         elif self.room_type == "treasure":
             x = self.width // 2
@@ -178,21 +188,21 @@ class Room:
             self.add_feature(x, y, "chest")
         elif self.room_type == "echo":
             self.is_echo_zone = True
-            num_traps = random.randint(1, 3)
+            num_traps = self.rng.randint(1, 3)
             for _ in range(num_traps):
-                x = random.randint(2, self.width - 3)
-                y = random.randint(2, self.height - 3)
+                x = self.rng.randint(2, self.width - 3)
+                y = self.rng.randint(2, self.height - 3)
                 self.add_trap(x, y, "echo")
         elif self.room_type == "normal":
-            if random.random() < 0.3:
-                feature_type = random.choice(["altar", "fountain"])
-                x = random.randint(2, self.width - 3)
-                y = random.randint(2, self.height - 3)
+            if self.rng.random() < 0.3:
+                feature_type = self.rng.choice(["altar", "fountain"])
+                x = self.rng.randint(2, self.width - 3)
+                y = self.rng.randint(2, self.height - 3)
                 self.add_feature(x, y, feature_type)
-            if random.random() < 0.4:
-                x = random.randint(2, self.width - 3)
-                y = random.randint(2, self.height - 3)
-                trap_type = random.choice(["spike", "poison"])
+            if self.rng.random() < 0.4:
+                x = self.rng.randint(2, self.width - 3)
+                y = self.rng.randint(2, self.height - 3)
+                trap_type = self.rng.choice(["spike", "poison"])
                 self.add_trap(x, y, trap_type)
     def __repr__(self):
         return f"Room({self.room_type}, {self.width}x{self.height})"
\ No newline at end of file
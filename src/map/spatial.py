@@ -0,0 +1,66 @@
+from typing import Dict, Iterator, List, Optional, Tuple
+from map.room import Room
+
+BUCKET_SIZE = 16
+
+class RoomIndex:
+    """Rooms of one map region bucketed on a coarse grid, plus the number of
+    the room covering each cell (0 = none, so at most 255 rooms).
+
+    Placement only tests the rooms sharing a bucket with the candidate, and
+    a point lookup is a single array read. Coordinates are absolute; the
+    region starts at (origin_x, origin_y)."""
+    def __init__(self, width, height, origin_x=0, origin_y=0, bucket_size=BUCKET_SIZE):
+        self.width = width
+        self.height = height
+        self.origin_x = origin_x
+        self.origin_y = origin_y
+        self.bucket_size = bucket_size
+        self.rooms: List[Room] = []
+        self.cells = bytearray(width * height)
+        self.buckets: Dict[Tuple[int, int], List[Room]] = {}
+    def bucket_keys(self, x, y, width, height) -> Iterator[Tuple[int, int]]:
+        size = self.bucket_size
+        left, top = x - self.origin_x, y - self.origin_y
+        for by in range(top // size, (top + height - 1) // size + 1):
+            for bx in range(left // size, (left + width - 1) // size + 1):
+                yield bx, by
+    def add(self, room: Room):
+        if len(self.rooms) == 255:
+            raise ValueError("RoomIndex holds at most 255 rooms")
+        self.rooms.append(room)
+        number = len(self.rooms)
+        for key in self.bucket_keys(room.x, room.y, room.width, room.height):
+            self.buckets.setdefault(key, []).append(room)
+        left = max(room.x - self.origin_x, 0)
+        right = min(room.x - self.origin_x + room.width, self.width)
+        if left >= right:
+            return
+        fill = bytes((number,)) * (right - left)
+        for y in range(max(room.y - self.origin_y, 0), min(room.y - self.origin_y + room.height, self.height)):
+            self.cells[y * self.width + left:y * self.width + right] = fill
+    def overlaps(self, x, y, width, height, margin: int = 1) -> bool:
+        """Whether the rectangle comes within `margin` cells of an indexed
+        room. Takes bare coordinates so candidates can be rejected before a
+        Room is built for them."""
+        size = self.bucket_size
+        left, top = x - self.origin_x, y - self.origin_y
+        right, bottom = left + width + margin, top + height + margin
+        buckets = self.buckets
+        for by in range((top - margin) // size, (bottom - 1) // size + 1):
+            for bx in range((left - margin) // size, (right - 1) // size + 1):
+                for other in buckets.get((bx, by), ()):
+                    if (x < other.x + other.width + margin and
+                        x + width + margin > other.x and
+                        y < other.y + other.height + margin and
+                        y + height + margin > other.y):
+                        return True
+        return False
+    def room_at(self, x, y) -> Optional[Room]:
+        x -= self.origin_x
+        y -= self.origin_y
+        if 0 <= x < self.width and 0 <= y < self.height:
+            number = self.cells[y * self.width + x]
+            if number:
+                return self.rooms[number - 1]
+        return None
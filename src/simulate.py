@@ -0,0 +1,98 @@
+# simulate.py
+import argparse
+import json
+import time
+from data.batch import run_batch
+from data.bots import POLICIES
+from data.replay import Replay, ReplayEngine
+from debug.profiler import PROFILER
+from map.chunked import parse_world_size
+from map.generators import parse_generators
+
+def play_replay(filename: str):
+    replay = Replay.load(filename)
+    engine = ReplayEngine(replay)
+    started = time.perf_counter()
+    result = engine.run()
+    elapsed = time.perf_counter() - started
+    game_state = engine.game_state
+    print(f"Replayed {engine.position}/{len(replay)} actions of seed {replay.seed} in {elapsed:.3f}s "
+          f"({engine.position / max(elapsed, 1e-9):.0f} actions/s)")
+    print(f"Result: {result} on floor {game_state.current_floor} after {game_state.turn_count} turns "
+          f"(sanity {game_state.player.sanity}, hp {game_state.player.hp})")
+    if game_state.death_cause:
+        print("Death cause:", game_state.death_cause)
+
+def run_simulation(args):
+    started = time.perf_counter()
+    output = open(args.output, "w") if args.output else None
+    def write_records(shard):
+        for result in shard.results:
+            output.write(json.dumps(result.as_dict()) + "\n")
+    try:
+        stats = run_batch(args.seed, args.games, args.policy, args.max_actions,
+                          workers=args.workers, shard_size=args.shard_size,
+                          on_shard=write_records if output else None, world_size=args.world,
+                          generators=args.generator, floor_cache=args.floor_cache)
+    finally:
+        if output:
+            output.close()
+    elapsed = time.perf_counter() - started
+    print(f"{stats.games} games with '{args.policy}' in {elapsed:.2f}s "
+          f"({stats.games / elapsed * 60:.0f} games/min)")
+    print("Outcomes:", dict(stats.outcomes))
+    print("Survival by floor:")
+    for floor, share in stats.survival_curve().items():
+        print(f"  floor {floor}: {share:6.1%}")
+    print("Death causes:")
+    for cause, count in stats.death_causes.most_common():
+        print(f"  {count:6d}  {cause}")
+    print("Events:")
+    for kind, count in stats.event_counts.most_common():
+        amount = stats.event_amounts[kind]
+        print(f"  {count:6d}  {kind}" + (f" (total {amount})" if amount else ""))
+    trajectory = stats.sanity_trajectory()
+    if trajectory:
+        samples = ", ".join(f"t{turn + 1}={trajectory[turn]:.1f}"
+                            for turn in range(0, len(trajectory), max(1, len(trajectory) // 10)))
+        print("Mean sanity:", samples)
+    if args.stats:
+        with open(args.stats, "w") as f:
+            json.dump(stats.as_dict(), f)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play seeded games headlessly with a bot policy.")
+    parser.add_argument("--games", type=int, default=100, help="number of games to play")
+    parser.add_argument("--seed", type=int, default=1, help="seed of the first game")
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="random")
+    parser.add_argument("--max-actions", type=int, default=5000, help="actions before a game times out")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="worker processes (0 = one per core, 1 = run in this process)")
+    parser.add_argument("--shard-size", type=int, default=250, help="games per worker task")
+    parser.add_argument("--output", help="write one JSON record per game to this file")
+    parser.add_argument("--stats", help="write the aggregated statistics as JSON to this file")
+    parser.add_argument("--world", type=parse_world_size, metavar="WxH",
+                        help="play on a chunked large map of this size, e.g. 1000x1000")
+    parser.add_argument("--generator", type=parse_generators, metavar="NAME[,NAME...]",
+                        help="floor layout per floor, the last repeating: legacy (default), bsp or caves")
+    parser.add_argument("--floor-cache", metavar="DIR",
+                        help="keep generated floors in this directory and reuse them across runs and workers")
+    parser.add_argument("--replay", help="re-run a recorded .rpl file at full speed instead")
+    parser.add_argument("--profile", metavar="FILE",
+                        help="time turn phases in-process and write them here (.pstats/.prof for cProfile, else a trace JSON)")
+    args = parser.parse_args(argv)
+    if args.profile:
+        PROFILER.enable(args.profile)
+        args.workers = 1
+    try:
+        if args.replay:
+            play_replay(args.replay)
+        else:
+            run_simulation(args)
+    finally:
+        if args.profile:
+            PROFILER.dump(args.profile)
+            print(f"Profile written to {args.profile}")
+
+if __name__ == "__main__":
+    main()
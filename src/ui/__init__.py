@@ -4,8 +4,10 @@ UI module - Display and logging widgets.
 
 from ui.display import GameDisplay
 from ui.log import GameLog
+from ui.renderer import ViewportRenderer
 
 __all__ = [
     'GameDisplay',
     'GameLog',
+    'ViewportRenderer',
 ]
\ No newline at end of file
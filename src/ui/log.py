@@ -1,12 +1,19 @@
 from textual.widget import Widget
 from rich.text import Text
 from rich.panel import Panel
-from collections import deque
+from data.events import EventLog
 
 class GameLog(Widget):
-    def __init__(self, *args, **kwargs):
+    """The tail of an EventLog. Events only mark the panel stale and a single
+    repaint is queued behind the handler that emitted them, so a busy turn
+    redraws the log once. scroll_history() pages back through the buffer."""
+    def __init__(self, events=None, lines=10, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.messages = deque(maxlen=10)
+        self.events = events if events is not None else EventLog()
+        self.events.subscribe(self.receive)
+        self.lines = lines
+        self.scrollback = 0
+        self.stale = False
         self.color_map = {
             "info": "cyan",
             "success": "green",
@@ -14,17 +21,50 @@ class GameLog(Widget):
             "error": "red",
             "dim": "dim",
         }
+    @property
+    def turn(self):
+        return self.events.turn
+    @turn.setter
+    def turn(self, value):
+        self.events.turn = value
+    def receive(self, event):
+        if self.scrollback:
+            self.scrollback = min(self.scrollback + 1, self.max_scrollback())
+        self.mark_stale()
+    def mark_stale(self):
+        if not self.stale:
+            self.stale = True
+            self.call_later(self.flush)
+    def flush(self):
+        if self.stale:
+            self.stale = False
+            self.refresh()
+    def max_scrollback(self):
+        return max(0, len(self.events) - self.lines)
+    def scroll_history(self, delta: int):
+        """Move the view `delta` events back (negative: forward) in time."""
+        offset = max(0, min(self.scrollback + delta, self.max_scrollback()))
+        if offset != self.scrollback:
+            self.scrollback = offset
+            self.mark_stale()
     def render(self):
         log_text = Text()
-        for msg, msg_type in self.messages:
-            color = self.color_map.get(msg_type, "white")
-            log_text.append(f"• {msg}\n", style=color)
-        if not self.messages:
+        events = self.events.events
+        end = len(events) - self.scrollback
+        for index in range(max(0, end - self.lines), end):
+            event = events[index]
+            color = self.color_map.get(event.style, "white")
+            log_text.append(f"• {event.text}\n", style=color)
+        if not events:
             log_text.append("...\n", style="dim")
-        return Panel(log_text, border_style="yellow", title="Log")
+        title = f"Log (-{self.scrollback})" if self.scrollback else "Log"
+        return Panel(log_text, border_style="yellow", title=title)
+    def emit(self, kind: str, text: str = "", style: str = "info", actor: int = 0,
+             amount: int = 0, detail: str = ""):
+        return self.events.emit(kind, text, style, actor, amount, detail)
     def add_message(self, message: str, msg_type: str = "info"):
-        self.messages.append((message, msg_type))
-        self.refresh()
+        self.events.add_message(message, msg_type)
     def clear(self):
-        self.messages.clear()
-        self.refresh()
\ No newline at end of file
+        self.events.clear()
+        self.scrollback = 0
+        self.mark_stale()
\ No newline at end of file
@@ -0,0 +1,146 @@
+from typing import Dict, List, Optional, Tuple
+from rich.text import Text
+
+MAP_COLUMNS = 60
+MAP_ROWS = 20
+UNKNOWN = (" ", "")
+PASSAGE = ("·", "grey42")
+EXIT = (">", "bold green")
+PLAYER = ("@", "bold yellow")
+ROOM_STYLES = {
+    "start": "green",
+    "treasure": "yellow",
+    "echo": "magenta",
+    "exit": "bold green",
+    "boss": "bold red",
+}
+ROOM_GLYPH = "■"
+
+def map_scale(width, height) -> int:
+    """Cells per minimap block (square), so the whole floor fits."""
+    return max(1, -(-width // MAP_COLUMNS), -(-height // MAP_ROWS))
+
+class Minimap:
+    """Whole-floor overview at 1/scale size for the map view.
+
+    The block grid is allocated once per floor; after each action update()
+    patches in the blocks the field of view reached and the room the player
+    is in once Room.visited is set, so upkeep follows what changed. Rows
+    are cached like the viewport's and the finished Text is reused until a
+    block or the player's block changes, so opening the map costs the same
+    on any map size."""
+    def __init__(self):
+        self.dungeon = None
+        self.scale = 1
+        self.columns = 0
+        self.rows = 0
+        self.blocks: List[List[Tuple[str, str]]] = []
+        self.rooms = set()
+        self.exit_block = None
+        self.player_block = None
+        self.row_cache: Dict[int, Tuple[str, list]] = {}
+        self.text: Optional[Text] = None
+    def reset(self, dungeon):
+        self.dungeon = dungeon
+        self.scale = map_scale(dungeon.width, dungeon.height)
+        self.columns = -(-dungeon.width // self.scale)
+        self.rows = -(-dungeon.height // self.scale)
+        self.blocks = [[UNKNOWN] * self.columns for _ in range(self.rows)]
+        self.rooms = set()
+        self.exit_block = self.block_of(*dungeon.exit_pos) if dungeon.exit_pos else None
+        self.row_cache = {}
+        self.text = None
+        seen = dungeon.fov.seen
+        if isinstance(seen, bytearray):
+            width = dungeon.width
+            index = seen.find(1)
+            while index >= 0:
+                y, x = divmod(index, width)
+                self.mark(x, y, PASSAGE)
+                index = seen.find(1, index + 1)
+        for room in dungeon.rooms:
+            if room.visited:
+                self.add_room(room)
+    def block_of(self, x, y) -> Tuple[int, int]:
+        return x // self.scale, y // self.scale
+    def mark(self, x, y, glyph):
+        bx, by = x // self.scale, y // self.scale
+        row = self.blocks[by]
+        current = row[bx]
+        if current == glyph or current is EXIT or (current[0] == ROOM_GLYPH and glyph is PASSAGE):
+            return
+        if (bx, by) == self.exit_block:
+            glyph = EXIT
+        row[bx] = glyph
+        self.row_cache.pop(by, None)
+        self.text = None
+    def add_room(self, room):
+        self.rooms.add(id(room))
+        glyph = (ROOM_GLYPH, ROOM_STYLES.get(room.room_type, "magenta" if room.is_echo_zone else "cyan"))
+        scale = self.scale
+        for y in range(room.y, room.y + room.height, scale):
+            for x in range(room.x, room.x + room.width, scale):
+                self.mark(x, y, glyph)
+        self.mark(room.x + room.width - 1, room.y + room.height - 1, glyph)
+    def update(self, game_state):
+        dungeon = game_state.dungeon
+        if dungeon is not self.dungeon:
+            self.reset(dungeon)
+        width = dungeon.width
+        for index in dungeon.fov.visible_cells:
+            y, x = divmod(index, width)
+            if self.blocks[y // self.scale][x // self.scale] is UNKNOWN:
+                self.mark(x, y, PASSAGE)
+        player = game_state.player
+        room = dungeon.get_room_at(player.x, player.y)
+        if room is not None and room.visited and id(room) not in self.rooms:
+            self.add_room(room)
+    def build_row(self, by):
+        cached = self.row_cache.get(by)
+        if cached:
+            return cached
+        glyphs = []
+        runs = []
+        run_style = None
+        run_start = 0
+        for offset, (glyph, style) in enumerate(self.blocks[by]):
+            glyphs.append(glyph)
+            if style != run_style:
+                if run_style:
+                    runs.append((run_start, offset, run_style))
+                run_style = style
+                run_start = offset
+        if run_style:
+            runs.append((run_start, len(glyphs), run_style))
+        cached = self.row_cache[by] = ("".join(glyphs), runs)
+        return cached
+    def render(self, game_state) -> Text:
+        self.update(game_state)
+        player = game_state.player
+        player_block = self.block_of(player.x, player.y)
+        if self.text is not None and player_block == self.player_block:
+            return self.text
+        text = Text()
+        text.append(f"═══ Floor {game_state.current_floor} map (1:{self.scale}) ═══\n\n", style="bold cyan")
+        for by in range(self.rows):
+            plain, runs = self.build_row(by)
+            base = len(text)
+            if by == player_block[1]:
+                plain = plain[:player_block[0]] + PLAYER[0] + plain[player_block[0] + 1:]
+            text.append(plain)
+            for run_start, run_end, style in runs:
+                text.stylize(style, base + run_start, base + run_end)
+            if by == player_block[1]:
+                text.stylize(PLAYER[1], base + player_block[0], base + player_block[0] + 1)
+            text.append("\n")
+        text.append("\n")
+        text.append(f"{ROOM_GLYPH} ", style="cyan")
+        text.append("Visited room  ")
+        text.append("· ", style=PASSAGE[1])
+        text.append("Explored  ")
+        text.append("> ", style=EXIT[1])
+        text.append("Exit  ")
+        text.append("[M] Close\n", style="dim")
+        self.text = text
+        self.player_block = player_block
+        return text
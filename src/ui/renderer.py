@@ -0,0 +1,155 @@
+from typing import Dict, List, Tuple
+from rich.text import Text
+
+HIDDEN = (" ", "dim")
+FEATURE_GLYPHS = {
+    "chest": ("□", "bold yellow"),
+    "altar": ("†", "bold cyan"),
+    "fountain": ("∩", "bold blue"),
+}
+TILE_GLYPHS = {
+    "#": ("█", "dim white"),
+    "+": ("+", "bold yellow"),
+    "'": ("'", "dim cyan"),
+}
+REMEMBERED_GLYPHS = {
+    "#": ("█", "grey30"),
+    ".": ("·", "grey23"),
+    "+": ("+", "grey42"),
+    "'": ("'", "grey42"),
+}
+
+def cell_glyph(dungeon, player, x, y) -> Tuple[str, str]:
+    if x == player.x and y == player.y:
+        return "@", "bold yellow"
+    enemy = dungeon.get_enemy_at(x, y)
+    if enemy and enemy.alive:
+        if hasattr(enemy, 'visible') and not enemy.visible:
+            return dungeon.get_tile(x, y), "dim"
+        return enemy.symbol, f"bold {enemy.color}"
+    feature = dungeon.get_feature_at(x, y)
+    if feature and not feature.used and feature.feature_type in FEATURE_GLYPHS:
+        return FEATURE_GLYPHS[feature.feature_type]
+    if (x, y) == dungeon.exit_pos:
+        return ">", "bold green blink"
+    trap = dungeon.get_trap_at(x, y)
+    if trap and trap.visible:
+        return trap.symbol, "bold red"
+    tile = dungeon.get_tile(x, y)
+    if tile == ".":
+        room = dungeon.get_room_at(x, y)
+        if room and room.is_echo_zone:
+            return "·", "magenta"
+        return "·", "dim"
+    return TILE_GLYPHS.get(tile, (tile, "dim"))
+
+def remembered_glyph(dungeon, x, y) -> Tuple[str, str]:
+    if (x, y) == dungeon.exit_pos:
+        return ">", "green"
+    tile = dungeon.get_tile(x, y)
+    return REMEMBERED_GLYPHS.get(tile, (tile, "grey23"))
+
+class ViewportRenderer:
+    """Keeps a styled glyph per dungeon cell and only recomputes the cells
+    that changed since the previous frame (dungeon.dirty, the player and
+    cells entering or leaving the field of view), starting from the
+    remembered cells of fov.seen. Rows are cached as a plain string plus
+    merged style runs and rebuilt only when a cell in them changes or the
+    viewport scrolls horizontally. A row's cells are only allocated once
+    something in it has been seen, so large maps cost what was explored."""
+    def __init__(self, view_width=60, view_height=20):
+        self.view_width = view_width
+        self.view_height = view_height
+        self.dungeon = None
+        self.cells: Dict[int, List[Tuple[str, str]]] = {}
+        self.visible = set()
+        self.player_pos = None
+        self.rows: Dict[int, Tuple[int, int, str, list]] = {}
+    def reset(self, dungeon):
+        self.dungeon = dungeon
+        self.cells = {}
+        self.visible = set()
+        self.player_pos = None
+        self.rows = {}
+        dungeon.dirty.clear()
+        dungeon.track_dirty = True
+        seen = dungeon.fov.seen
+        if isinstance(seen, bytearray):
+            width = dungeon.width
+            index = seen.find(1)
+            while index >= 0:
+                y, x = divmod(index, width)
+                row = self.cells.get(y)
+                if row is None:
+                    row = self.cells[y] = [HIDDEN] * width
+                row[x] = remembered_glyph(dungeon, x, y)
+                index = seen.find(1, index + 1)
+    def update(self, player, dungeon):
+        if dungeon is not self.dungeon:
+            self.reset(dungeon)
+        fov = dungeon.fov
+        fov.update(player.x, player.y, player.vision_range)
+        width = dungeon.width
+        visible = set(fov.visible_cells)
+        changed = visible ^ self.visible
+        for x, y in dungeon.dirty:
+            if 0 <= x < width and 0 <= y < dungeon.height:
+                changed.add(y * width + x)
+        dungeon.dirty.clear()
+        player_pos = player.y * width + player.x
+        changed.add(player_pos)
+        if self.player_pos is not None:
+            changed.add(self.player_pos)
+        for index in changed:
+            y, x = divmod(index, width)
+            if fov.visible[index]:
+                glyph = cell_glyph(dungeon, player, x, y)
+            elif fov.seen[index]:
+                glyph = remembered_glyph(dungeon, x, y)
+            else:
+                glyph = HIDDEN
+            row = self.cells.get(y)
+            if row is None:
+                if glyph == HIDDEN:
+                    continue
+                row = self.cells[y] = [HIDDEN] * width
+            if row[x] != glyph:
+                row[x] = glyph
+                self.rows.pop(y, None)
+        self.visible = visible
+        self.player_pos = player_pos
+    def build_row(self, y, start_x, end_x):
+        cached = self.rows.get(y)
+        if cached and cached[0] == start_x and cached[1] == end_x:
+            return cached[2], cached[3]
+        glyphs = []
+        runs = []
+        run_style = None
+        run_start = 0
+        row = self.cells.get(y)
+        cells = row[start_x:end_x] if row else [HIDDEN] * (end_x - start_x)
+        for offset, (glyph, style) in enumerate(cells):
+            glyphs.append(glyph)
+            if style != run_style:
+                if run_style:
+                    runs.append((run_start, offset, run_style))
+                run_style = style
+                run_start = offset
+        if run_style:
+            runs.append((run_start, len(glyphs), run_style))
+        plain = "".join(glyphs)
+        self.rows[y] = (start_x, end_x, plain, runs)
+        return plain, runs
+    def render_into(self, text: Text, player, dungeon):
+        self.update(player, dungeon)
+        start_x = max(0, player.x - self.view_width // 2)
+        end_x = min(dungeon.width, start_x + self.view_width)
+        start_y = max(0, player.y - self.view_height // 2)
+        end_y = min(dungeon.height, start_y + self.view_height)
+        for y in range(start_y, end_y):
+            plain, runs = self.build_row(y, start_x, end_x)
+            base = len(text)
+            text.append(plain)
+            for run_start, run_end, style in runs:
+                text.stylize(style, base + run_start, base + run_end)
+            text.append("\n")
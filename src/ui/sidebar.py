@@ -0,0 +1,34 @@
+from typing import Tuple
+
+class SidebarModel:
+    """What the stats and inventory panels show, reduced to a stamp each.
+
+    update() reports a panel as changed only when its stamp did, so the app
+    rebuilds and repaints a panel's Text just when it would look different.
+    Every action that takes a turn moves the turn count and sanity, so the
+    stats panel is redrawn after each of them, a bump into a wall included;
+    redraws without a turn (map toggle, log scrolling, replay pauses) skip
+    it. The inventory panel is only redrawn after pickups and equipping.
+    Stats are stamped by value; the inventory by its own mutation counter."""
+    def __init__(self):
+        self.game_state = None
+        self.stats_stamp = None
+        self.inventory_stamp = None
+    def update(self, game_state) -> Tuple[bool, bool]:
+        """Whether the stats and the inventory panel need a redraw."""
+        player = game_state.player
+        inventory = player.inventory
+        stats_stamp = (player.hp, player.max_hp, player.sanity, player.max_sanity, player.attack,
+                       player.defense, player.stamina, player.max_stamina, game_state.current_floor,
+                       game_state.turn_count, game_state.enemies_killed)
+        inventory_stamp = (inventory.version, len(inventory.items), inventory.max_size)
+        if game_state is not self.game_state:
+            self.game_state = game_state
+            self.stats_stamp = self.inventory_stamp = None
+        stats_changed = stats_stamp != self.stats_stamp
+        if stats_changed:
+            self.stats_stamp = stats_stamp
+        inventory_changed = inventory_stamp != self.inventory_stamp
+        if inventory_changed:
+            self.inventory_stamp = inventory_stamp
+        return stats_changed, inventory_changed
\ No newline at end of file
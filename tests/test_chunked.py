@@ -0,0 +1,46 @@
+from data import savefile
+from data.gameplay import GameState
+from map.chunked import CHUNK_SIZE
+
+def wander_off(dungeon):
+    """Move an enemy with a home room into another resident chunk."""
+    for enemy in list(dungeon.enemies):
+        room = dungeon.home_rooms.get(enemy.id)
+        if room is None:
+            continue
+        home = (room.x // CHUNK_SIZE, room.y // CHUNK_SIZE)
+        for key, chunk in dungeon.resident.items():
+            cells = [(x, y) for y in range(chunk.cy * CHUNK_SIZE, (chunk.cy + 1) * CHUNK_SIZE)
+                     for x in range(chunk.cx * CHUNK_SIZE, (chunk.cx + 1) * CHUNK_SIZE)
+                     if dungeon.is_walkable(x, y) and not dungeon.get_enemy_at(x, y)]
+            if key != home and cells:
+                dungeon.move_enemy(enemy, *cells[0])
+                return enemy, home, dungeon.resident[home].rooms.index(room)
+    raise AssertionError("no enemy with a home room")
+
+def test_enemy_keeps_its_home_room_while_that_chunk_is_evicted():
+    game_state = GameState(seed=3, prefetch=False, world_size=(400, 400))
+    dungeon = game_state.dungeon
+    enemy, home, index = wander_off(dungeon)
+    away = (enemy.x // CHUNK_SIZE, enemy.y // CHUNK_SIZE)
+    dungeon.evict_chunk(home)
+    assert enemy.id not in dungeon.home_rooms
+    assert dungeon.home_of(enemy) == (home[0], home[1], index)
+    restored = savefile.restore(GameState, savefile.unpack(savefile.pack(game_state.save_data())), False)
+    for dungeon in (dungeon, restored.dungeon):
+        dungeon.load_chunk(*away)
+        dungeon.load_chunk(*home)
+        room = dungeon.home_rooms[enemy.id]
+        assert room is dungeon.resident[home].rooms[index]
+        assert dungeon.enemies.get(enemy.id) in room.enemies
+
+def test_enemy_away_from_home_is_saved_with_its_home_room():
+    game_state = GameState(seed=3, prefetch=False, world_size=(400, 400))
+    dungeon = game_state.dungeon
+    enemy, home, index = wander_off(dungeon)
+    key = (enemy.x // CHUNK_SIZE, enemy.y // CHUNK_SIZE)
+    dungeon.evict_chunk(key)
+    assert dungeon.enemies.get(enemy.id) is None
+    assert enemy not in dungeon.resident[home].rooms[index].enemies
+    dungeon.load_chunk(*key)
+    assert dungeon.home_rooms[enemy.id] is dungeon.resident[home].rooms[index]
@@ -0,0 +1,73 @@
+import random
+from data.gameplay import GameState
+from data.simulation import ACTIONS, NullLog, advance
+from entity.enemies import Warden
+from entity.player import Player
+from map.dungeon import Dungeon
+from ui.renderer import ViewportRenderer
+
+# A wall between the west half and the east, passable only along the top.
+WALLED = (
+    "#########",
+    "#.......#",
+    "#....#..#",
+    "#....#..#",
+    "#....#..#",
+    "#########",
+)
+
+def build(rows):
+    dungeon = Dungeon(1, seed=1, generate=False, width=len(rows[0]), height=len(rows))
+    dungeon.grid = bytearray("".join(rows).encode())
+    return dungeon
+
+def play(game_state, count, seed=0):
+    rng = random.Random(seed)
+    log = NullLog()
+    for _ in range(count):
+        game_state.player.hp = game_state.player.max_hp
+        advance(game_state, rng.choice(ACTIONS), log)
+
+def test_headless_runs_do_not_collect_dirty_cells():
+    game_state = GameState(seed=4, prefetch=False, world_size=(400, 400))
+    play(game_state, 150)
+    assert not game_state.dungeon.dirty
+
+def test_renderer_sees_cells_dirtied_between_frames():
+    game_state = GameState(seed=4, prefetch=False)
+    renderer = ViewportRenderer()
+    renderer.update(game_state.player, game_state.dungeon)
+    game_state.dungeon.set_tile(1, 1, ".")
+    assert game_state.dungeon.dirty == {(1, 1)}
+    renderer.update(game_state.player, game_state.dungeon)
+    assert not game_state.dungeon.dirty
+
+def test_warden_patrols_around_a_corner():
+    dungeon = build(WALLED)
+    warden = Warden(2, 3)
+    dungeon.add_enemy(warden)
+    warden.set_patrol_route([(2, 3), (6, 3)])
+    player = Player(7, 1)
+    visited = set()
+    for _ in range(12):
+        warden.act(player, dungeon, NullLog())
+        visited.add((warden.x, warden.y))
+    assert (6, 3) in visited
+    assert (5, 1) in visited
+
+def test_paths_follow_changes_to_the_terrain():
+    dungeon = build(WALLED)
+    pathfinder = dungeon.pathfinder
+    assert len(pathfinder.find_path((2, 3), (6, 3))) == 8
+    assert pathfinder.reaches(2, 3, 6, 3)
+    dungeon.set_tile(5, 3, ".")
+    assert pathfinder.find_path((2, 3), (6, 3)) == [(3, 3), (4, 3), (5, 3), (6, 3)]
+    for y in (1, 3):
+        dungeon.set_tile(5, y, "#")
+    assert pathfinder.find_path((2, 3), (6, 3)) is None
+    assert not pathfinder.reaches(2, 3, 6, 3)
+
+def test_enemies_do_not_block_paths():
+    dungeon = build(WALLED)
+    dungeon.add_enemy(Warden(5, 1))
+    assert len(dungeon.pathfinder.find_path((2, 3), (6, 3))) == 8
@@ -0,0 +1,83 @@
+import random
+import pytest
+from data import savefile
+from data.gameplay import GameState
+from data.simulation import ACTIONS, RecordingLog, advance
+from entity import vectorized
+from entity.enemies import create_enemy
+from entity.scheduler import EnemyScheduler
+
+def crowd(seed, kinds, count):
+    """A seeded floor with `count` extra enemies packed around the player."""
+    game_state = GameState(seed=seed, prefetch=False)
+    dungeon, player = game_state.dungeon, game_state.player
+    rng = random.Random(seed)
+    cells = [(x, y) for y in range(dungeon.height) for x in range(dungeon.width)
+             if dungeon.is_walkable(x, y) and (x, y) != (player.x, player.y)]
+    cells.sort(key=lambda cell: abs(cell[0] - player.x) + abs(cell[1] - player.y))
+    for index, (x, y) in enumerate(rng.sample(cells[:count * 2], count)):
+        enemy = create_enemy(kinds[index % len(kinds)], x, y, 1, dungeon.ai_rng)
+        if enemy.name == "Whisper" and rng.random() < 0.5:
+            enemy.visible = True
+        dungeon.add_enemy(enemy, dungeon.get_room_at(x, y))
+    return game_state
+
+def far_cell(game_state, distance):
+    """A walkable cell at least `distance` from the player, with two more to its right."""
+    dungeon, player = game_state.dungeon, game_state.player
+    for y in range(dungeon.height):
+        for x in range(dungeon.width):
+            if abs(x - player.x) + abs(y - player.y) >= distance and dungeon.is_walkable(x, y) \
+                    and dungeon.is_walkable(x + 1, y) and dungeon.is_walkable(x + 2, y):
+                return x, y
+    raise AssertionError("no walkable cell that far")
+
+@pytest.mark.parametrize("kind", ["whisper", "mimic"])
+def test_hidden_enemies_sleep_until_the_player_comes_close(kind, monkeypatch):
+    game_state = GameState(seed=8, prefetch=False)
+    dungeon, scheduler = game_state.dungeon, game_state.dungeon.scheduler
+    x, y = far_cell(game_state, 20)
+    enemy = create_enemy(kind, x, y, 1, dungeon.ai_rng)
+    dungeon.add_enemy(enemy)
+    turns = []
+    act = type(enemy).act
+    def counted_act(self, player, dungeon, log):
+        if self is enemy:
+            turns.append(game_state.turn_count)
+        return act(self, player, dungeon, log)
+    monkeypatch.setattr(type(enemy), "act", counted_act)
+    for _ in range(5):
+        advance(game_state, "wait", RecordingLog())
+    assert enemy.id in scheduler.dormant_bucket
+    assert not turns
+    game_state.player.x, game_state.player.y = x + 1, y
+    log = RecordingLog()
+    advance(game_state, "wait", log)
+    assert enemy.id not in scheduler.dormant_bucket
+    assert enemy in scheduler.active[enemy.name]
+    assert turns
+    assert any(event.kind == "reveal" and event.actor == enemy.id for event in log.events)
+
+def play_crowd(seed, kinds, count, turns):
+    game_state = crowd(seed, kinds, count)
+    rng = random.Random(seed)
+    log = RecordingLog()
+    frames = []
+    for _ in range(turns):
+        game_state.player.hp = game_state.player.max_hp
+        game_state.player.sanity = 100
+        advance(game_state, rng.choice(ACTIONS), log)
+        game_state.in_combat = False
+        frames.append(savefile.pack(game_state.save_data()))
+    return frames, [(event.kind, event.actor, event.text) for event in log.events]
+
+@pytest.mark.parametrize("seed", [1, 6])
+@pytest.mark.parametrize("kinds", [("whisper",), ("shade",), ("mimic",), ("shade", "whisper", "mimic", "warden")])
+def test_group_step_matches_the_scalar_loop(seed, kinds, monkeypatch):
+    pytest.importorskip("numpy")
+    monkeypatch.setattr(EnemyScheduler, "vectorize", False)
+    scalar = play_crowd(seed, kinds, 80, 60)
+    monkeypatch.setattr(EnemyScheduler, "vectorize", True)
+    for name in vectorized.MIN_GROUP:
+        monkeypatch.setitem(vectorized.MIN_GROUP, name, 1)
+    assert play_crowd(seed, kinds, 80, 60) == scalar
@@ -0,0 +1,84 @@
+import random
+import pytest
+from data import savefile
+from data.floorcache import FLOOR_CACHE, FloorCache
+from data.gameplay import GameState
+from data.rng import GameRNG
+from data.simulation import ACTIONS, RecordingLog, advance
+from map.dungeon import Dungeon
+
+def play(seed, generators):
+    game_state = GameState(seed=seed, prefetch=False, generators=generators)
+    rng = random.Random(seed)
+    log = RecordingLog()
+    for _ in range(400):
+        if advance(game_state, rng.choice(ACTIONS), log) in ("game_over", "victory"):
+            break
+    return log.messages, savefile.pack(game_state.save_data())
+
+@pytest.mark.parametrize("generator", ["legacy", "bsp", "caves"])
+def test_stamped_floor_matches_generated(generator):
+    cache = FloorCache()
+    rng = GameRNG(21)
+    generated = Dungeon(3, 21, rng, generator=generator)
+    expected = savefile.capture_dungeon(generated)
+    cache.build(3, 21, rng, generator)
+    stamped = cache.build(3, 21, rng, generator)
+    assert cache.hits == 1
+    assert savefile.capture_dungeon(stamped) == expected
+    for room, generated_room in zip(stamped.rooms[::2], generated.rooms[::2]):
+        assert room.get_random_walkable_position() == generated_room.get_random_walkable_position()
+        assert [room.rng.random() for _ in range(3)] == [generated_room.rng.random() for _ in range(3)]
+
+def test_stamps_do_not_share_state():
+    cache = FloorCache()
+    rng = GameRNG(4)
+    first = cache.build(2, 4, rng)
+    expected = savefile.capture_dungeon(first)
+    first.set_tile(first.start_pos[0], first.start_pos[1], "#")
+    first.rooms[0].visited = True
+    for enemy in list(first.enemies):
+        first.remove_enemy(enemy)
+    assert savefile.capture_dungeon(cache.build(2, 4, rng)) == expected
+
+@pytest.mark.parametrize("generators", [None, ("bsp",), ("legacy", "bsp", "caves")])
+def test_games_play_the_same_from_a_warm_cache(generators):
+    FLOOR_CACHE.clear()
+    cold = [play(seed, generators) for seed in range(1, 6)]
+    hits = FLOOR_CACHE.hits
+    warm = [play(seed, generators) for seed in range(1, 6)]
+    assert FLOOR_CACHE.hits > hits
+    assert warm == cold
+
+def test_disk_store_is_shared_between_caches(tmp_path):
+    rng = GameRNG(30)
+    expected = savefile.capture_dungeon(FloorCache(store_dir=str(tmp_path)).build(4, 30, rng, "caves"))
+    reader = FloorCache(store_dir=str(tmp_path))
+    assert savefile.capture_dungeon(reader.build(4, 30, rng, "caves")) == expected
+    assert (reader.loads, reader.misses) == (1, 0)
+
+def test_store_entry_of_the_wrong_shape_is_regenerated(tmp_path):
+    cache = FloorCache(store_dir=str(tmp_path))
+    expected = savefile.capture_dungeon(cache.build(2, 19, GameRNG(19)))
+    (path,) = tmp_path.iterdir()
+    template = savefile.unpack(path.read_bytes())
+    del template["rooms"]
+    path.write_bytes(savefile.pack(template))
+    reader = FloorCache(store_dir=str(tmp_path))
+    assert savefile.capture_dungeon(reader.build(2, 19, GameRNG(19))) == expected
+    assert (reader.loads, reader.misses) == (0, 1)
+    template = savefile.unpack(path.read_bytes())
+    template["enemies"] = [["not", "an", "enemy"]]
+    path.write_bytes(savefile.pack(template))
+    reader = FloorCache(store_dir=str(tmp_path))
+    assert savefile.capture_dungeon(reader.build(2, 19, GameRNG(19))) == expected
+    assert savefile.capture_dungeon(reader.build(2, 19, GameRNG(19))) == expected
+
+def test_unreadable_store_entry_is_a_miss(tmp_path):
+    cache = FloorCache(store_dir=str(tmp_path))
+    cache.build(1, 12, GameRNG(12))
+    for path in tmp_path.iterdir():
+        path.write_bytes(b"ECHO garbage")
+    reader = FloorCache(store_dir=str(tmp_path))
+    reader.build(1, 12, GameRNG(12))
+    assert (reader.loads, reader.misses) == (0, 1)
@@ -0,0 +1,52 @@
+import asyncio
+import main
+from data.autosave import Autosave
+from data.gameplay import GameState
+from data.replay import ReplayRecorder
+from entity.enemies import Whisper
+
+def play_bursts(game_state, bursts, tmp_path, monkeypatch):
+    """Queue each burst of actions at once in a running EchoesGame; returns
+    the turn count at every frame drawn."""
+    monkeypatch.chdir(tmp_path)
+    app = main.EchoesGame()
+    app.autosave = Autosave(str(tmp_path / "saves"), background=False)
+    frames = []
+    async def run():
+        async with app.run_test() as pilot:
+            app.in_menu = False
+            app.game_state = game_state
+            app.recorder = ReplayRecorder(game_state)
+            app.autosave.start(game_state)
+            draw = app.update_display
+            def counted_draw():
+                frames.append(game_state.turn_count)
+                draw()
+            app.update_display = counted_draw
+            for burst in bursts:
+                for action in burst:
+                    app.queue_action(action)
+                await pilot.pause()
+    asyncio.run(run())
+    return frames
+
+def test_queued_actions_are_drawn_once(tmp_path, monkeypatch):
+    game_state = GameState(seed=5, prefetch=False)
+    assert play_bursts(game_state, [["wait"] * 5, ["wait"] * 3], tmp_path, monkeypatch) == [5, 8]
+
+def test_queue_is_capped(tmp_path, monkeypatch):
+    game_state = GameState(seed=5, prefetch=False)
+    assert play_bursts(game_state, [["wait"] * 40], tmp_path, monkeypatch) == [main.MAX_QUEUED_ACTIONS]
+
+def test_reveal_interrupts_the_queue(tmp_path, monkeypatch):
+    game_state = GameState(seed=5, prefetch=False)
+    dungeon, player = game_state.dungeon, game_state.player
+    cell = next((x, y) for y in range(player.y - 3, player.y + 4) for x in range(player.x - 3, player.x + 4)
+                if abs(x - player.x) + abs(y - player.y) == 3 and dungeon.is_walkable(x, y))
+    dungeon.add_enemy(Whisper(*cell))
+    assert play_bursts(game_state, [["wait"] * 5], tmp_path, monkeypatch) == [1]
+
+def test_low_sanity_interrupts_the_queue(tmp_path, monkeypatch):
+    game_state = GameState(seed=5, prefetch=False)
+    game_state.player.sanity = main.LOW_SANITY
+    assert play_bursts(game_state, [["wait"] * 5, ["wait"] * 2], tmp_path, monkeypatch) == [1, 3]
@@ -0,0 +1,93 @@
+import json
+import random
+import pytest
+import main
+from data import savefile
+from data.autosave import Autosave
+from data.gameplay import GameState
+from data.simulation import ACTIONS, NullLog, advance
+
+def play(game_state, actions, autosave=None):
+    log = NullLog()
+    for action in actions:
+        result = advance(game_state, action, log)
+        if autosave:
+            autosave.record(game_state, action)
+        if result in ("game_over", "victory"):
+            break
+
+def seeded_actions(seed, count):
+    rng = random.Random(seed)
+    return [rng.choice(ACTIONS) for _ in range(count)]
+
+def fingerprint(game_state):
+    return savefile.pack(game_state.save_data())
+
+@pytest.mark.parametrize("seed", [1, 7, 42])
+@pytest.mark.parametrize("generators", [None, ("bsp",), ("legacy", "caves")])
+def test_restored_game_continues_identically(seed, generators):
+    game_state = GameState(seed=seed, prefetch=False, generators=generators)
+    play(game_state, seeded_actions(seed, 80))
+    restored = savefile.restore(GameState, savefile.unpack(fingerprint(game_state)), prefetch=False)
+    assert fingerprint(restored) == fingerprint(game_state)
+    rest = seeded_actions(seed + 1, 200)
+    play(game_state, rest)
+    play(restored, rest)
+    assert fingerprint(restored) == fingerprint(game_state)
+
+@pytest.mark.parametrize("seed", [3, 11])
+def test_autosave_resumes_at_the_last_action(seed, tmp_path):
+    autosave = Autosave(str(tmp_path), keep=2, snapshot_every=15, background=False)
+    game_state = GameState(seed=seed, prefetch=False)
+    autosave.start(game_state)
+    play(game_state, seeded_actions(seed, 70), autosave)
+    resumed = Autosave(str(tmp_path), keep=2, snapshot_every=15, background=False).resume(GameState)
+    assert fingerprint(resumed) == fingerprint(game_state)
+
+def test_resume_skips_a_corrupt_snapshot(tmp_path):
+    autosave = Autosave(str(tmp_path), keep=3, snapshot_every=10, background=False)
+    game_state = GameState(seed=5, prefetch=False)
+    autosave.start(game_state)
+    play(game_state, seeded_actions(5, 25), autosave)
+    newest = autosave.snapshot_path(autosave.snapshot_numbers()[-1])
+    with open(newest, "r+b") as f:
+        f.truncate(200)
+    assert Autosave(str(tmp_path), background=False).resume(GameState) is not None
+
+def test_corrupt_saves_raise_save_format_error():
+    good = fingerprint(GameState(seed=2, prefetch=False))
+    rng = random.Random(0)
+    for _ in range(300):
+        data = bytearray(good)
+        for _ in range(rng.randint(1, 6)):
+            data[rng.randrange(savefile.HEADER.size, len(data))] = rng.randrange(256)
+        try:
+            savefile.restore(GameState, savefile.unpack(bytes(data)), prefetch=False)
+        except savefile.SaveFormatError:
+            pass
+
+def test_load_falls_back_to_a_legacy_json_save(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with open(main.LEGACY_SAVE_FILE, "w") as f:
+        json.dump({
+            "seed": 1234, "current_floor": 2, "turn_count": 57, "enemies_killed": 3,
+            "player": {"x": 0, "y": 0, "hp": 64, "stamina": 40, "sanity": 71,
+                       "base_attack": 12, "base_defense": 6},
+            "narrative_clues": ["echo_zone"],
+        }, f, indent=2)
+    app = main.EchoesGame()
+    app.autosave = Autosave(str(tmp_path / main.SAVE_DIR), background=False)
+    game_state = app.read_save()
+    assert (game_state.seed, game_state.current_floor, game_state.turn_count) == (1234, 2, 57)
+    assert (game_state.player.hp, game_state.player.sanity) == (64, 71)
+    assert game_state.dungeon.floor_level == 2
+    assert game_state.narrative_clues == ["echo_zone"]
+    assert app.autosave.snapshot_numbers() == [1]
+
+def test_version_1_save_loads_as_a_legacy_floor():
+    state = GameState(seed=8, prefetch=False).save_data()
+    state["version"] = 1
+    del state["world_size"], state["generators"], state["dungeon"]["generator"]
+    restored = savefile.restore(GameState, state, prefetch=False)
+    assert restored.dungeon.generator.name == "legacy"
+    assert restored.world_size is None and restored.generators is None